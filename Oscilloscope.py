@@ -1,8 +1,6 @@
 import numpy
-import pyvisa as visa
-import time
-import math
 import sys
+import time
 import matplotlib
 
 matplotlib.use('Qt5Agg')
@@ -13,179 +11,106 @@ from matplotlib.figure import Figure
 from PyQt6 import QtWidgets, QtCore, QtGui
 from PyQt6 import uic
 
-# wczytanie listy dostępnych urządzeń
-rm = visa.ResourceManager()
-devices = rm.list_resources()  # pobranie listy dostępnych urządzeń
-
-
-# pobranie danych niezbędnych do utworzenia przebiegu przy wybraniu pobierania danych w sposób binarny
-def get_numerical_values(oscyloskop):
-    # Dane używane podczas tworzenia wektora czasu (potrzebne do wyrysowania przebiegu)
-    XINC = oscyloskop.query_ascii_values(
-        ":WAVeform:XINCrement?")  # wartość przeskalowania w pozycji X (okres pomiędzy każdą próbką)
-    XREF = oscyloskop.query_ascii_values(
-        ":WAVeform:XREFerence?")  # zwraca pierwszy punkt na ekranie lub w pamięci wewnętrznej)
-    # Dane potrzebne do poprawnej konwersji liczb na volty
-    YOR = oscyloskop.query_ascii_values(":WAVeform:YORigin?")  # wartość przesunięcia pionowego w kierunku Y
-    YREF = oscyloskop.query_ascii_values(
-        ":WAVeform:YREFerence?")  # zwracana jest wartość zależna od bieżącego trybu odczytu danych
-    YINC = oscyloskop.query_ascii_values(":WAVeform:YINCrement?")  # zwraca nam wartość przeskalowania w pozycji Y
-
-    return XINC, XREF, YOR, YREF, YINC
-
-# dane potrzebne do odczytania pełnego spektrum
-def get_memory_depth(oscyloskop):
-    samp_time = oscyloskop.query_ascii_values(":ACQuire:SRATe?")  # zwraca aktualny czas próbkowania
-    time_base = oscyloskop.query_ascii_values("TIMebase:SCALe?")  # pobranie podstawy czasu
-    DepthMemory = (time_base[0] * 12) * samp_time[0]  # obliczenie MemoryDepth
-    return DepthMemory
-
-
-# ustawienie początku i końca pobierania danych
-def data_download_limit(oscyloskop, start=1, stop=500000):
-    oscyloskop.write(f":WAVeform:STARt {str(start)}")  # ustawienie początku pobierania danych
-    oscyloskop.write(f":WAVeform:STOP {str(stop)}")  # ustawienie końca pobierania danych
-
-
-# algorytm pozwalajacy na uzyskanie całego spectrum
-def get_all_data(oscyloskop, DepthMemory, sample=500000):
-    dane = oscyloskop.query_binary_values(":WAVeform:DATA?", datatype='B')  # pobranie danych z oscyloskopu
-
-    if DepthMemory > sample:
-        licznik = 1  # ustawienie wartości licznika na 1
-        liczba_petli = math.ceil(
-            DepthMemory / sample)  # zaokrąglenie w górę liczby pętli potrzebnych do pobrania całego spektrum
-
-        while licznik < liczba_petli:  # wykonywanie pobierania danych do momentu zrównania się licznika z liczbą pętli
-
-            beginning = (licznik * sample) + 1      # obliczenie początku pobierania danych zależnego od aktualnego obiegu pętli
-            if licznik == liczba_petli -1:          # warunek pozwalający na pobranie wszystkich danych
-                end = DepthMemory                   # ustalenie memorydepth na koniec pobierania próbek
-            else:
-                end = (licznik + 1) * sample  # obliczenie końca pobierania danych zależnego od aktualnego obiegu pętli
-
-            data_download_limit(oscyloskop, beginning, end)
-            dane.extend(oscyloskop.query_binary_values(":WAVeform:DATA?",
-                                                       datatype='B'))  # rozszerzenie danych o kolejne informacje
-            licznik += 1  # zwiększenie licznika
-
-    return dane
-
-
-# zatrzymanie pracy oscyloskopu
-def stop():
-    oscyloskop.write(":STOP")
-
-
-# wznowienie pracy oscyloskopu
-def start():
-    oscyloskop.write(":RUN")
-
-
-# konwersja odczytanych danych na przebieg napięcia
-def make_volt(dane, XINC, XREF, YOR, YREF, YINC):
-    volt = (numpy.asarray(dane) - YOR[0] - YREF[0]) * YINC[0]  # przeliczenie danych na wartości napięcia
-
-    return volt, XINC, XREF, YREF, YINC
-
-
-# funkcja pozwalająca na pobranie aktualnie wyświetlanego przebiegu z jednego kanału w celu poźniejszego wyrysowania
-def program(oscyloskop):
-    stop()  # wywołanie funkcji zatrzymującą pracę oscylokskopu
-    time.sleep(0.5)  # wstrzymanie obiegu pętli na 0.5s w celu uniknięcia błędów w pobieraniu danych
-    XINC, XREF, YOR, YREF, YINC = get_numerical_values(
-        oscyloskop)  # wywołanie funkcji pobierającej dane niezbędne do wyrysowania przebiegu
-    DepthMemory = get_memory_depth(oscyloskop)  # wywołanie funkcji pobierającej dane do uzyskania pełnego spektrum
-    data_download_limit(oscyloskop)  # wywołanie funkcji ustawiajacej początek i koniec pobierania danych od 1 do 250000
-    dane = get_all_data(oscyloskop, DepthMemory)  # pobranie pełnego spektrum
-    start()  # wywołanie funkcji startującej pracę oscyloskopu
-    frq = oscyloskop.query_ascii_values(":MEAS:ITEM? FREQ")  # pobranie aktualnej częstotliwości obserwowanego sygnału
-    data, XINC, XREF, YREF, YINC = make_volt(dane, XINC, XREF, YOR, YREF,
-                                             YINC)  # wywołanie funkcji konwertującej dane na wartości napięcia
-
-    return data, XINC, XREF, frq
-
-
-# funkcja pozwalająca na pobranie aktualnie wyświetlanego przebiegu z dwóch kanałów w celu poźniejszego wyrysowania
-def programTwoChannel(oscyloskop):
-    time.sleep(0.5)
-    stop()
-    oscyloskop.write(":WAVeform:SOURce CHANnel1")
-    oscyloskop.write(":MEASure:SOURce CHANnel1")
-    frqTwoChannel1 = oscyloskop.query_ascii_values(":MEAS:ITEM? FREQ")
-
-    XINCTwoChannel1, XREFTwoChannel1, YORTwoChannel1, YREFTwoChannel1, YINCTwoChannel1 = get_numerical_values(
-        oscyloskop)
-    DepthMemory = get_memory_depth(oscyloskop)
-    data_download_limit(oscyloskop)
-    daneTwoChannel1 = get_all_data(oscyloskop, DepthMemory)
-    start()
-    dataTwoChannel1, XINCTwoChannel1, XREFTwoChannel1, YREFTwoChannel1, YINCTwoChannel1 = make_volt(daneTwoChannel1,
-                                                                                                    XINCTwoChannel1,
-                                                                                                    XREFTwoChannel1,
-                                                                                                    YORTwoChannel1,
-                                                                                                    YREFTwoChannel1,
-                                                                                                    YINCTwoChannel1)
-
-    stop()
-    time.sleep(0.5)
-    oscyloskop.write(":WAVeform:SOURce CHANnel2")
-    oscyloskop.write(":MEASure:SOURce CHANnel2")
-    frqTwoChannel2 = oscyloskop.query_ascii_values(":MEAS:ITEM? FREQ")
-
-    XINCTwoChannel2, XREFTwoChannel2, YORTwoChannel2, YREFTwoChannel2, YINCTwoChannel2 = get_numerical_values(
-        oscyloskop)
-    DepthMemory = get_memory_depth(oscyloskop)
-    data_download_limit(oscyloskop)
-    daneTwoChannel2 = get_all_data(oscyloskop, DepthMemory)
-    start()
-    dataTwoChannel2, XINCTwoChannel2, XREFTwoChannel2, YREFTwoChannel2, YINCTwoChannel2 = make_volt(daneTwoChannel2,
-                                                                                                    XINCTwoChannel2,
-                                                                                                    XREFTwoChannel2,
-                                                                                                    YORTwoChannel2,
-                                                                                                    YREFTwoChannel2,
-                                                                                                    YINCTwoChannel2)
-
-    return dataTwoChannel1, dataTwoChannel2, XINCTwoChannel1, XINCTwoChannel2, XREFTwoChannel1, XREFTwoChannel2, frqTwoChannel1, frqTwoChannel2
-
-
-# funkcja pozwalająca na obliczenie wartości maksymalnej, minimalnej oraz skutecznej przebiegu  dla jednego kanału
-def measure(data):
-    maxValue = max(data)  # obliczenie wartości maksymalnej
-    minValue = min(data)  # obliczenie wartości minimalnej
-    rms = numpy.sqrt(numpy.mean(data ** 2))  # obliczenie wartości skutecznej
-
-    return maxValue, minValue, rms
-
-
-# funkcja pozwalająca na obliczenie wartości maksymalnej, minimalnej, skutecznej oraz pomiarów mocy przebiegów dla dwóch kanałów
-def measureTwoChannel(data1, data2):
-    Ui = 0  #
-    P = 0  # wyzerowanie zmiennych
-    S = 0  #
-    Q = 0  #
-
-    maxValueCh1 = max(data1)  # obliczenie wartości maksymalnej
-    minValueCh1 = min(data1)  # obliczenie wartości minimalnej
-    rmsCh1 = numpy.sqrt(numpy.mean(data1 ** 2))  # obliczenie wartości skutecznej
-
-    maxValueCh2 = max(data2)  # obliczenie wartości maksymalnej
-    minValueCh2 = min(data2)  # obliczenie wartości minimalnej
-    rmsCh2 = numpy.sqrt(numpy.mean(data2 ** 2))  # obliczenie wartości skutecznej
-
-    if len(data1) == len(data2):                # sprawdzenie czy wektory są równej długośći w celu uniknięcia błędów
-        for i in range(len(data1)):             # obliczenie sumy iloczynów napięcia i prądu
-            Ui += data1[i] * data2[i]
-
-        S = rmsCh1 * rmsCh2                     # obliczenie mocy pozornej
-        P = Ui / len(data1)                     # obliczenie mocy czynnej
-        Q = numpy.sqrt(S ** 2 - P ** 2)         # obliczenie mocy biernej
-    else:
-        S = 9.9e+37                             #przypisanie wartości w momencie nierównej długości wektorów
-        P = 9.9e+37
-        Q = 9.9e+37
-
-    return maxValueCh1, minValueCh1, rmsCh1, maxValueCh2, minValueCh2, rmsCh2, P, S, Q
+from acquisition import programTwoChannel, measure, measureTwoChannel, select_channel
+from instrument_state import InstrumentStateCache
+from pipeline import program_pipelined
+from decimation import MinMaxPyramid
+from rendering import PlotRenderer
+from transport import FrameRing, FrameRingExhausted
+from export import EXPORT_FORMATS, export
+from recorder import Recorder
+from streaming import FrameServer, STREAM_PORT
+from replay import ReplaySource, display_channels
+from session_pool import SessionPool
+from devices import DeviceDirectory
+from tuning import LinkProfiles, tune
+from profiling import profiler
+from spectrum import SpectrumAnalyzer, WINDOWS, AVERAGING
+from trigger import TriggerEngine, TRIGGER_KINDS
+from accumulation import WaveformAccumulator, ACCUMULATION_MODES
+from analysis import AnalysisExecutor
+from power import PowerAnalyzer
+from math_channels import MathChannels, MathError, MATH_CHANNEL, math_records
+from waveform import RawWaveform
+
+# dostęp do urządzeń VISA; menedżer zasobów jest tworzony przy pierwszym użyciu, a lista urządzeń wyszukiwana w tle
+rm = DeviceDirectory()
+
+# pamięć podręczna danych skalujących wybranego urządzenia (wspólna dla wszystkich wątków pomiarowych)
+stan = InstrumentStateCache()
+
+# pierścień buforów ramek przekazywanych z wątków pomiarowych do GUI bez kopiowania danych
+ramki = FrameRing(slots=5)  # wypełniana, oczekująca, dwie wyświetlane oraz zapisywana do pliku
+
+# najdłuższy czas oczekiwania wątku pomiarowego na wolny bufor ramki [s]
+RING_TIMEOUT = 10.0
+
+# rejestrator zapisujący wszystkie ramki do pliku nagrania (None - nagrywanie wyłączone)
+rejestrator = None
+
+# profile łącza urządzeń (wielkość fragmentu, bufor odczytu, limit czasu) oraz ustawienia łącza bieżącego urządzenia
+profile = LinkProfiles()
+lacze = None
+
+# serwer TCP udostępniający ramki innym programom (None - udostępnianie wyłączone)
+serwer = None
+
+# wyzwalanie programowe wspólne dla pomiarów jednego i dwóch kanałów (ustawiane z GUI)
+wyzwalanie = TriggerEngine()
+
+# akumulacja kolejnych ramek (uśrednianie, obwiednia, poświata) wykonywana w wątkach pomiarowych
+akumulacja = WaveformAccumulator()
+
+# analizator widma liczący FFT w wątkach pomiarowych (None - widok widma wyłączony)
+widmo = None
+
+# analizator jakości energii (CH1 - napięcie, CH2 - prąd) liczący w wątkach pomiarowych (None - panel wyłączony)
+jakosc = None
+
+# definicje kanałów matematycznych (wyrażenia na kanałach CH1..CH4) wspólne dla wątków pomiarowych
+matematyka = MathChannels()
+
+# pula procesów analizujących długie rekordy na wszystkich rdzeniach (None - analiza w wątkach pomiarowych)
+analiza = None
+
+
+# widmo kanału liczone w puli procesów, jeśli jest włączona, lub bezpośrednio w wątku pomiarowym
+def compute_spectrum(analizator, data, dx, channel, slot=0):
+    executor = analiza
+    if executor is not None and executor.parallel(data):
+        return executor.spectrum(analizator, data, channel, slot)
+    return analizator.compute(data, dx, channel)
+
+
+# pomiary dwóch kanałów na pełnych rekordach: w puli procesów lub w wątku pomiarowym (statystyki z histogramów
+# kodów RawStats policzonych przy pobieraniu, moc czynna z iloczynów kodów liczonych fragmentami)
+def compute_two_channel(data1, data2):
+    executor = analiza
+    if executor is not None and executor.parallel(data1):
+        return executor.measure_two_channel(data1, data2)
+    return measureTwoChannel(data1, data2)
+
+
+# analiza jakości energii ramki dwóch kanałów, jeśli panel jakości energii jest włączony
+def compute_power(frame, data1, data2, dx, x0):
+    analizator = jakosc
+    if analizator is not None:
+        frame.power = analizator.analyze(data1, data2, dx, x0)
+    return frame.power
+
+
+# pobranie bufora ramki w wątku pomiarowym; gdy wszystkie bufory są zajęte (ramki wyświetlane i zapisywane do pliku),
+# wątek czeka na zwolnienie bufora, a po RING_TIMEOUT zgłasza błąd sygnałem failed (None - koniec pomiarów)
+def acquire_frame(thread):
+    deadline = time.monotonic() + RING_TIMEOUT
+    while thread.isRunning:
+        try:
+            return ramki.acquire(timeout=0.1)  # krótkie oczekiwanie, aby nie opóźniać zatrzymania pomiarów
+        except FrameRingExhausted as error:
+            if time.monotonic() >= deadline:
+                thread.failed.emit(f"{error} - ramki są wciąż wyświetlane lub zapisywane do pliku")
+                return None
+    return None
 
 
 # stworzenie klasy MplCanvas służącej do rysowania przebiegów
@@ -222,6 +147,113 @@ class Oscilloscope(QtWidgets.QMainWindow):
         # dodanie możliwości zapisu danych
         self.actionSave.triggered.connect(self.SaveFile)
 
+        # dodanie możliwości nagrywania wszystkich ramek do pliku
+        self.actionRecord = QtGui.QAction("Nagrywaj pomiary", self)
+        self.actionRecord.setCheckable(True)
+        self.actionRecord.toggled.connect(self.Recording)
+        self.menuFile.insertAction(self.actionExit, self.actionRecord)
+
+        # dodanie możliwości ponownego dostrojenia transferu danych z wybranego urządzenia
+        self.actionTuning = QtGui.QAction("Dostrój transfer danych", self)
+        self.actionTuning.triggered.connect(self.Tuning)
+        self.menuFile.insertAction(self.actionExit, self.actionTuning)
+        self.threadTuning = None
+
+        # dodanie możliwości udostępniania ramek innym programom przez lokalne gniazdo TCP
+        self.actionServer = QtGui.QAction(f"Udostępniaj ramki (TCP, port {STREAM_PORT})", self)
+        self.actionServer.setCheckable(True)
+        self.actionServer.toggled.connect(self.Streaming)
+        self.menuFile.insertAction(self.actionExit, self.actionServer)
+
+        # dodanie możliwości analizy długich rekordów w puli procesów (wszystkie rdzenie procesora)
+        self.actionAnalysis = QtGui.QAction("Analiza wielordzeniowa", self)
+        self.actionAnalysis.setCheckable(True)
+        self.actionAnalysis.toggled.connect(self.Analysis)
+        self.menuFile.insertAction(self.actionExit, self.actionAnalysis)
+
+        # dodanie możliwości odtwarzania nagrań bez podłączonego oscyloskopu
+        self.actionReplay = QtGui.QAction("Odtwórz nagranie...", self)
+        self.actionReplay.triggered.connect(self.Replay)
+        self.menuFile.insertAction(self.actionExit, self.actionReplay)
+        self.actionSeekFrame = QtGui.QAction("Przejdź do ramki...", self)
+        self.actionSeekFrame.triggered.connect(self.SeekFrame)
+        self.menuFile.insertAction(self.actionExit, self.actionSeekFrame)
+        self.actionSeekTime = QtGui.QAction("Przejdź do czasu...", self)
+        self.actionSeekTime.triggered.connect(self.SeekTime)
+        self.menuFile.insertAction(self.actionExit, self.actionSeekTime)
+        self.threadReplay = None
+
+        # dodanie możliwości równoczesnych pomiarów z kilku oscyloskopów
+        self.actionDevices = QtGui.QAction("Pomiar z wielu urządzeń...", self)
+        self.actionDevices.triggered.connect(self.StartDevices)
+        self.menuFile.insertAction(self.actionExit, self.actionDevices)
+        self.pool = SessionPool(rm, profile)  # sesje korzystają z profili łącza urządzeń
+        self.poolSignals = PoolSignals()
+        self.poolSignals.frameReady.connect(self.ReceiveDeviceFrame)
+        self.deviceFrames = {}  # nazwa urządzenia -> ramki używane przez GUI
+
+        # dodanie panelu z czasami trwania poszczególnych etapów pomiaru
+        self.actionProfile = QtGui.QAction("Pomiar wydajności", self)
+        self.actionProfile.setCheckable(True)
+        self.actionProfile.toggled.connect(self.Profiling)
+        self.menuFile.insertAction(self.actionExit, self.actionProfile)
+        self.actionTrace = QtGui.QAction("Zapisz ślad wydajności...", self)
+        self.actionTrace.triggered.connect(self.SaveTrace)
+        self.menuFile.insertAction(self.actionExit, self.actionTrace)
+        self.profilePanel = QtWidgets.QPlainTextEdit(self)
+        self.profilePanel.setReadOnly(True)
+        self.profilePanel.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.SystemFont.FixedFont))
+        self.profileDock = QtWidgets.QDockWidget("Wydajność", self)
+        self.profileDock.setWidget(self.profilePanel)
+        self.profileDock.visibilityChanged.connect(self.actionProfile.setChecked)
+        self.addDockWidget(QtCore.Qt.DockWidgetArea.BottomDockWidgetArea, self.profileDock)
+        self.profileDock.hide()
+        self.profileTimer = QtCore.QTimer(self)  # odświeżanie panelu niezależnie od liczby ramek
+        self.profileTimer.timeout.connect(self.ShowProfile)
+
+        # dodanie ustawień wyzwalania programowego (rodzaj warunku, kanał, okno przed i po zdarzeniu)
+        self.actionTrigger = QtGui.QAction("Ustawienia wyzwalania...", self)
+        self.actionTrigger.triggered.connect(self.TriggerSettings)
+        self.menuFile.insertAction(self.actionExit, self.actionTrigger)
+
+        # dodanie trybów akumulacji przebiegów (uśrednianie, obwiednia, poświata)
+        self.menuAccumulation = QtWidgets.QMenu("Akumulacja przebiegów", self)
+        self.accumulationGroup = QtGui.QActionGroup(self)
+        for mode, label in ACCUMULATION_MODES.items():
+            action = QtGui.QAction(label, self)
+            action.setCheckable(True)
+            action.setChecked(mode == akumulacja.mode)
+            action.setData(mode)
+            self.accumulationGroup.addAction(action)
+            self.menuAccumulation.addAction(action)
+        self.accumulationGroup.triggered.connect(self.AccumulationMode)
+        self.menuAccumulation.addSeparator()
+        self.actionAccumulationFrames = QtGui.QAction("Liczba ramek akumulacji...", self)
+        self.actionAccumulationFrames.triggered.connect(self.AccumulationFrames)
+        self.menuAccumulation.addAction(self.actionAccumulationFrames)
+        self.menuFile.insertMenu(self.actionExit, self.menuAccumulation)
+
+        # dodanie widoku widma (FFT) liczonego w wątku pomiarowym
+        self.actionSpectrum = QtGui.QAction("Widmo (FFT)", self)
+        self.actionSpectrum.setCheckable(True)
+        self.actionSpectrum.toggled.connect(self.Spectrum)
+        self.menuFile.insertAction(self.actionExit, self.actionSpectrum)
+        self.spectrumDock = None
+        self.analyzer = SpectrumAnalyzer()
+
+        # dodanie panelu jakości energii (moce w kolejnych okresach, harmoniczne, THD i trendy)
+        self.actionPower = QtGui.QAction("Jakość energii", self)
+        self.actionPower.setCheckable(True)
+        self.actionPower.toggled.connect(self.PowerQuality)
+        self.menuFile.insertAction(self.actionExit, self.actionPower)
+        self.powerDock = None
+        self.powerAnalyzer = PowerAnalyzer()
+
+        # dodanie kanałów matematycznych definiowanych wyrażeniami na pobranych kanałach
+        self.actionMath = QtGui.QAction("Kanały matematyczne...", self)
+        self.actionMath.triggered.connect(self.MathSettings)
+        self.menuFile.insertAction(self.actionExit, self.actionMath)
+
         # przypisanie akcji actionExit metody quit()
         self.actionExit.triggered.connect(QtCore.QCoreApplication.instance().quit)
 
@@ -232,11 +264,18 @@ class Oscilloscope(QtWidgets.QMainWindow):
         self.ThreadClass = ThreadClass()
         self.ThreadClassTwoCh = ThreadClassTwoChannel()
 
-        # dodanie do Widgetu ComboBox(ListOfDevices) dostępnych urządzeń
-        self.ListOfDevices.addItems(devices)
+        # dodanie do Widgetu ComboBox(ListOfDevices) ostatnio znalezionych urządzeń; aktualna lista jest
+        # wyszukiwana w tle, dzięki czemu okno otwiera się od razu
+        self.ListOfDevices.addItems(rm.cached())
         self.ListOfDevices.setPlaceholderText("--Wybierz Urządzenie--")
         self.ListOfDevices.setCurrentIndex(-1)
         self.ListOfDevices.currentIndexChanged.connect(self.Connection)
+        self.threadDevices = ThreadClassDevices()
+        self.threadDevices.found.connect(self.DevicesFound)
+        self.threadDevices.failed.connect(lambda error: self.statusBar().showMessage(
+            "Nie udało się wyszukać urządzeń: " + error))
+        self.threadDevices.start()
+        self.statusBar().showMessage("Wyszukiwanie urządzeń...")
 
         # dodanie do Widgetu comboBoxCanals wybranych kanałów
         self.comboBoxCanals.addItem("Channel 1")
@@ -259,6 +298,7 @@ class Oscilloscope(QtWidgets.QMainWindow):
         toolbar = NavigationToolbar2QT(self.canvas, self)
         self.ui.gridLayout_6.addWidget(toolbar)
         self.ui.gridLayout_6.addWidget(self.canvas)
+        self.renderer = PlotRenderer(self.canvas, release=self.ReleaseFrame)
 
         # początkowe ukrycie elementów odpowiedzialnych za wyświetlanie wyników pomiarów
         self.widget2CH.hide()
@@ -267,48 +307,548 @@ class Oscilloscope(QtWidgets.QMainWindow):
         # przypisanie wartości początkowej poszczególnym zmiennym
         self.DeviceNumber = -1
         self.ChannelNumber = -1
+        self.ChannelName = "CH1"  # nazwa kanału wyświetlanego w widoku jednego kanału
         self.Mode = -1
         self.isChacked = False
-        self.ThreadClass.isOnChacked(self.isChacked)
+        wyzwalanie.configure(enabled=self.isChacked, level=self.doubleSpinBoxMax.value())
+        self.heldFrames = []  # ramka aktualnie wyświetlana (rysowane ramki przechowuje też renderer)
+        self.exportFrames = []  # ramki, których dane są właśnie zapisywane do pliku
+
+    # funkcja włączająca/wyłączająca pomiar czasu trwania etapów oraz panel z wynikami
+    def Profiling(self, checked):
+        if checked == profiler.enabled:
+            return
+        profiler.enabled = checked
+        if checked:
+            profiler.reset()
+            self.profileDock.show()
+            self.profileTimer.start(500)
+        else:
+            self.profileTimer.stop()
+            self.profileDock.hide()
+
+    def ShowProfile(self):
+        self.profilePanel.setPlainText(profiler.report())
+
+    # okno z ustawieniami wyzwalania programowego (poziom i włączenie ustawiane są w oknie głównym)
+    def TriggerSettings(self):
+        dialog = QtWidgets.QDialog(self)
+        dialog.setWindowTitle("Ustawienia wyzwalania")
+        comboBoxKind = QtWidgets.QComboBox()
+        comboBoxKind.addItems(TRIGGER_KINDS.values())
+        comboBoxKind.setCurrentIndex(list(TRIGGER_KINDS).index(wyzwalanie.kind))
+        comboBoxChannel = QtWidgets.QComboBox()
+        comboBoxChannel.addItems(["Channel 1", "Channel 2"])
+        comboBoxChannel.setCurrentIndex(wyzwalanie.channel - 1)
+
+        def spinBox(value, suffix, maximum=500.0, decimals=3):
+            widget = QtWidgets.QDoubleSpinBox()
+            widget.setDecimals(decimals)
+            widget.setRange(-maximum if suffix == " V" else 0.0, maximum)
+            widget.setSuffix(suffix)
+            widget.setValue(value)
+            return widget
+
+        spinBoxUpper = spinBox(wyzwalanie.upper, " V")
+        spinBoxHysteresis = spinBox(wyzwalanie.hysteresis, " V")
+        spinBoxMinWidth = spinBox(wyzwalanie.min_width * 1e6, " us", 1e9)
+        spinBoxMaxWidth = spinBox(min(wyzwalanie.max_width * 1e6, 1e9), " us", 1e9)
+        spinBoxPre = spinBox(wyzwalanie.pre * 1e3, " ms", 1e6)
+        spinBoxPost = spinBox(wyzwalanie.post * 1e3, " ms", 1e6)
+        checkBoxStop = QtWidgets.QCheckBox("Zatrzymaj pomiary po wyzwoleniu")
+        checkBoxStop.setChecked(wyzwalanie.stop)
+
+        layout = QtWidgets.QFormLayout(dialog)
+        layout.addRow("Rodzaj:", comboBoxKind)
+        layout.addRow("Kanał:", comboBoxChannel)
+        layout.addRow("Górny próg (okno, runt):", spinBoxUpper)
+        layout.addRow("Histereza zboczy:", spinBoxHysteresis)
+        layout.addRow("Min. szerokość impulsu:", spinBoxMinWidth)
+        layout.addRow("Maks. szerokość impulsu:", spinBoxMaxWidth)
+        layout.addRow("Przed zdarzeniem:", spinBoxPre)
+        layout.addRow("Po zdarzeniu:", spinBoxPost)
+        layout.addRow(checkBoxStop)
+        buttons = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.StandardButton.Ok |
+                                             QtWidgets.QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(dialog.accept)
+        buttons.rejected.connect(dialog.reject)
+        layout.addRow(buttons)
+        if not dialog.exec():
+            return
+
+        wyzwalanie.configure(kind=list(TRIGGER_KINDS)[comboBoxKind.currentIndex()],
+                             channel=comboBoxChannel.currentIndex() + 1,
+                             upper=spinBoxUpper.value(), hysteresis=spinBoxHysteresis.value(),
+                             min_width=spinBoxMinWidth.value() * 1e-6, max_width=spinBoxMaxWidth.value() * 1e-6,
+                             pre=spinBoxPre.value() * 1e-3, post=spinBoxPost.value() * 1e-3,
+                             stop=checkBoxStop.isChecked())
+
+    # funkcja zmieniająca tryb akumulacji przebiegów (akumulacja rozpoczyna się od nowa)
+    def AccumulationMode(self, action):
+        akumulacja.configure(mode=action.data())
+
+    def AccumulationFrames(self):
+        frames, ok = QtWidgets.QInputDialog.getInt(self, "Akumulacja przebiegów",
+                                                   "Liczba ramek (uśrednianie, obwiednia):", akumulacja.frames, 1, 100000)
+        if ok:
+            akumulacja.configure(frames=frames)
+
+    # wyrysowanie wyniku akumulacji zamiast ostatniej ramki (poświata jako jeden obraz pod przebiegami)
+    def PlotAccumulated(self, accumulated, title):
+        lines, image = accumulated
+        self.renderer.configure([label for label, trace in lines], f"{title} - {ACCUMULATION_MODES[akumulacja.mode]}")
+        self.renderer.submit([trace for label, trace in lines], image)
+
+    # funkcja włączająca/wyłączająca widok widma
+    def Spectrum(self, checked):
+        global widmo
+        if self.spectrumDock is None:
+            self.CreateSpectrumDock()
+        if checked:
+            self.analyzer.reset()
+            widmo = self.analyzer
+            self.spectrumDock.show()
+        else:
+            widmo = None
+            self.spectrumDock.hide()
+
+    # stworzenie panelu z wykresem widma oraz ustawieniami analizy
+    def CreateSpectrumDock(self):
+        self.comboBoxWindow = QtWidgets.QComboBox()
+        self.comboBoxWindow.addItems(WINDOWS)
+        self.comboBoxWindow.setCurrentText(self.analyzer.window)
+        self.comboBoxSegment = QtWidgets.QComboBox()
+        self.comboBoxSegment.addItems([str(2 ** power) for power in range(10, 21)])
+        self.comboBoxSegment.setCurrentText(str(self.analyzer.segment))
+        self.comboBoxAveraging = QtWidgets.QComboBox()
+        self.comboBoxAveraging.addItems(AVERAGING)
+        self.spinBoxAverages = QtWidgets.QSpinBox()
+        self.spinBoxAverages.setRange(1, 1000)
+        self.spinBoxAverages.setValue(self.analyzer.frames)
+        self.labelPeak = QtWidgets.QLabel()
+        for widget in (self.comboBoxWindow, self.comboBoxSegment, self.comboBoxAveraging):
+            widget.currentIndexChanged.connect(self.SpectrumSettings)
+        self.spinBoxAverages.valueChanged.connect(self.SpectrumSettings)
+
+        settings = QtWidgets.QHBoxLayout()
+        for label, widget in (("Okno", self.comboBoxWindow), ("Segment", self.comboBoxSegment),
+                              ("Uśrednianie", self.comboBoxAveraging), ("Ramki", self.spinBoxAverages)):
+            settings.addWidget(QtWidgets.QLabel(label))
+            settings.addWidget(widget)
+        settings.addStretch()
+        settings.addWidget(self.labelPeak)
+
+        self.spectrumCanvas = MplCanvas(self, width=5, height=3)
+        self.spectrumRenderer = PlotRenderer(self.spectrumCanvas)
+        layout = QtWidgets.QVBoxLayout()
+        layout.addLayout(settings)
+        layout.addWidget(NavigationToolbar2QT(self.spectrumCanvas, self))
+        layout.addWidget(self.spectrumCanvas)
+        widget = QtWidgets.QWidget()
+        widget.setLayout(layout)
+
+        self.spectrumDock = QtWidgets.QDockWidget("Widmo (FFT)", self)
+        self.spectrumDock.setWidget(widget)
+        self.spectrumDock.visibilityChanged.connect(self.actionSpectrum.setChecked)
+        self.addDockWidget(QtCore.Qt.DockWidgetArea.RightDockWidgetArea, self.spectrumDock)
+
+    # przekazanie ustawień z panelu widma do analizatora
+    def SpectrumSettings(self):
+        self.analyzer.configure(window=self.comboBoxWindow.currentText(),
+                                segment=int(self.comboBoxSegment.currentText()),
+                                averaging=self.comboBoxAveraging.currentText(),
+                                frames=self.spinBoxAverages.value(),
+                                alpha=1 / self.spinBoxAverages.value())
+
+    # wyrysowanie widm obliczonych w wątku pomiarowym
+    def ShowSpectrum(self, spectra):
+        if not spectra or widmo is None:
+            return
+        self.spectrumRenderer.configure([f"CH{channel}" for channel, frequency, decibels, peak in spectra], "Widmo",
+                                        "Częstotliwość [Hz]", "dBV")
+        self.spectrumRenderer.submit([MinMaxPyramid(decibels, 0.0, frequency[1] if frequency.size > 1 else 1.0)
+                                      for channel, frequency, decibels, peak in spectra])
+        self.labelPeak.setText("Największy prążek: " + ", ".join(f"CH{channel} {round(peak, 1)} Hz"
+                                                                for channel, frequency, decibels, peak in spectra))
+
+    # funkcja pozwalająca na zdefiniowanie kanałów matematycznych (jeden kanał w wierszu)
+    def MathSettings(self):
+        text, accepted = QtWidgets.QInputDialog.getMultiLineText(
+            self, "Kanały matematyczne",
+            "Jeden kanał w wierszu, np. P = CH1 * CH2\n"
+            "Dostępne: CH1..CH4, t, dt, pi, e, + - * / ** %, abs, sqrt, exp, log, log10, sin, cos, tan, sign, "
+            "minimum, maximum, clip, integral(x), derivative(x)", matematyka.text())
+        if not accepted:
+            return
+        try:
+            matematyka.configure(MathChannels.parse(text))
+        except MathError as error:
+            msg = QtWidgets.QMessageBox()
+            msg.setWindowTitle("Błąd!")
+            msg.setText(f"Niepoprawna definicja kanału matematycznego!\n{error}")
+            msg.exec()
+
+    # funkcja włączająca/wyłączająca panel jakości energii
+    def PowerQuality(self, checked):
+        global jakosc
+        if self.powerDock is None:
+            self.CreatePowerDock()
+        if checked:
+            self.powerAnalyzer.reset()
+            jakosc = self.powerAnalyzer
+            self.powerDock.show()
+        else:
+            jakosc = None
+            self.powerDock.hide()
+
+    # stworzenie panelu z wynikami analizy jakości energii oraz wyborem wykresu
+    def CreatePowerDock(self):
+        self.comboBoxPowerView = QtWidgets.QComboBox()
+        self.comboBoxPowerView.addItems(["Moce w okresach", "Harmoniczne", "Trend"])
+        self.labelPower = QtWidgets.QLabel()
+        self.labelPower.setTextInteractionFlags(QtCore.Qt.TextInteractionFlag.TextSelectableByMouse)
+        settings = QtWidgets.QHBoxLayout()
+        settings.addWidget(QtWidgets.QLabel("Wykres"))
+        settings.addWidget(self.comboBoxPowerView)
+        settings.addStretch()
+
+        self.powerCanvas = MplCanvas(self, width=5, height=3)
+        self.powerRenderer = PlotRenderer(self.powerCanvas)
+        layout = QtWidgets.QVBoxLayout()
+        layout.addLayout(settings)
+        layout.addWidget(self.labelPower)
+        layout.addWidget(NavigationToolbar2QT(self.powerCanvas, self))
+        layout.addWidget(self.powerCanvas)
+        widget = QtWidgets.QWidget()
+        widget.setLayout(layout)
+
+        self.powerDock = QtWidgets.QDockWidget("Jakość energii", self)
+        self.powerDock.setWidget(widget)
+        self.powerDock.visibilityChanged.connect(self.actionPower.setChecked)
+        self.addDockWidget(QtCore.Qt.DockWidgetArea.RightDockWidgetArea, self.powerDock)
+
+    # wyświetlenie wyników analizy jakości energii obliczonych w wątku pomiarowym
+    def ShowPower(self, result):
+        if result is None or jakosc is None:
+            return
+
+        def value(measured, unit, digits=3):
+            return "********" if measured == 9.9e+37 else f"{round(measured, digits)} {unit}".rstrip()
+
+        self.labelPower.setText(f"f {value(result.frequency, 'Hz')} | P {value(result.P, 'W')} | "
+                                f"Q {value(result.Q, 'Var')} | S {value(result.S, 'VA')} | PF {value(result.PF, '')} | "
+                                f"φ {value(result.phase, '°', 1)} | THD U {value(result.THDu, '%', 2)} | "
+                                f"THD I {value(result.THDi, '%', 2)} | okresy {result.cycles.size}")
+
+        view = self.comboBoxPowerView.currentIndex()
+        if view == 0:  # moce w kolejnych okresach podstawowej bieżącej ramki
+            if not result.cycles.size:
+                return
+            self.powerRenderer.configure(["P [W]", "Q [Var]", "S [VA]"], "Moce w okresach", "Okres", "W, Var, VA")
+            self.powerRenderer.submit([MinMaxPyramid(result.cycles[name], 0.0, 1.0) for name in ("P", "Q", "S")])
+        elif view == 1:  # amplitudy harmonicznych względem podstawowej
+            if result.harmonicsU is None:
+                return
+            self.powerRenderer.configure(["CH1 (U)", "CH2 (I)"], "Harmoniczne", "Rząd harmonicznej", "%")
+            self.powerRenderer.submit([MinMaxPyramid(100 * numpy.abs(amplitudes) / max(abs(amplitudes[0]), 1e-30),
+                                                     1.0, 1.0)
+                                       for amplitudes in (result.harmonicsU, result.harmonicsI)])
+        else:  # wyniki kolejnych ramek
+            trend = jakosc.trend()
+            self.powerRenderer.configure(["P [W]", "Q [Var]", "S [VA]"], "Trend", "Ramka", "W, Var, VA")
+            self.powerRenderer.submit([MinMaxPyramid(trend[name], 0.0, 1.0) for name in ("P", "Q", "S")])
+
+    # funkcja zapisująca zebrane czasy etapów w formacie Chrome Trace Event (do analizy np. w Perfetto)
+    def SaveTrace(self):
+        name, selected = QtWidgets.QFileDialog.getSaveFileName(self, 'Zapisz ślad wydajności', filter="Trace (*.json)")
+        if not name:
+            return
+        if not name.endswith('.json'):
+            name += '.json'
+        try:
+            count = profiler.export_trace(name)
+        except OSError as error:
+            msg = QtWidgets.QMessageBox()
+            msg.setWindowTitle("Błąd!")
+            msg.setText("Nie udało się zapisać śladu: " + str(error))
+            msg.exec()
+            return
+        self.statusBar().showMessage(f"Zapisano {count} zdarzeń do pliku {name}")
 
     # funkcja odpowiedzialna za zapis danych do pliku txt
     def SaveFile(self):
         try:
-            name = QtWidgets.QFileDialog.getSaveFileName(self, "Save File", " ", "All Files(*);;Text Files(*.txt)")
-            file = open(name[0], 'w')
+            name, selected = QtWidgets.QFileDialog.getSaveFileName(self, "Save File", " ", ";;".join(EXPORT_FORMATS))
+            if not name:
+                return
+            frame = self.heldFrames[-1]  # aktualnie wyświetlana ramka
 
-            if self.ChannelNumber == 0 or self.ChannelNumber == 1:
-                time = czas
-                data = datasend
+            if len(frame.records) == 1:
+                names = [self.ChannelName]
+            else:
+                names = [f"CH{index + 1}" for index in range(len(frame.records))]
+            volts = [trace.data for trace in frame.payload[:len(frame.records)]]
+            raws = [raw for raw, preamble in frame.records]
+            preambles = [preamble for raw, preamble in frame.records]
+            for number, channel, trace in frame.math or []:  # kanały matematyczne liczone dopiero przy zapisie
+                data = getattr(trace, 'data', trace)
+                names.append(channel)
+                volts.append(data)
+                if EXPORT_FORMATS[selected] == 'raw':
+                    raw, preamble = (data.raw, data.preamble) if isinstance(data, RawWaveform) else data.encode()
+                    raws.append(raw)
+                    preambles.append(preamble)
+            XINC, XREF = preambles[0][0], preambles[0][1]
+
+        except:
+            msg = QtWidgets.QMessageBox()
+            msg.setWindowTitle("Błąd!")
+            msg.setText("Poprawnie wybierz nazwe pliku\nlub najpierw dokonaj pomiaru!")
+            msg.exec()
+            return
+
+        # zapis w osobnym wątku; ramka nie wraca do pierścienia, dopóki zapis się nie zakończy
+        self.exportFrames.append(frame)
+        self.threadExport = ThreadClassExport(name, EXPORT_FORMATS[selected], names, volts, XREF, XINC, raws, preambles,
+                                              frame)
+        self.threadExport.progress.connect(self.ExportProgress)
+        self.threadExport.finishedExport.connect(self.ExportFinished)
+        self.threadExport.start()
+
+    # funkcja odpowiedzialna za rozpoczęcie i zakończenie nagrywania ramek do pliku
+    def Recording(self, checked):
+        global rejestrator
+        if checked:
+            name, _ = QtWidgets.QFileDialog.getSaveFileName(self, "Nagrywanie", " ", "Nagranie (*.dat)")
+            if not name:
+                self.actionRecord.setChecked(False)
+                return
+            try:
+                rejestrator = Recorder(name)
+            except:
+                msg = QtWidgets.QMessageBox()
+                msg.setWindowTitle("Błąd!")
+                msg.setText("Nie można utworzyć pliku nagrania!")
+                msg.exec()
+                self.actionRecord.setChecked(False)
 
-                file.write(f"CH{self.ChannelNumber + 1} [V],Czas [S]\n")
-                for i, x in enumerate(data):
-                    file.write(f'{x},{time[i]}\n')
-                file.close()
+        elif rejestrator is not None:
+            recorder, rejestrator = rejestrator, None
+            try:
+                recorder.close()
+            except Exception as error:
+                msg = QtWidgets.QMessageBox()
+                msg.setWindowTitle("Błąd!")
+                msg.setText(f"Nagrywanie zakończone z błędem!\n{error}")
+                msg.exec()
 
-            elif self.ChannelNumber == 2:
-                time1 = czas1
-                data1 = dataToSave1
-                data2 = dataToSave2
+    # funkcja odpowiedzialna za uruchomienie i zatrzymanie serwera udostępniającego ramki
+    def Streaming(self, checked):
+        global serwer
+        if checked:
+            try:
+                serwer = FrameServer(port=STREAM_PORT)
+            except OSError as error:
+                msg = QtWidgets.QMessageBox()
+                msg.setWindowTitle("Błąd!")
+                msg.setText(f"Nie można uruchomić serwera ramek!\n{error}")
+                msg.exec()
+                self.actionServer.setChecked(False)
 
-                file.write("CH1 [V],CH2 [V],Czas [S]\n")
-                for i, x in enumerate(data1):
-                    file.write(f'{x},{data2[i]},{time1[i]}\n')
-                file.close()
+        elif serwer is not None:
+            server, serwer = serwer, None
+            server.close()
 
-            else:
-                file.close()
+    # funkcja odpowiedzialna za uruchomienie i zatrzymanie puli procesów analizujących długie rekordy
+    def Analysis(self, checked):
+        global analiza
+        if checked:
+            try:
+                analiza = AnalysisExecutor()
+            except OSError as error:
+                msg = QtWidgets.QMessageBox()
+                msg.setWindowTitle("Błąd!")
+                msg.setText(f"Nie można uruchomić puli procesów!\n{error}")
+                msg.exec()
+                self.actionAnalysis.setChecked(False)
+
+        elif analiza is not None:
+            executor, analiza = analiza, None
+            executor.close()
+
+    # funkcja odpowiedzialna za uruchomienie odtwarzania nagrania w miejsce pomiarów z oscyloskopu
+    def Replay(self):
+        name, _ = QtWidgets.QFileDialog.getOpenFileName(self, "Odtwórz nagranie", " ", "Nagranie (*.dat)")
+        if not name:
+            return
+        rate, accepted = QtWidgets.QInputDialog.getDouble(self, "Odtwarzanie", "Liczba ramek na sekundę:", 10, 0.1,
+                                                          1000, 1)
+        if not accepted:
+            return
+        try:
+            source = ReplaySource(name, rate)
+            channels = display_channels(source.channels())
+        except ValueError as error:  # nagranie kanałów, których nie można pokazać w widokach GUI
+            msg = QtWidgets.QMessageBox()
+            msg.setWindowTitle("Błąd!")
+            msg.setText(str(error))
+            msg.exec()
+            return
+        except:
+            msg = QtWidgets.QMessageBox()
+            msg.setWindowTitle("Błąd!")
+            msg.setText("Nie można otworzyć nagrania!")
+            msg.exec()
+            return
+
+        if self.threadReplay is not None:
+            self.threadReplay.stop()
 
+        # nagrany kanał wyświetlany jest pod własną nazwą, kanały 1 i 2 - w widoku dwóch kanałów
+        if len(channels) == 1:
+            self.ChannelName = f"CH{channels[0]}"
+            self.widgetCH.show()
+            self.widget2CH.hide()
+        else:
+            self.widgetCH.hide()
+            self.widget2CH.show()
+
+        self.pushButtonMeasure.setEnabled(False)
+        self.threadReplay = ThreadClassReplay(source, channels)
+        self.threadReplay.signal.connect(self.ReceiveFrame)
+        self.threadReplay.signalTwoChannel.connect(self.ReceiveFrameTwoChannel)
+        self.threadReplay.failed.connect(self.MeasureFailed)
+        self.threadReplay.finished.connect(lambda: self.pushButtonMeasure.setEnabled(True))
+        self.threadReplay.start()
+
+    # funkcja aktualizująca listę urządzeń po zakończeniu wyszukiwania (wybrane urządzenie pozostaje wybrane)
+    def DevicesFound(self, devices):
+        current = self.ListOfDevices.currentText() if self.ListOfDevices.currentIndex() >= 0 else None
+        self.ListOfDevices.blockSignals(True)
+        self.ListOfDevices.clear()
+        self.ListOfDevices.addItems(devices)
+        if current is not None and current not in devices:
+            self.ListOfDevices.addItem(current)  # połączone urządzenie pozostaje na liście
+        self.ListOfDevices.setCurrentIndex(self.ListOfDevices.findText(current) if current is not None else -1)
+        self.ListOfDevices.blockSignals(False)
+        self.statusBar().showMessage(f"Znaleziono urządzeń: {len(devices)}")
+
+    # funkcja odpowiedzialna za wybór kilku urządzeń z listy dostępnych urządzeń
+    def ChooseDevices(self):
+        dialog = QtWidgets.QDialog(self)
+        dialog.setWindowTitle("Wybierz urządzenia")
+        layout = QtWidgets.QVBoxLayout(dialog)
+        listWidget = QtWidgets.QListWidget()
+        listWidget.addItems([self.ListOfDevices.itemText(index) for index in range(self.ListOfDevices.count())])
+        listWidget.setSelectionMode(QtWidgets.QAbstractItemView.SelectionMode.MultiSelection)
+        buttons = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.StandardButton.Ok |
+                                             QtWidgets.QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(dialog.accept)
+        buttons.rejected.connect(dialog.reject)
+        layout.addWidget(listWidget)
+        layout.addWidget(buttons)
+        if dialog.exec() != QtWidgets.QDialog.DialogCode.Accepted:
+            return []
+        return [item.text() for item in listWidget.selectedItems()]
+
+    # funkcja odpowiedzialna za uruchomienie równoczesnych pomiarów z wybranych urządzeń
+    def StartDevices(self):
+        names = self.ChooseDevices()
+        if not names:
+            return
+        channel = self.ChannelNumber + 1 if self.ChannelNumber in (0, 1) else 1
+        try:
+            for name in names:
+                self.pool.open(name, channel)
         except:
+            self.pool.close_all()
             msg = QtWidgets.QMessageBox()
             msg.setWindowTitle("Błąd!")
-            msg.setText("Poprawnie wybierz nazwe pliku\nlub najpierw dokonaj pomiaru!")
+            msg.setText("Wybrane urządzenie nie jest wspierane!")
+            msg.exec()
+            return
+
+        self.widgetCH.hide()
+        self.widget2CH.hide()
+        self.pushButtonMeasure.setEnabled(False)
+        self.deviceFrames = {}
+        self.renderer.configure(names, "Wiele urządzeń")
+        self.pool.start(on_frame=lambda session: self.poolSignals.frameReady.emit(session.name),
+                        on_capture=self.RecordDeviceFrame)
+
+    # funkcja wywoływana w wątku urządzenia - zapis ramki oznaczonej nazwą urządzenia do nagrania
+    def RecordDeviceFrame(self, session, frame):
+        recorder, server = rejestrator, serwer
+        if recorder is not None or server is not None:
+            raw, preamble = frame.records[0]
+            pyramid, XINC, XREF, frq, max, min, rms = frame.payload
+            records = [(session.channel, raw, preamble, (max, min, rms, frq))]
+            if recorder is not None:
+                recorder.submit(records, device=session.name)
+            if server is not None:
+                server.publish(records, device=session.name)
+
+    # funkcja odpowiedzialna za wyświetlenie najnowszych ramek ze wszystkich urządzeń
+    def ReceiveDeviceFrame(self, name):
+        session = self.pool.sessions.get(name)
+        if session is None:
+            return
+        frame = session.ring.take()
+        if frame is None:
+            return
+        held = self.deviceFrames.setdefault(name, [])
+        held.append(frame)
+        if len(held) > 1:
+            self.ReleaseFrame(held.pop(0))
+
+        names = list(self.pool.sessions)
+        frames = [self.deviceFrames[device][-1] for device in names if self.deviceFrames.get(device)]
+        if len(frames) == len(names):
+            self.renderer.submit([frame.payload[0] for frame in frames], frames=frames)
+
+        summary = ", ".join(f"{device}: {held[-1].payload[6]:.3f} V rms" for device, held in self.deviceFrames.items())
+        self.statusBar().showMessage(summary)
+
+    # funkcja odpowiedzialna za przejście do wybranej ramki odtwarzanego nagrania
+    def SeekFrame(self):
+        if self.threadReplay is None:
+            return
+        source = self.threadReplay.source
+        frame, accepted = QtWidgets.QInputDialog.getInt(self, "Odtwarzanie", f"Numer ramki (0 - {len(source) - 1}):",
+                                                        source.position, 0, max(len(source) - 1, 0))
+        if accepted:
+            source.seek(frame)
+
+    # funkcja odpowiedzialna za przejście do wybranego czasu odtwarzanego nagrania
+    def SeekTime(self):
+        if self.threadReplay is None:
+            return
+        source = self.threadReplay.source
+        seconds, accepted = QtWidgets.QInputDialog.getDouble(self, "Odtwarzanie", "Czas od początku nagrania [S]:",
+                                                             0, 0, 1e9, 3)
+        if accepted:
+            source.seek_time(seconds)
+
+    # funkcja odpowiedzialna za wyświetlenie postępu zapisu danych
+    def ExportProgress(self, percent):
+        self.statusBar().showMessage(f"Zapis danych: {percent}%")
+
+    # funkcja wywoływana po zakończeniu zapisu danych (error - opis błędu lub pusty tekst)
+    def ExportFinished(self, frame, error):
+        self.exportFrames.remove(frame)
+        self.ReleaseFrame(frame)
+
+        if error:
+            msg = QtWidgets.QMessageBox()
+            msg.setWindowTitle("Błąd!")
+            msg.setText(f"Zapis danych nie powiódł się!\n{error}")
             msg.exec()
+        else:
+            self.statusBar().showMessage("Zapis danych zakończony")
 
-    # funkcja odpowiedzalna za przesłanie aktualnie wybranej wartości napięcia wyzwolania do klas ThreadClass i ThreadClassTwoCh
+    # funkcja odpowiedzalna za przesłanie aktualnie wybranej wartości napięcia wyzwolania do wyzwalania programowego
     def GetMaxValue(self, value):
-        self.ThreadClass.getMaxValue(value)
-        self.ThreadClassTwoCh.getMaxValue(value)
+        wyzwalanie.configure(level=value)
 
     # funkcja odpowiedzalna za przesłanie aktualnie wybranego trybu pomiaru do klas ThreadClass i ThreadClassTwoCh
     def MeasureMode(self, value):
@@ -316,26 +856,24 @@ class Oscilloscope(QtWidgets.QMainWindow):
         self.ThreadClassTwoCh.getMode(value)
         self.Mode = value
 
-    # funkcja odpowiedzalna za przesłanie aktualnie flagi do klas ThreadClass i ThreadClassTwoCh
+    # funkcja odpowiedzalna za włączenie/wyłączenie wyzwalania programowego (wspólnego dla jednego i dwóch kanałów)
     def RadioButtonOnClicked(self):
         self.isOnChacked = True
-        self.ThreadClass.isOnChacked(self.isOnChacked)
-        self.ThreadClassTwoCh.isOnChacked(self.isOnChacked)
+        wyzwalanie.configure(enabled=self.isOnChacked)
 
-    # funkcja odpowiedzalna za przesłanie aktualnie flagi do klas ThreadClass i ThreadClassTwoCh
+    # funkcja odpowiedzalna za włączenie/wyłączenie wyzwalania programowego (wspólnego dla jednego i dwóch kanałów)
     def RadioButtonOffClicked(self):
         self.isOnChacked = False
-        self.ThreadClass.isOnChacked(self.isOnChacked)
-        self.ThreadClassTwoCh.isOnChacked(self.isOnChacked)
+        wyzwalanie.configure(enabled=self.isOnChacked)
 
     # funkcja odpowiedzialna za wybranie urządzenia z listy urządzeń i ustawienie jako domyślny
     def Connection(self, value):
-        global oscyloskop
+        global oscyloskop, lacze
         self.DeviceNumber = value
         try:
             oscyloskop = rm.open_resource(self.ListOfDevices.currentText())
-            oscyloskop.write(":WAVeform:MODE RAW")
-            oscyloskop.write(":WAVeform:FORMat BYTE")
+            stan.write(oscyloskop, ":WAVeform:MODE RAW")
+            stan.write(oscyloskop, ":WAVeform:FORMat BYTE")
             sprawdzenie = oscyloskop.query_ascii_values(":WAVeform:XINCrement?")
         except:
             msg = QtWidgets.QMessageBox()
@@ -344,14 +882,51 @@ class Oscilloscope(QtWidgets.QMainWindow):
             msg.exec()
             self.ListOfDevices.setPlaceholderText("--Wybierz Urządzenie--")
             self.ListOfDevices.setCurrentIndex(-1)
+            return
+
+        # ustawienia łącza zapisane przy poprzednim połączeniu; nowe urządzenie jest strojone w tle
+        lacze = profile.get(self.ListOfDevices.currentText())
+        if lacze is not None:
+            lacze.apply(oscyloskop)
+        else:
+            self.Tuning()
+
+    # funkcja odpowiedzialna za dobranie ustawień transferu danych w osobnym wątku (pomiary oraz wybór urządzenia
+    # i kanału są w tym czasie wyłączone, ponieważ wysyłają komendy do strojonego urządzenia)
+    def Tuning(self):
+        if self.DeviceNumber == -1 or self.threadTuning is not None:
+            return
+        self.pushButtonMeasure.setEnabled(False)
+        self.comboBoxCanals.setEnabled(False)
+        self.ListOfDevices.setEnabled(False)
+        self.actionTuning.setEnabled(False)
+        self.statusBar().showMessage("Dostrajanie transferu danych...")
+        self.threadTuning = ThreadClassTuning(oscyloskop, self.ListOfDevices.currentText())
+        self.threadTuning.tuned.connect(self.TuningFinished)
+        self.threadTuning.failed.connect(self.TuningFinished)
+        self.threadTuning.start()
+
+    # funkcja wywoływana po zakończeniu strojenia (link - ustawienia łącza lub opis błędu)
+    def TuningFinished(self, link):
+        global lacze
+        self.threadTuning = None
+        self.pushButtonMeasure.setEnabled(True)
+        self.comboBoxCanals.setEnabled(True)
+        self.ListOfDevices.setEnabled(True)
+        self.actionTuning.setEnabled(True)
+        if isinstance(link, str):
+            self.statusBar().showMessage("Nie udało się dostroić transferu danych: " + link)
+            return
+        lacze = link
+        self.statusBar().showMessage(f"Transfer danych: fragmenty po {link.sample} próbek, "
+                                     f"{link.throughput / 1e6:.1f} MB/s")
 
     # funkcja odpowiedzialna za wybór aktualnego kanału, wywoływana w wybrania kanału
     def ChannelChoice(self, value):
         self.ChannelNumber = value
         if value == 0 or value == 1:
             try:
-                oscyloskop.write(f":WAVeform:SOURce CHANnel{value + 1}")
-                oscyloskop.write(f":MEASure:SOURce CHANnel{value + 1}")
+                select_channel(oscyloskop, value + 1, stan)
             except:
                 msg = QtWidgets.QMessageBox()
                 msg.setWindowTitle("Błąd!")
@@ -361,7 +936,7 @@ class Oscilloscope(QtWidgets.QMainWindow):
                 self.comboBoxCanals.setCurrentIndex(-1)
         else:
             try:
-                oscyloskop.write(f":WAVeform:SOURce CHANnel{1}")
+                select_channel(oscyloskop, 1, stan)
             except:
                 msg = QtWidgets.QMessageBox()
                 msg.setWindowTitle("Błąd!")
@@ -411,11 +986,13 @@ class Oscilloscope(QtWidgets.QMainWindow):
 
             if self.ChannelNumber == 0 or self.ChannelNumber == 1:
 
+                self.ChannelName = f"CH{self.ChannelNumber + 1}"
                 self.widgetCH.show()
                 self.widget2CH.hide()
                 self.thread = ThreadClass(parent=None)
                 self.thread.start()
-                self.thread.signal.connect(self.Measure)
+                self.thread.signal.connect(self.ReceiveFrame)
+                self.thread.failed.connect(self.MeasureFailed)
 
             elif self.ChannelNumber == 2:
 
@@ -423,16 +1000,31 @@ class Oscilloscope(QtWidgets.QMainWindow):
                 self.widget2CH.show()
                 self.threadTwo = ThreadClassTwoChannel(parent=None)
                 self.threadTwo.start()
-                self.threadTwo.signalTwoChannel.connect(self.MeasureTwoChannel)
+                self.threadTwo.signalTwoChannel.connect(self.ReceiveFrameTwoChannel)
+                self.threadTwo.failed.connect(self.MeasureFailed)
 
     # funkcja odpowiedzialna za zatrzymanie procedury odczytywania danych oraz za przerwanie wielowątkowości
     def StopWorker(self):
-        if self.ChannelNumber == 0 or self.ChannelNumber == 1:
+        if self.pool.sessions:
+            self.pool.stop()
+            self.pool.close_all()
+            self.deviceFrames = {}
+            self.pushButtonMeasure.setEnabled(True)
+
+        elif self.threadReplay is not None:
+            self.threadReplay.stop()
+            self.threadReplay = None
+
+        elif self.ChannelNumber == 0 or self.ChannelNumber == 1:
             self.thread.stop()
 
         elif self.ChannelNumber == 2:
             self.threadTwo.stop()
 
+        # zapamiętanie wielkości fragmentu zmniejszonej po błędach odczytu
+        if lacze is not None and lacze.backoffs and self.DeviceNumber != -1:
+            profile.store(self.ListOfDevices.currentText(), lacze)
+
         self.comboBoxCanals.setEnabled(True)
         self.ListOfDevices.setEnabled(True)
         self.pushButtonMeasure.setEnabled(True)
@@ -441,26 +1033,63 @@ class Oscilloscope(QtWidgets.QMainWindow):
         self.radioButtonOn.setEnabled(True)
         self.radioButtonOff.setEnabled(True)
 
+    # funkcja wywoływana, gdy wątek pomiarowy przerwał pracę z powodu błędu
+    def MeasureFailed(self, error):
+        self.StopWorker()
+        msg = QtWidgets.QMessageBox()
+        msg.setWindowTitle("Błąd!")
+        msg.setText("Pomiar został przerwany: " + error)
+        msg.exec()
+
+    # funkcja odpowiedzialna za odebranie najnowszej ramki z pierścienia (starsze ramki są pomijane)
+    def TakeFrame(self):
+        frame = ramki.take()
+        if frame is None:
+            return None
+        self.heldFrames.append(frame)
+        if len(self.heldFrames) > 1:  # zwolnienie bufora ramki, która nie jest już wyświetlana
+            self.ReleaseFrame(self.heldFrames.pop(0))
+        return frame
+
+    # funkcja zwracająca ramkę do jej pierścienia, gdy nie jest już wyświetlana, rysowana ani zapisywana do pliku
+    def ReleaseFrame(self, frame):
+        if frame in self.heldFrames or frame in self.exportFrames or self.renderer.holds(frame):
+            return
+        if frame.device is None:
+            ramki.release(frame)
+        elif frame in self.deviceFrames.get(frame.device, []):
+            return
+        else:
+            session = self.pool.sessions.get(frame.device)
+            if session is not None:  # ramki zamkniętej sesji nie wracają do pierścienia
+                session.ring.release(frame)
+
+    # funkcja wywoływana po opublikowaniu nowej ramki przez wątek pomiarowy dla jednego kanału
+    def ReceiveFrame(self):
+        frame = self.TakeFrame()
+        if frame is not None:
+            self.Measure(*frame.payload, accumulated=frame.accumulated, math=frame.math, frame=frame)
+            self.ShowSpectrum(frame.spectrum)
+
+    # funkcja wywoływana po opublikowaniu nowej ramki przez wątek pomiarowy dla dwóch kanałów
+    def ReceiveFrameTwoChannel(self):
+        frame = self.TakeFrame()
+        if frame is not None:
+            self.MeasureTwoChannel(*frame.payload, accumulated=frame.accumulated, math=frame.math, frame=frame)
+            self.ShowSpectrum(frame.spectrum)
+            self.ShowPower(frame.power)
+
 # funkcja odpowiedzialna za rysowanie przebiegów oraz wyświetlenie wyników pomiarów z wczesniej pobranych danych dla pomiarów w przypadku jednego kanału
-    def Measure(self, data, XINC, XREF, frq, max, min, rms):
-        global czas
-        global datasend
-
-        datasend = data
-
-        czas = numpy.linspace(XREF * 4, XINC * 4 * len(data), len(data))
-        avgValue = numpy.mean(data)
-
-        self.canvas.axes.clear()
-        self.canvas.axes.plot(czas, data, label=f"CH{self.ChannelNumber + 1}")
-        self.canvas.axes.set_xlim(xmin=czas[0], xmax=czas[-1])
-        self.canvas.axes.yaxis.grid(True, linestyle='--')
-        self.canvas.axes.xaxis.grid(True, linestyle='--')
-        self.canvas.axes.set_title(f"CH{self.ChannelNumber + 1}")
-        self.canvas.axes.set_ylabel("V")
-        self.canvas.axes.set_xlabel(f"Czas [S]")
-        self.canvas.axes.legend(loc='upper right')
-        self.canvas.draw()
+    def Measure(self, data, XINC, XREF, frq, max, min, rms, accumulated=None, math=None, frame=None):
+        avgValue = data.data.mean()
+
+        if accumulated is not None:
+            self.PlotAccumulated(accumulated, self.ChannelName)
+        else:
+            math = math or []  # kanały matematyczne rysowane jak pobrane kanały (wartości liczone dla widoku)
+            self.renderer.configure([self.ChannelName] + [name for number, name, trace in math], self.ChannelName)
+            self.renderer.submit([data] + [trace for number, name, trace in math],
+                                 frames=[frame] if frame is not None else ())
 
         self.lineEditMax.setText(str(round(max, 3)) + " V")
         self.lineEditMin.setText(str(round(min, 3)) + " V")
@@ -472,33 +1101,21 @@ class Oscilloscope(QtWidgets.QMainWindow):
         else:
             self.lineEditFreq.setText(str(round(frq, 1)) + " Hz")
 
+        self.ShowStatistics()
+
     # funkcja odpowiedzialna za rysowanie przebiegów oraz wyświetlenie wyników pomiarów z wczesniej pobranych danych dla pomiarów w przypadku dwóch kanałów
     def MeasureTwoChannel(self, data1, data2, XINC1, XINC2, XREF1, XREF2, max1, min1, rms1, max2, min2, rms2, frq1,
-                          frq2, P, S, Q):
-        global czas1
-        global czas2
-        global dataToSave1
-        global dataToSave2
-
-        dataToSave1 = data1
-        dataToSave2 = data2
-
-        czas1 = numpy.linspace(XREF1 * 4, XINC1 * 4 * len(data1), len(data1))
-        czas2 = numpy.linspace(XREF2 * 4, XINC2 * 4 * len(data2), len(data2))
-        avgValue1 = numpy.mean(data1)
-        avgValue2 = numpy.mean(data2)
-
-        self.canvas.axes.clear()
-        self.canvas.axes.plot(czas1, data1, label="CH1")
-        self.canvas.axes.plot(czas2, data2, label="CH2")
-        self.canvas.axes.set_xlim(xmin=czas1[0], xmax=czas1[-1])
-        self.canvas.axes.yaxis.grid(True, linestyle='--')
-        self.canvas.axes.xaxis.grid(True, linestyle='--')
-        self.canvas.axes.set_title(f"CH1 i CH2")
-        self.canvas.axes.set_ylabel("V")
-        self.canvas.axes.set_xlabel(f"Czas [S]")
-        self.canvas.axes.legend(loc='upper right')
-        self.canvas.draw()
+                          frq2, P, S, Q, accumulated=None, math=None, frame=None):
+        avgValue1 = data1.data.mean()
+        avgValue2 = data2.data.mean()
+
+        if accumulated is not None:
+            self.PlotAccumulated(accumulated, "CH1 i CH2")
+        else:
+            math = math or []
+            self.renderer.configure(["CH1", "CH2"] + [name for number, name, trace in math], "CH1 i CH2")
+            self.renderer.submit([data1, data2] + [trace for number, name, trace in math],
+                                 frames=[frame] if frame is not None else ())
 
         self.lineEditCH1Max.setText(str(round(max1, 3)) + " V")
         self.lineEditCH1Min.setText(str(round(min1, 3)) + " V")
@@ -529,12 +1146,30 @@ class Oscilloscope(QtWidgets.QMainWindow):
             self.lineEditPApparent.setText(str(round(S, 3)) + " VA")
             self.lineEditPReactive.setText(str(round(Q, 3)) + " Var")
 
+        self.ShowStatistics()
+
+    # funkcja odpowiedzialna za wyświetlenie na pasku stanu liczby klatek na sekundę i skuteczności pamięci podręcznej
+    def ShowStatistics(self):
+        statistics = stan.statistics()
+        self.statusBar().showMessage(f"{self.renderer.fps():.1f} FPS, pominięte ramki "
+                                     f"{self.renderer.skipped + ramki.dropped} | "
+                                     f"Pamięć podręczna: trafienia {statistics['hits']}, "
+                                     f"chybienia {statistics['misses']}, "
+                                     f"zaoszczędzone zapytania {statistics['saved_queries']}"
+                                     + (f" | Nagrano {rejestrator.frames} ramek, pominięte {rejestrator.dropped}"
+                                        if rejestrator is not None else "")
+                                     + (f" | Odbiorcy TCP: {serwer.clients}, pominięte {serwer.dropped}"
+                                        if serwer is not None else "")
+                                     + (f" | Wyzwolenia: {wyzwalanie.found} w {wyzwalanie.frames} ramkach"
+                                        if wyzwalanie.enabled else ""))
+
 
 
 
 # stworzenie klasy QThread obsługującą wielowątkowość aplikacji dla jednego kanału
 class ThreadClass(QtCore.QThread):
-    signal = QtCore.pyqtSignal(list, float, float, float, float, float, float)
+    signal = QtCore.pyqtSignal()  # sygnał o nowej ramce w pierścieniu ramek
+    failed = QtCore.pyqtSignal(str)  # sygnał o błędzie pomiaru (np. przekroczony czas oczekiwania na oscyloskop)
 
     def __init__(self, parent=None):
         super(ThreadClass, self).__init__(parent)
@@ -544,21 +1179,66 @@ class ThreadClass(QtCore.QThread):
     def run(self):
 
         while True:
-            data, XINC, XREF, frq = program(oscyloskop)
+            # pobieranie danych równolegle z przeliczaniem na volty i obliczaniem wartości max, min i rms
+            frame = acquire_frame(self)  # bufory ramki są używane ponownie w kolejnych pomiarach
+            if frame is None:
+                break
+            try:
+                data, XINC, XREF, frq, (max, min, rms) = program_pipelined(oscyloskop, cache=stan, frame=frame,
+                                                                           link=lacze)
+            except Exception as error:
+                ramki.release(frame)
+                self.failed.emit(str(error))
+                break
+
+            # wyzwalanie programowe: ramki bez zdarzenia nie są przekazywane do GUI ani nagrywane
+            zdarzenia = wyzwalanie.search([data], XINC[0], XREF[0]) if wyzwalanie.enabled else None
+            if zdarzenia is not None and not zdarzenia:
+                ramki.release(frame)
+                if not self.isRunning:
+                    break
+                continue
+
+            analizator = widmo
+            if analizator is not None:  # widmo liczone w wątku pomiarowym, GUI tylko je rysuje
+                frame.spectrum = [(stan.source or 1, *compute_spectrum(analizator, data, XINC[0], stan.source or 1))]
+
+            # kanały matematyczne (wartości liczone dopiero przy rysowaniu, zapisie lub nagrywaniu)
+            kanaly = matematyka.bind({stan.source or 1: data}, XINC[0], XREF[0])
+
+            recorder, server = rejestrator, serwer
+            if recorder is not None or server is not None:
+                raw, preamble = frame.records[0]
+                records = [(stan.source or 1, raw, preamble, (max, min, rms, frq[0]))] + math_records(kanaly, frame)
+                if recorder is not None:  # zapis ramki do pliku odbywa się w wątku rejestratora
+                    recorder.submit(records)
+                if server is not None:  # wysyłanie do odbiorców odbywa się w wątkach serwera
+                    server.publish(records)
+
+            if zdarzenia:  # wyświetlany jest tylko fragment wokół ostatniego zdarzenia
+                czas, x0, (data,) = zdarzenia[-1]
+                XREF = [x0]
+                frame.records = [(data.raw, data.preamble)]  # zapis do pliku obejmuje wyświetlany fragment
+                max, min, rms = measure(data)
+                kanaly = matematyka.bind({stan.source or 1: data}, XINC[0], XREF[0])
+            frame.math = kanaly  # wyrażenia liczone w GUI tylko dla punktów widocznego fragmentu wykresu
+
+            # zbudowanie piramidy obwiedni min/max zamiast odrzucania próbek (widoczne są wszystkie szpilki)
+            przebieg = MinMaxPyramid(data, XREF[0], XINC[0])
+
+            if akumulacja.enabled:  # akumulacja w wątku pomiarowym, GUI rysuje tylko jej wynik
+                frame.accumulated = akumulacja.add([(f"CH{stan.source or 1}", data)], XREF[0], XINC[0])
 
-            x = numpy.array(data)
-            x = numpy.delete(x, numpy.arange(0, x.size, 2))
-            x1 = numpy.array(x)
-            x1 = numpy.delete(x1, numpy.arange(0, x1.size, 2))
-            max, min, rms = measure(x1)
             if self.isRunning:
-                self.signal.emit(x1, XINC[0], XREF[0], frq[0], max, min, rms)
+                frame.payload = przebieg, XINC[0], XREF[0], frq[0], max, min, rms
+                ramki.publish(frame)
+                self.signal.emit()
             else:
+                ramki.release(frame)
                 break
 
-            if isChecked:
-                if max >= MaxValue:
-                    break
+            if zdarzenia and wyzwalanie.stop:
+                break
 
             if Mode == 0:
                 break
@@ -572,21 +1252,11 @@ class ThreadClass(QtCore.QThread):
         global Mode
         Mode = value
 
-    # funkcja pobierająca aktualną wartość wyzwalania
-    def getMaxValue(self, value):
-        global MaxValue
-        MaxValue = value
-
-    # funkcja pobierająca aktualny stan widgetów RadioButtonOn/Off
-    def isOnChacked(self, OnChecked):
-        global isChecked
-        isChecked = OnChecked
-
 
 # funkcja wywoływana w momencie startu porcedury wielowątkowości dla dwóch kanałów
 class ThreadClassTwoChannel(QtCore.QThread):
-    signalTwoChannel = QtCore.pyqtSignal(list, list, float, float, float, float, float, float, float, float,
-                                               float, float, float, float, float, float, float)
+    signalTwoChannel = QtCore.pyqtSignal()  # sygnał o nowej ramce w pierścieniu ramek
+    failed = QtCore.pyqtSignal(str)  # sygnał o błędzie pomiaru
 
     def __init__(self, parent=None):
         super(ThreadClassTwoChannel, self).__init__(parent)
@@ -596,34 +1266,84 @@ class ThreadClassTwoChannel(QtCore.QThread):
     def run(self):
 
         while True:
-            daneTwoChannel1, daneTwoChannel2, XINCTwoChannel1, XINCTwoChannel2, XREFTwoChannel1, XREFTwoChannel2, frqTwoChannel1, frqTwoChannel2 = programTwoChannel(
-                oscyloskop)
-
-            xTwoChannel1 = numpy.array(daneTwoChannel1)
-            xTwoChannel1 = numpy.delete(xTwoChannel1, numpy.arange(0, xTwoChannel1.size, 2))
-            xTwoChannel12 = numpy.array(xTwoChannel1)
-            xTwoChannel12 = numpy.delete(xTwoChannel12, numpy.arange(0, xTwoChannel12.size, 2))
-
-            xTwoChannel2 = numpy.array(daneTwoChannel2)
-            xTwoChannel2 = numpy.delete(xTwoChannel2, numpy.arange(0, xTwoChannel2.size, 2))
-            xTwoChannel22 = numpy.array(xTwoChannel2)
-            xTwoChannel22 = numpy.delete(xTwoChannel22, numpy.arange(0, xTwoChannel22.size, 2))
+            frame = acquire_frame(self)
+            if frame is None:
+                break
+            try:
+                daneTwoChannel1, daneTwoChannel2, XINCTwoChannel1, XINCTwoChannel2, XREFTwoChannel1, XREFTwoChannel2, frqTwoChannel1, frqTwoChannel2 = programTwoChannel(
+                    oscyloskop, stan, frame, lacze, analiza)
+            except Exception as error:
+                ramki.release(frame)
+                self.failed.emit(str(error))
+                break
 
-            maxTwoChannel1, minTwoChannel1, rmsTwoChannel1, maxTwoChannel2, minTwoChannel2, rmsTwoChannel2, P, S, Q = measureTwoChannel(
-                xTwoChannel12, xTwoChannel22)
+            # wyzwalanie programowe na wybranym kanale; do GUI trafiają fragmenty obu kanałów wokół zdarzenia
+            zdarzenia = wyzwalanie.search([daneTwoChannel1, daneTwoChannel2], XINCTwoChannel1[0],
+                                          XREFTwoChannel1[0]) if wyzwalanie.enabled else None
+            if zdarzenia is not None and not zdarzenia:
+                ramki.release(frame)
+                if not self.isRunning:
+                    break
+                continue
+
+            analizator = widmo
+            if analizator is not None:
+                frame.spectrum = [(1, *compute_spectrum(analizator, daneTwoChannel1, XINCTwoChannel1[0], 1, 0)),
+                                  (2, *compute_spectrum(analizator, daneTwoChannel2, XINCTwoChannel2[0], 2, 1))]
+
+            # pomiary na pełnych rekordach (w puli procesów, jeśli jest włączona)
+            with profiler.stage('measure'):
+                maxTwoChannel1, minTwoChannel1, rmsTwoChannel1, maxTwoChannel2, minTwoChannel2, rmsTwoChannel2, P, S, Q = compute_two_channel(
+                    daneTwoChannel1, daneTwoChannel2)
+
+            # analiza jakości energii na pełnych rekordach; moc bierna ze znakiem przesunięcia fazowego
+            wynik = compute_power(frame, daneTwoChannel1, daneTwoChannel2, XINCTwoChannel1[0], XREFTwoChannel1[0])
+            if wynik is not None:
+                P, S, Q = wynik.values()
+
+            kanaly = matematyka.bind({1: daneTwoChannel1, 2: daneTwoChannel2}, XINCTwoChannel1[0], XREFTwoChannel1[0])
+
+            recorder, server = rejestrator, serwer
+            if recorder is not None or server is not None:
+                (raw1, preamble1), (raw2, preamble2) = frame.records
+                records = [(1, raw1, preamble1, (maxTwoChannel1, minTwoChannel1, rmsTwoChannel1, frqTwoChannel1[0])),
+                           (2, raw2, preamble2, (maxTwoChannel2, minTwoChannel2, rmsTwoChannel2, frqTwoChannel2[0]))]
+                records += math_records(kanaly, frame)
+                if recorder is not None:
+                    recorder.submit(records)
+                if server is not None:
+                    server.publish(records)
+
+            if zdarzenia:  # wyświetlane są tylko fragmenty wokół ostatniego zdarzenia
+                czas, x0, (daneTwoChannel1, daneTwoChannel2) = zdarzenia[-1]
+                XREFTwoChannel1 = XREFTwoChannel2 = [x0]
+                frame.records = [(dane.raw, dane.preamble) for dane in (daneTwoChannel1, daneTwoChannel2)]
+                maxTwoChannel1, minTwoChannel1, rmsTwoChannel1, maxTwoChannel2, minTwoChannel2, rmsTwoChannel2, P, S, Q = measureTwoChannel(
+                    daneTwoChannel1, daneTwoChannel2)
+                kanaly = matematyka.bind({1: daneTwoChannel1, 2: daneTwoChannel2}, XINCTwoChannel1[0], x0)
+            frame.math = kanaly  # wyrażenia liczone w GUI tylko dla punktów widocznego fragmentu wykresu
+
+            przebiegTwoChannel1 = MinMaxPyramid(daneTwoChannel1, XREFTwoChannel1[0], XINCTwoChannel1[0])
+            przebiegTwoChannel2 = MinMaxPyramid(daneTwoChannel2, XREFTwoChannel2[0], XINCTwoChannel2[0])
+
+            if akumulacja.enabled:
+                frame.accumulated = akumulacja.add([("CH1", daneTwoChannel1), ("CH2", daneTwoChannel2)],
+                                                   XREFTwoChannel1[0], XINCTwoChannel1[0])
 
             if self.isRunning:
-                self.signalTwoChannel.emit(xTwoChannel12, xTwoChannel22, XINCTwoChannel1[0], XINCTwoChannel2[0],
-                                                 XREFTwoChannel1[0], XREFTwoChannel2[0],
-                                                 maxTwoChannel1, minTwoChannel1, rmsTwoChannel1, maxTwoChannel2,
-                                                 minTwoChannel2, rmsTwoChannel2, frqTwoChannel1[0], frqTwoChannel2[0],
-                                                 P, S, Q)
+                frame.payload = (przebiegTwoChannel1, przebiegTwoChannel2, XINCTwoChannel1[0], XINCTwoChannel2[0],
+                                 XREFTwoChannel1[0], XREFTwoChannel2[0],
+                                 maxTwoChannel1, minTwoChannel1, rmsTwoChannel1, maxTwoChannel2,
+                                 minTwoChannel2, rmsTwoChannel2, frqTwoChannel1[0], frqTwoChannel2[0],
+                                 P, S, Q)
+                ramki.publish(frame)
+                self.signalTwoChannel.emit()
             else:
+                ramki.release(frame)
                 break
 
-            if isChecked:
-                if maxTwoChannel1 >= MaxValue or maxTwoChannel2 >= MaxValue:
-                    break
+            if zdarzenia and wyzwalanie.stop:
+                break
 
             if ModeTwoCh == 0:
                 break
@@ -637,18 +1357,164 @@ class ThreadClassTwoChannel(QtCore.QThread):
         global ModeTwoCh
         ModeTwoCh = value
 
-    # funkcja pobierająca aktualną wartość wyzwalania
-    def getMaxValue(self, value):
-        global MaxValueTwoCh
-        MaxValueTwoCh = value
 
-    # funkcja pobierająca aktualny stan widgetów RadioButtonOn/Off
-    def isOnChacked(self, OnChecked):
-        global isCheckedTwoCh
-        isCheckedTwoCh = OnChecked
+# stworzenie klasy QThread wyszukującej dostępne urządzenia bez blokowania startu aplikacji
+class ThreadClassDevices(QtCore.QThread):
+    found = QtCore.pyqtSignal(list)
+    failed = QtCore.pyqtSignal(str)
+
+    def run(self):
+        try:
+            devices = rm.discover()
+        except Exception as error:
+            self.failed.emit(str(error))
+        else:
+            self.found.emit(devices)
+
+
+# stworzenie klasy QThread dobierającej ustawienia transferu danych i zapisującej profil łącza urządzenia
+class ThreadClassTuning(QtCore.QThread):
+    tuned = QtCore.pyqtSignal(object)
+    failed = QtCore.pyqtSignal(str)
+
+    def __init__(self, oscyloskop, resource, parent=None):
+        super(ThreadClassTuning, self).__init__(parent)
+        self.oscyloskop = oscyloskop  # urządzenie połączone w chwili rozpoczęcia strojenia
+        self.resource = resource
+
+    def run(self):
+        try:
+            link = tune(self.oscyloskop)
+            link.apply(self.oscyloskop)
+        except Exception as error:
+            self.failed.emit(str(error))
+        else:
+            profile.store(self.resource, link)
+            self.tuned.emit(link)
+
+
+# stworzenie klasy przekazującej do GUI informacje o nowych ramkach z wątków puli urządzeń
+class PoolSignals(QtCore.QObject):
+    frameReady = QtCore.pyqtSignal(str)
+
+
+# stworzenie klasy QThread odtwarzającej ramki z nagrania tą samą ścieżką pomiarów i rysowania co pomiary na żywo
+class ThreadClassReplay(QtCore.QThread):
+    signal = QtCore.pyqtSignal()
+    signalTwoChannel = QtCore.pyqtSignal()
+    failed = QtCore.pyqtSignal(str)  # sygnał o braku wolnych buforów ramek lub zmianie nagranych kanałów
+
+    def __init__(self, source, channels, parent=None):
+        super(ThreadClassReplay, self).__init__(parent)
+        self.source = source
+        self.channels = channels  # kanały oscyloskopu wyświetlane w wybranym widoku (display_channels)
+        self.isRunning = True
+
+    def run(self):
+        deadline = time.monotonic()
+        while self.isRunning:
+            frame = acquire_frame(self)
+            if frame is None:
+                break
+            channels = self.source.read(frame)
+            if channels is None:  # koniec nagrania
+                ramki.release(frame)
+                break
+
+            # nagrane kanały matematyczne są wyświetlane, jeśli nie zdefiniowano kanałów liczonych na bieżąco
+            zapisane = [entry for entry in channels if entry[0] > MATH_CHANNEL]
+            channels = sorted((entry for entry in channels if entry[0] <= MATH_CHANNEL), key=lambda entry: entry[0])
+            if [entry[0] for entry in channels] != self.channels:  # inne kanały niż w widoku wybranym na początku
+                ramki.release(frame)
+                self.failed.emit("zmiana nagranych kanałów w trakcie nagrania")
+                break
+            frame.records = [(raw, preamble) for channel, raw, data, preamble, frq in channels]
+            kanaly = matematyka.bind({channel: data for channel, raw, data, preamble, frq in channels},
+                                     *channels[0][3][:2])
+            frame.math = kanaly or [(channel, f"M{channel - MATH_CHANNEL}",
+                                     MinMaxPyramid(data, preamble[1], preamble[0]))
+                                    for channel, raw, data, preamble, frq in zapisane]
+
+            if len(channels) == 1:
+                channel, raw, data, (XINC, XREF, YOR, YREF, YINC), frq = channels[0]
+                max, min, rms = data.statistics().result()  # statystyki z kodów próbek, bez przeliczania na volty
+                frame.payload = MinMaxPyramid(data, XREF, XINC), XINC, XREF, frq, max, min, rms
+                analizator = widmo
+                if analizator is not None:
+                    frame.spectrum = [(channel, *compute_spectrum(analizator, data, XINC, channel))]
+                if akumulacja.enabled:
+                    frame.accumulated = akumulacja.add([(f"CH{channel}", data)], XREF, XINC)
+                ramki.publish(frame)
+                self.signal.emit()
+            else:
+                (channel1, raw1, data1, preamble1, frq1), (channel2, raw2, data2, preamble2, frq2) = channels
+                max1, min1, rms1, max2, min2, rms2, P, S, Q = compute_two_channel(data1, data2)
+                wynik = compute_power(frame, data1, data2, preamble1[0], preamble1[1])
+                if wynik is not None:
+                    P, S, Q = wynik.values()
+                frame.payload = (MinMaxPyramid(data1, preamble1[1], preamble1[0]),
+                                 MinMaxPyramid(data2, preamble2[1], preamble2[0]),
+                                 preamble1[0], preamble2[0], preamble1[1], preamble2[1],
+                                 max1, min1, rms1, max2, min2, rms2, frq1, frq2, P, S, Q)
+                analizator = widmo
+                if analizator is not None:
+                    frame.spectrum = [(channel1, *compute_spectrum(analizator, data1, preamble1[0], channel1, 0)),
+                                      (channel2, *compute_spectrum(analizator, data2, preamble2[0], channel2, 1))]
+                if akumulacja.enabled:
+                    frame.accumulated = akumulacja.add([(f"CH{channel1}", data1), (f"CH{channel2}", data2)],
+                                                       preamble1[1], preamble1[0])
+                ramki.publish(frame)
+                self.signalTwoChannel.emit()
+
+            # utrzymanie wybranej liczby ramek na sekundę
+            deadline += 1 / self.source.rate
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                deadline = time.monotonic()
+
+    # funkcja wywoływana w momencie zatrzymania odtwarzania
+    def stop(self):
+        self.isRunning = False
+
+
+# stworzenie klasy QThread odpowiedzialnej za zapis danych do pliku bez blokowania GUI
+class ThreadClassExport(QtCore.QThread):
+    progress = QtCore.pyqtSignal(int)
+    finishedExport = QtCore.pyqtSignal(object, str)
+
+    def __init__(self, path, fmt, names, volts, x0, dx, raws, preambles, frame, parent=None):
+        super(ThreadClassExport, self).__init__(parent)
+        self.path = path
+        self.fmt = fmt
+        self.names = names
+        self.volts = volts
+        self.x0 = x0
+        self.dx = dx
+        self.raws = raws
+        self.preambles = preambles
+        self.frame = frame
+
+    def run(self):
+        try:
+            export(self.path, self.fmt, self.names, self.volts, self.x0, self.dx, self.raws, self.preambles,
+                   progress=lambda part: self.progress.emit(int(part * 100)))
+        except Exception as error:
+            self.finishedExport.emit(self.frame, str(error))
+        else:
+            self.finishedExport.emit(self.frame, "")
+
+
+def main():
+    app = QtWidgets.QApplication(sys.argv)
+    mainWindow = Oscilloscope()
+    mainWindow.show()
+    result = app.exec()
+    if analiza is not None:  # zamknięcie procesów roboczych i zwolnienie pamięci współdzielonej
+        analiza.close()
+    return result
 
 
-app = QtWidgets.QApplication(sys.argv)
-mainWindow = Oscilloscope()
-mainWindow.show()
-sys.exit(app.exec())
+if __name__ == '__main__':
+    sys.exit(main())
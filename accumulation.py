@@ -0,0 +1,151 @@
+import threading
+
+import numpy
+
+from decimation import MinMaxPyramid
+from profiling import profiler
+from waveform import as_volts
+
+
+# tryby akumulacji kolejnych ramek (klucz -> nazwa wyświetlana w GUI)
+ACCUMULATION_MODES = {
+    'none': "Brak",
+    'average': "Uśrednianie",
+    'exponential': "Uśrednianie wykładnicze",
+    'envelope': "Obwiednia min/max",
+    'persistence': "Poświata",
+}
+
+# liczba próbek przetwarzanych naraz przy wypełnianiu histogramu poświaty (ogranicza pamięć pomocniczą)
+BLOCK = 2 ** 20
+
+
+# wartości min/max w grupach po bucket próbek (niepełna ostatnia grupa jest zachowywana)
+def bucket_extremes(data, bucket):
+    if bucket == 1:
+        return data.astype(numpy.float32), data.astype(numpy.float32)
+    starts = numpy.arange(0, data.size, bucket)
+    return (numpy.minimum.reduceat(data, starts).astype(numpy.float32),
+            numpy.maximum.reduceat(data, starts).astype(numpy.float32))
+
+
+# stworzenie klasy akumulującej kolejne ramki: uśrednianie, obwiednia z N ramek oraz poświata (histogram czas x napięcie)
+# zajmowana pamięć zależy od długości rekordu i rozdzielczości histogramu, a nie od liczby akumulowanych ramek
+class WaveformAccumulator:
+
+    def __init__(self, mode='none', frames=16, envelope_points=65536, time_bins=1024, volt_bins=256, decay=0.9):
+        self.mode = mode  # tryb akumulacji (klucz ACCUMULATION_MODES)
+        self.frames = frames  # liczba ramek uśrednianych lub tworzących obwiednię
+        self.envelope_points = envelope_points  # największa liczba punktów obwiedni
+        self.time_bins = time_bins  # rozdzielczość histogramu poświaty w osi czasu
+        self.volt_bins = volt_bins  # rozdzielczość histogramu poświaty w osi napięcia
+        self.decay = decay  # współczynnik wygaszania poświaty po każdej ramce
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.averages = {}  # kanał -> [klucz rekordu, liczba ramek, średnia]
+        self.envelopes = {}  # kanał -> [klucz rekordu, liczba ramek w bieżącym banku, bank bieżący, bank poprzedni]
+        self.density = None  # histogram poświaty (volt_bins x time_bins)
+        self.extent = None  # zakres histogramu: czas początku i końca, napięcie minimalne i maksymalne
+        self.accumulated = 0  # liczba ramek w akumulacji
+
+    # zmiana ustawień akumulacji (akumulacja jest rozpoczynana od nowa)
+    def configure(self, **settings):
+        with self.lock:
+            for name, value in settings.items():
+                setattr(self, name, value)
+            self.reset()
+
+    @property
+    def enabled(self):
+        return self.mode != 'none'
+
+    # uśrednianie narastające (do self.frames ramek, potem ze stałą wagą 1/frames) lub wykładnicze (waga 1/frames)
+    def average(self, name, key, data):
+        state = self.averages.get(name)
+        if state is None or state[0] != key:
+            state = self.averages[name] = [key, 0, data.astype(numpy.float32)]
+            state[1] = 1
+            return state[2]
+        if self.mode == 'average':
+            state[1] = min(state[1] + 1, self.frames)
+        else:
+            state[1] = self.frames
+        state[2] += (data - state[2]) / state[1]
+        return state[2]
+
+    # obwiednia z ostatnich frames..2*frames ramek: dwa banki min/max zamieniane co frames ramek
+    def envelope(self, name, key, data):
+        bucket = max(-(-data.size // self.envelope_points), 1)
+        mins, maxs = bucket_extremes(data, bucket)
+        state = self.envelopes.get(name)
+        if state is None or state[0] != key:
+            state = self.envelopes[name] = [key, 0, [mins, maxs], None]
+        else:
+            current = state[2]
+            numpy.minimum(current[0], mins, out=current[0])
+            numpy.maximum(current[1], maxs, out=current[1])
+        state[1] += 1
+        lower, upper = state[2]
+        if state[3] is not None:
+            lower = numpy.minimum(lower, state[3][0])
+            upper = numpy.maximum(upper, state[3][1])
+        else:  # kopia, ponieważ bieżący bank jest zmieniany w miejscu przez kolejne ramki
+            lower, upper = lower.copy(), upper.copy()
+        if state[1] >= self.frames:  # rozpoczęcie nowego banku, poprzedni pozostaje w obwiedni
+            state[1] = 0
+            state[3] = state[2]
+            state[2] = [mins.copy(), maxs.copy()]
+        return lower, upper, bucket
+
+    # dodanie ramki do histogramu poświaty (wektorowe przypisanie próbek do przedziałów i zliczenie)
+    def persistence(self, channels, x0, dx):
+        size = channels[0][1].size
+        extent = (x0, x0 + size * dx)
+        if self.density is None or self.extent[:2] != extent:
+            low = min(float(data.min()) for name, data in channels)
+            high = max(float(data.max()) for name, data in channels)
+            margin = max(high - low, 1e-3) * 0.1
+            self.density = numpy.zeros((self.volt_bins, self.time_bins), dtype=numpy.float32)
+            self.extent = extent + (low - margin, high + margin)
+        else:
+            self.density *= self.decay
+
+        low, high = self.extent[2:]
+        scale = self.volt_bins / (high - low)
+        counts = numpy.zeros(self.volt_bins * self.time_bins, dtype=numpy.int64)
+        for name, data in channels:
+            for beginning in range(0, data.size, BLOCK):
+                block = data[beginning:beginning + BLOCK]
+                columns = numpy.arange(beginning, beginning + block.size, dtype=numpy.int64) * self.time_bins // size
+                rows = numpy.clip(((block - low) * scale).astype(numpy.int64), 0, self.volt_bins - 1)
+                counts += numpy.bincount(rows * self.time_bins + columns, minlength=counts.size)
+        self.density += counts.reshape(self.volt_bins, self.time_bins)
+
+        image = numpy.log1p(self.density)  # skala logarytmiczna, aby rzadkie przebiegi były widoczne
+        image /= max(float(image.max()), 1e-12)
+        return image, self.extent
+
+    # akumulacja ramki; channels - lista (nazwa, przebieg) o wspólnej podstawie czasu
+    # zwraca listę (etykieta, piramida min/max) linii do narysowania oraz obraz poświaty (obraz, zakres) lub None
+    def add(self, channels, x0, dx):
+        with profiler.stage('accumulation'), self.lock:
+            self.accumulated += 1
+            channels = [(name, as_volts(data)) for name, data in channels]  # przebiegi RawWaveform jako float32
+            key = (channels[0][1].size, x0, dx)
+            if self.mode in ('average', 'exponential'):
+                # kopia średniej, ponieważ kolejna ramka zmienia ją w miejscu, gdy GUI może jeszcze ją rysować
+                return [(f"{name} (śr.)", MinMaxPyramid(self.average(name, key, data).copy(), x0, dx))
+                        for name, data in channels], None
+            if self.mode == 'envelope':
+                lines = []
+                for name, data in channels:
+                    lower, upper, bucket = self.envelope(name, key, data)
+                    lines.append((f"{name} max", MinMaxPyramid(upper, x0, dx * bucket)))
+                    lines.append((f"{name} min", MinMaxPyramid(lower, x0, dx * bucket)))
+                return lines, None
+            if self.mode == 'persistence':
+                image = self.persistence(channels, x0, dx)
+                return [(name, MinMaxPyramid(data, x0, dx)) for name, data in channels], image
+            return None
@@ -0,0 +1,282 @@
+import numpy
+import time
+import math
+
+from measurements import measure_all, active_power
+from profiling import profiler
+from waveform import RawWaveform
+
+
+# wyjątek zgłaszany, gdy oscyloskop nie zakończył akwizycji w wyznaczonym czasie
+class AcquisitionTimeout(Exception):
+    pass
+
+
+# pobranie danych niezbędnych do utworzenia przebiegu przy wybraniu pobierania danych w sposób binarny
+def get_numerical_values(oscyloskop):
+    # Dane używane podczas tworzenia wektora czasu (potrzebne do wyrysowania przebiegu)
+    XINC = oscyloskop.query_ascii_values(
+        ":WAVeform:XINCrement?")  # wartość przeskalowania w pozycji X (okres pomiędzy każdą próbką)
+    XREF = oscyloskop.query_ascii_values(
+        ":WAVeform:XREFerence?")  # zwraca pierwszy punkt na ekranie lub w pamięci wewnętrznej)
+    # Dane potrzebne do poprawnej konwersji liczb na volty
+    YOR = oscyloskop.query_ascii_values(":WAVeform:YORigin?")  # wartość przesunięcia pionowego w kierunku Y
+    YREF = oscyloskop.query_ascii_values(
+        ":WAVeform:YREFerence?")  # zwracana jest wartość zależna od bieżącego trybu odczytu danych
+    YINC = oscyloskop.query_ascii_values(":WAVeform:YINCrement?")  # zwraca nam wartość przeskalowania w pozycji Y
+
+    return XINC, XREF, YOR, YREF, YINC
+
+
+# pobranie tych samych danych co get_numerical_values jednym zapytaniem :WAVeform:PREamble?
+def get_preamble(oscyloskop):
+    return parse_preamble(oscyloskop.query_ascii_values(":WAVeform:PREamble?"))
+
+
+# rozdzielenie odpowiedzi na zapytanie :WAVeform:PREamble? na dane skalujące
+def parse_preamble(preamble):
+    # format, typ, liczba punktów, liczba uśrednień, XINC, XORigin, XREF, YINC, YORigin, YREF
+    XINC = [preamble[4]]
+    XREF = [preamble[6]]
+    YINC = [preamble[7]]
+    YOR = [preamble[8]]
+    YREF = [preamble[9]]
+
+    return XINC, XREF, YOR, YREF, YINC
+
+
+# pobranie danych skalujących oraz głębokości pamięci (z pamięci podręcznej stanu, jeśli została podana)
+def get_waveform_state(oscyloskop, cache=None):
+    with profiler.stage('scpi'):
+        if cache is not None:
+            return cache.get(oscyloskop)
+        XINC, XREF, YOR, YREF, YINC = get_numerical_values(oscyloskop)
+        DepthMemory = get_memory_depth(oscyloskop)
+    return XINC, XREF, YOR, YREF, YINC, DepthMemory
+
+
+# wybór kanału, z którego pobierany jest przebieg oraz wykonywane są pomiary
+def select_channel(oscyloskop, channel, cache=None):
+    oscyloskop.write(f":WAVeform:SOURce CHANnel{channel}")
+    oscyloskop.write(f":MEASure:SOURce CHANnel{channel}")
+    if cache is not None:
+        cache.select(channel)
+
+
+# dane potrzebne do odczytania pełnego spektrum
+def get_memory_depth(oscyloskop):
+    samp_time = oscyloskop.query_ascii_values(":ACQuire:SRATe?")  # zwraca aktualny czas próbkowania
+    time_base = oscyloskop.query_ascii_values("TIMebase:SCALe?")  # pobranie podstawy czasu
+    DepthMemory = (time_base[0] * 12) * samp_time[0]  # obliczenie MemoryDepth
+    return DepthMemory
+
+
+# ustawienie początku i końca pobierania danych
+def data_download_limit(oscyloskop, start=1, stop=500000):
+    oscyloskop.write(f":WAVeform:STARt {str(start)}")  # ustawienie początku pobierania danych
+    oscyloskop.write(f":WAVeform:STOP {str(stop)}")  # ustawienie końca pobierania danych
+
+
+# algorytm pozwalajacy na uzyskanie całego spectrum
+def get_all_data(oscyloskop, DepthMemory, sample=500000):
+    dane = oscyloskop.query_binary_values(":WAVeform:DATA?", datatype='B')  # pobranie danych z oscyloskopu
+
+    if DepthMemory > sample:
+        licznik = 1  # ustawienie wartości licznika na 1
+        liczba_petli = math.ceil(
+            DepthMemory / sample)  # zaokrąglenie w górę liczby pętli potrzebnych do pobrania całego spektrum
+
+        while licznik < liczba_petli:  # wykonywanie pobierania danych do momentu zrównania się licznika z liczbą pętli
+
+            beginning = (licznik * sample) + 1      # obliczenie początku pobierania danych zależnego od aktualnego obiegu pętli
+            if licznik == liczba_petli -1:          # warunek pozwalający na pobranie wszystkich danych
+                end = DepthMemory                   # ustalenie memorydepth na koniec pobierania próbek
+            else:
+                end = (licznik + 1) * sample  # obliczenie końca pobierania danych zależnego od aktualnego obiegu pętli
+
+            data_download_limit(oscyloskop, beginning, end)
+            dane.extend(oscyloskop.query_binary_values(":WAVeform:DATA?",
+                                                       datatype='B'))  # rozszerzenie danych o kolejne informacje
+            licznik += 1  # zwiększenie licznika
+
+    return dane
+
+
+# odczyt jednego bloku :WAVeform:DATA? bezpośrednio do przygotowanego fragmentu bufora (bez listy liczb)
+def read_data_block(oscyloskop, out):
+    with profiler.stage('transfer') as etap:
+        oscyloskop.write(":WAVeform:DATA?")
+        header = oscyloskop.read_bytes(2)  # nagłówek bloku IEEE 488.2: "#" + liczba cyfr długości
+        if header[:1] != b'#':
+            raise ValueError("Niepoprawny nagłówek bloku danych")
+        length = int(oscyloskop.read_bytes(int(header[1:2])))  # liczba bajtów danych w bloku
+        if length > out.size:
+            raise ValueError(f"Blok danych ({length} B) jest większy niż przygotowany bufor ({out.size} B)")
+        received = 0
+        while received < length:
+            chunk = oscyloskop.read_bytes(length - received)
+            out[received:received + len(chunk)] = numpy.frombuffer(chunk, dtype=numpy.uint8)
+            received += len(chunk)
+        oscyloskop.read_bytes(1)  # odczytanie znaku końca odpowiedzi
+        etap.bytes = length
+    return length
+
+
+# pobieranie kolejnych fragmentów rekordu do bufora; zwraca zakresy (początek, koniec) pobranych fragmentów,
+# które zawsze przylegają do siebie (bez luk w buforze, także gdy oscyloskop zwróci mniej danych niż zażądano)
+# link - ustawienia łącza (LinkTuning): wielkość fragmentu z profilu urządzenia, a po błędzie odczytu fragment
+# jest pobierany ponownie w mniejszych częściach
+def read_chunks(oscyloskop, out, DepthMemory, sample=500000, link=None):
+    beginning = 0
+    while beginning < DepthMemory:
+        end = min(beginning + (link.sample if link is not None else sample), DepthMemory)
+        try:
+            data_download_limit(oscyloskop, beginning + 1, end)
+            received = read_data_block(oscyloskop, out[beginning:end])  # widok fragmentu bufora
+        except Exception as error:
+            if link is None or not link.back_off(oscyloskop, error):
+                raise
+            continue
+        if link is not None:
+            link.succeeded()
+        if received == 0:  # brak dalszych danych w pamięci oscyloskopu - rekord kończy się przed DepthMemory
+            return
+        yield beginning, beginning + received
+        beginning += received  # krótszy blok - następny fragment zaczyna się od pierwszej nieodebranej próbki
+
+
+# algorytm pozwalajacy na uzyskanie całego spectrum do jednego, wcześniej zaalokowanego bufora uint8
+def get_all_data_buffer(oscyloskop, DepthMemory, sample=500000, out=None, link=None):
+    DepthMemory = int(round(DepthMemory))  # liczba próbek musi być całkowita, aby przygotować bufor
+    if out is None or out.size < DepthMemory:
+        out = numpy.empty(DepthMemory, dtype=numpy.uint8)  # bufor na całe spectrum (1 bajt na próbkę)
+
+    received = 0
+    for beginning, end in read_chunks(oscyloskop, out, DepthMemory, sample, link):
+        received += end - beginning
+
+    return out[:received]
+
+
+# zatrzymanie pracy oscyloskopu
+def stop(oscyloskop):
+    oscyloskop.write(":STOP")
+
+
+# oczekiwanie na faktyczne zatrzymanie akwizycji - odpytywanie stanu wyzwalania z rosnącym odstępem
+# (zamiast stałego opóźnienia time.sleep, dzięki czemu krótkie podstawy czasu nie są spowalniane)
+def wait_until_stopped(oscyloskop, timeout=2.0, delay=0.001, max_delay=0.05):
+    deadline = time.monotonic() + timeout
+    with profiler.stage('stop'):
+        while True:
+            status = oscyloskop.query(":TRIGger:STATus?").strip().upper()  # TD, WAIT, RUN, AUTO lub STOP
+            if status == "STOP":
+                return
+            if time.monotonic() >= deadline:
+                raise AcquisitionTimeout(f"Oscyloskop nie zatrzymał akwizycji w ciągu {timeout} s (stan: {status})")
+            time.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+
+# wznowienie pracy oscyloskopu
+def start(oscyloskop):
+    oscyloskop.write(":RUN")
+
+
+# konwersja odczytanych danych na przebieg napięcia
+def make_volt(dane, XINC, XREF, YOR, YREF, YINC, out=None):
+    with profiler.stage('make_volt'):
+        volt = numpy.subtract(dane, YOR[0] + YREF[0], out=out, dtype=numpy.float64)  # jedna tablica wynikowa bez kopii pośrednich
+        volt *= YINC[0]  # przeliczenie danych na wartości napięcia
+
+    return volt, XINC, XREF, YREF, YINC
+
+
+# funkcja pozwalająca na pobranie aktualnie wyświetlanego przebiegu z jednego kanału w celu poźniejszego wyrysowania
+def program(oscyloskop):
+    stop(oscyloskop)  # wywołanie funkcji zatrzymującą pracę oscylokskopu
+    try:
+        wait_until_stopped(oscyloskop)  # oczekiwanie na zakończenie akwizycji przed pobieraniem danych
+        XINC, XREF, YOR, YREF, YINC = get_numerical_values(
+            oscyloskop)  # wywołanie funkcji pobierającej dane niezbędne do wyrysowania przebiegu
+        DepthMemory = get_memory_depth(oscyloskop)  # wywołanie funkcji pobierającej dane do uzyskania pełnego spektrum
+        dane = get_all_data_buffer(oscyloskop, DepthMemory)  # pobranie pełnego spektrum do bufora uint8
+    finally:
+        start(oscyloskop)  # wywołanie funkcji startującej pracę oscyloskopu (również po błędzie)
+    data, XINC, XREF, YREF, YINC = make_volt(dane, XINC, XREF, YOR, YREF,
+                                             YINC)  # wywołanie funkcji konwertującej dane na wartości napięcia
+    frq = [measure_all(data, XINC[0]).frequency()]  # częstotliwość obserwowanego sygnału wyznaczona z pobranych danych
+
+    return data, XINC, XREF, frq
+
+
+# bufor wielokrotnego użytku z ramki pierścienia (None - bufor zostanie zaalokowany przez wywoływaną funkcję)
+def frame_buffer(frame, name, size, dtype=numpy.float64):
+    if frame is None:
+        return None
+    return frame.buffer(name, size, dtype)
+
+
+# funkcja pozwalająca na pobranie przebiegów z wielu kanałów (1-4) z jednej akwizycji - oscyloskop jest zatrzymywany
+# tylko raz, dzięki czemu wszystkie kanały pochodzą z tego samego wyzwolenia i są wyrównane próbka do próbki;
+# przebiegi są zwracane jako RawWaveform (surowe próbki uint8 z danymi skalującymi)
+# executor - AnalysisExecutor, w którym liczone są statystyki długich rekordów
+def program_channels(oscyloskop, channels, cache=None, frame=None, timeout=2.0, link=None, executor=None):
+    stop(oscyloskop)
+    results = []
+    records = []
+    try:
+        wait_until_stopped(oscyloskop, timeout)  # oczekiwanie na zakończenie akwizycji przed pobieraniem danych
+        for number, channel in enumerate(channels):
+            select_channel(oscyloskop, channel, cache)
+            XINC, XREF, YOR, YREF, YINC, DepthMemory = get_waveform_state(oscyloskop, cache)
+            DepthMemory = int(round(DepthMemory))
+            dane = get_all_data_buffer(oscyloskop, DepthMemory,
+                                       out=frame_buffer(frame, f'raw{number + 1}', DepthMemory, numpy.uint8),
+                                       link=link)
+            data = RawWaveform(dane, XINC[0], XREF[0], YOR[0], YREF[0], YINC[0])  # napięcia liczone dopiero na żądanie
+            if executor is not None:
+                executor.statistics(data, number)
+            frq = [data.statistics().frequency()]  # bez zapytania :MEAS:ITEM? FREQ dla każdego kanału
+            results.append((data, XINC, XREF, frq))
+            records.append((dane, data.preamble))
+    finally:
+        start(oscyloskop)  # wznowienie pracy oscyloskopu po odczytaniu wszystkich kanałów lub po błędzie
+    if frame is not None:
+        frame.records = records
+
+    return results
+
+
+# funkcja pozwalająca na pobranie aktualnie wyświetlanego przebiegu z dwóch kanałów w celu poźniejszego wyrysowania
+def programTwoChannel(oscyloskop, cache=None, frame=None, link=None, executor=None):
+    (dataTwoChannel1, XINCTwoChannel1, XREFTwoChannel1, frqTwoChannel1), \
+        (dataTwoChannel2, XINCTwoChannel2, XREFTwoChannel2, frqTwoChannel2) = program_channels(oscyloskop, (1, 2),
+                                                                                               cache, frame, link=link,
+                                                                                               executor=executor)
+
+    return dataTwoChannel1, dataTwoChannel2, XINCTwoChannel1, XINCTwoChannel2, XREFTwoChannel1, XREFTwoChannel2, frqTwoChannel1, frqTwoChannel2
+
+
+# funkcja pozwalająca na obliczenie wartości maksymalnej, minimalnej oraz skutecznej przebiegu  dla jednego kanału
+def measure(data):
+    maxValue, minValue, rms = measure_all(data).result()  # wartość maksymalna, minimalna i skuteczna w jednym przebiegu
+
+    return maxValue, minValue, rms
+
+
+# funkcja pozwalająca na obliczenie wartości maksymalnej, minimalnej, skutecznej oraz pomiarów mocy przebiegów dla dwóch kanałów
+def measureTwoChannel(data1, data2):
+    maxValueCh1, minValueCh1, rmsCh1 = measure_all(data1).result()  # wartość maksymalna, minimalna i skuteczna
+    maxValueCh2, minValueCh2, rmsCh2 = measure_all(data2).result()
+
+    if len(data1) == len(data2) and len(data1):  # sprawdzenie czy wektory są równej długośći w celu uniknięcia błędów
+        S = rmsCh1 * rmsCh2                     # obliczenie mocy pozornej
+        P = active_power(data1, data2)          # obliczenie mocy czynnej (iloczyny liczone fragmentami, na kodach)
+        Q = numpy.sqrt(max(S ** 2 - P ** 2, 0.0))  # obliczenie mocy biernej
+    else:
+        S = 9.9e+37                             #przypisanie wartości w momencie nierównej długości wektorów
+        P = 9.9e+37
+        Q = 9.9e+37
+
+    return maxValueCh1, minValueCh1, rmsCh1, maxValueCh2, minValueCh2, rmsCh2, P, S, Q
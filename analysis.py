@@ -0,0 +1,179 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy
+
+from measurements import RawStats, INVALID, product_sum
+from profiling import profiler
+from spectrum import WINDOWS, segment_power, segment_count
+from waveform import RawWaveform
+
+
+# bloki pamięci współdzielonej przyłączone w procesie roboczym (nazwa -> blok)
+SHARED_BLOCKS = {}
+
+# okna widma utworzone w procesie roboczym ((nazwa, długość) -> okno)
+WINDOW_CACHE = {}
+
+
+# przyłączenie bloku pamięci współdzielonej w procesie roboczym; bloki zastąpione przez większe są odłączane
+def attach(name):
+    block = SHARED_BLOCKS.get(name)
+    if block is None:
+        block = SHARED_BLOCKS[name] = shared_memory.SharedMemory(name=name)
+    return block
+
+
+def detach(names):
+    for name in list(SHARED_BLOCKS):
+        if name in names:
+            try:
+                SHARED_BLOCKS.pop(name).close()
+            except BufferError:
+                pass
+
+
+# surowe próbki fragmentu rekordu w pamięci współdzielonej (widok bez kopiowania)
+def shared_codes(name, beginning, end, released=()):
+    detach(released)
+    return numpy.ndarray(end - beginning, dtype=numpy.uint8, buffer=attach(name).buf, offset=beginning)
+
+
+# statystyki fragmentu kodów przy poziomie przejść (levelLow, levelHigh) wyznaczonym dla całego rekordu
+def segment_statistics(codes, offset, scale, dx, levels):
+    stats = RawStats(offset, scale, dx)
+    if levels is not None:
+        stats.set_level(*levels)
+    stats.update(codes)
+    return stats
+
+
+# zadania wykonywane w procesach roboczych: rekord jest odczytywany z pamięci współdzielonej, a przesyłane są
+# tylko nazwy bloków, zakresy próbek i wyniki częściowe
+def statistics_task(name, beginning, end, offset, scale, dx, levels, released):
+    return segment_statistics(shared_codes(name, beginning, end, released), offset, scale, dx, levels)
+
+
+def products_task(name1, name2, beginning, end, offset1, offset2, released):
+    # suma iloczynów napięć liczona na kodach: (kod1 - offset1) * (kod2 - offset2)
+    return product_sum(shared_codes(name1, beginning, end, released), shared_codes(name2, beginning, end),
+                       offset1, offset2)
+
+
+def spectrum_task(name, length, window, size, step, first, last, released):
+    key = (window, size)
+    if key not in WINDOW_CACHE:
+        WINDOW_CACHE.clear()
+        WINDOW_CACHE[key] = WINDOWS[window](size)
+    return segment_power(shared_codes(name, 0, length, released), WINDOW_CACHE[key], step, first, last)
+
+
+# poziom przejść (kody minimalny i maksymalny) dla całego rekordu, None - przebieg stały
+def crossing_levels(codes):
+    low, high = int(codes.min()), int(codes.max())
+    return (low, high) if high > low else None
+
+
+# stworzenie klasy wykonującej analizę długich rekordów w puli procesów: rekord jest umieszczany raz w pamięci
+# współdzielonej, dzielony na fragmenty przetwarzane równolegle, a wyniki częściowe są łączone w wątku wywołującym
+class AnalysisExecutor:
+
+    def __init__(self, workers=None, min_size=2000000):
+        self.workers = workers or os.cpu_count() or 1  # liczba procesów roboczych
+        self.min_size = min_size  # krótsze rekordy są analizowane w bieżącym procesie (bez narzutu puli)
+        self.pool = ProcessPoolExecutor(self.workers)
+        self.blocks = {}  # miejsce -> blok pamięci współdzielonej
+        self.placed = {}  # miejsce -> przebieg aktualnie umieszczony w bloku
+        self.released = set()  # bloki zastąpione większymi, do odłączenia w procesach roboczych
+        self.lock = threading.RLock()
+
+    def parallel(self, data):
+        return isinstance(data, RawWaveform) and data.size >= self.min_size
+
+    # umieszczenie próbek przebiegu w pamięci współdzielonej (jedna kopia na ramkę, bloki są używane ponownie)
+    def place(self, waveform, slot=0):
+        if self.placed.get(slot) is waveform:
+            return self.blocks[slot].name
+        block = self.blocks.get(slot)
+        if block is None or block.size < waveform.size:
+            if block is not None:
+                self.released.add(block.name)
+                block.close()
+                block.unlink()
+            block = self.blocks[slot] = shared_memory.SharedMemory(create=True, size=max(waveform.size, 1))
+        numpy.ndarray(waveform.size, dtype=numpy.uint8, buffer=block.buf)[:] = waveform.raw
+        self.placed[slot] = waveform
+        return block.name
+
+    # podział zakresu [0, length) na części dla procesów roboczych
+    def split(self, length):
+        bounds = numpy.linspace(0, length, self.workers + 1).astype(numpy.int64)
+        return [(int(beginning), int(end)) for beginning, end in zip(bounds[:-1], bounds[1:]) if end > beginning]
+
+    # statystyki przebiegu (RawStats) wyznaczone równolegle z fragmentów rekordu
+    def statistics(self, waveform, slot=0):
+        if not self.parallel(waveform):
+            return waveform.statistics() if isinstance(waveform, RawWaveform) else RawStats(0.0, 1.0)
+        with self.lock, profiler.stage('measure'):
+            name = self.place(waveform, slot)
+            levels = crossing_levels(waveform.raw)
+            parts = [self.pool.submit(statistics_task, name, beginning, end, waveform.offset, waveform.scale,
+                                      waveform.XINC, levels, tuple(self.released))
+                     for beginning, end in self.split(waveform.size)]
+            stats = RawStats(waveform.offset, waveform.scale, waveform.XINC)
+            if levels is not None:
+                stats.set_level(*levels)
+            for part in parts:
+                stats.merge(part.result())
+        waveform.stats = stats  # kolejne pomiary tej ramki korzystają z wyniku
+        return stats
+
+    # pomiary dwóch kanałów w postaci zwracanej przez measureTwoChannel (moce liczone na pełnych rekordach)
+    def measure_two_channel(self, waveform1, waveform2):
+        stats1 = self.statistics(waveform1, 0)
+        stats2 = self.statistics(waveform2, 1)
+        max1, min1, rms1 = stats1.result()
+        max2, min2, rms2 = stats2.result()
+        if waveform1.size != waveform2.size or not waveform1.size:
+            return max1, min1, rms1, max2, min2, rms2, INVALID, INVALID, INVALID
+
+        with self.lock, profiler.stage('measure'):
+            if self.parallel(waveform1):
+                name1, name2 = self.place(waveform1, 0), self.place(waveform2, 1)
+                parts = [self.pool.submit(products_task, name1, name2, beginning, end, waveform1.offset,
+                                          waveform2.offset, tuple(self.released))
+                         for beginning, end in self.split(waveform1.size)]
+                products = sum(part.result() for part in parts)
+            else:
+                products = product_sum(waveform1.raw, waveform2.raw, waveform1.offset, waveform2.offset)
+        P = products * waveform1.scale * waveform2.scale / waveform1.size  # moc czynna
+        S = rms1 * rms2  # moc pozorna
+        Q = numpy.sqrt(max(S ** 2 - P ** 2, 0.0))  # moc bierna
+        return max1, min1, rms1, max2, min2, rms2, P, S, Q
+
+    # widmo przebiegu jak w SpectrumAnalyzer.compute; segmenty Welcha są dzielone pomiędzy procesy robocze
+    def spectrum(self, analyzer, waveform, channel=1, slot=0):
+        if not self.parallel(waveform):
+            return analyzer.compute(waveform, waveform.XINC, channel)
+        with self.lock, profiler.stage('spectrum'), analyzer.lock:
+            name = self.place(waveform, slot)
+            size, step = analyzer.segmentation(waveform.size)
+            window, frequency, scale = analyzer.plan(size, waveform.XINC)
+            count = segment_count(waveform.size, size, step)
+            parts = [self.pool.submit(spectrum_task, name, waveform.size, analyzer.window, size, step, first, last,
+                                      tuple(self.released))
+                     for first, last in self.split(count)]
+            power = sum(part.result() for part in parts)
+            power *= scale / count * waveform.scale ** 2  # widmo kodów przeskalowane do V^2
+            return analyzer.finish(channel, frequency, power, waveform.XINC)
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        with self.lock:
+            for block in self.blocks.values():
+                block.close()
+                block.unlink()
+            self.blocks = {}
+            self.placed = {}
@@ -0,0 +1,187 @@
+import argparse
+import sys
+import time
+
+from acquisition import program_channels
+from analysis import AnalysisExecutor
+from devices import DeviceDirectory
+from export import export
+from instrument_state import InstrumentStateCache
+from math_channels import MathChannels, MathError, math_records
+from measurements import measure_all, INVALID
+from power import PowerAnalyzer
+from recorder import Recorder
+from streaming import FrameServer
+from transport import Frame
+from tuning import LinkProfiles, TUNING_FILE, tune
+
+
+# przygotowanie urządzenia do pomiarów: odczyt surowych danych w formacie bajtowym oraz dodatkowe komendy SCPI
+def configure(oscyloskop, commands=()):
+    oscyloskop.write(":WAVeform:MODE RAW")
+    oscyloskop.write(":WAVeform:FORMat BYTE")
+    for command in commands:
+        oscyloskop.write(command)
+
+
+def print_frame(number, channels, results, elapsed):
+    for channel, (data, XINC, XREF, frq) in zip(channels, results):
+        max, min, mean, rms, std, p2p, frequency = measure_all(data, XINC[0]).summary()
+        print(f"{number:>6} CH{channel} {data.size:>10} pkt max {max:>9.4f} V min {min:>9.4f} V "
+              f"śr. {mean:>9.4f} V rms {rms:>9.4f} V std {std:>9.4f} V p-p {p2p:>9.4f} V "
+              f"f {'*' if frequency == 9.9e+37 else f'{frequency:.2f}'} Hz  {elapsed * 1e3:.1f} ms")
+
+
+def print_math(number, channels, elapsed):
+    for channel, name, data in channels:
+        max, min, mean, rms, std, p2p, frequency = data.statistics().summary()
+        print(f"{number:>6} {name} {len(data):>10} pkt max {max:>9.4f} min {min:>9.4f} "
+              f"śr. {mean:>9.4f} rms {rms:>9.4f} std {std:>9.4f} p-p {p2p:>9.4f} "
+              f"f {'*' if frequency == INVALID else f'{frequency:.2f}'} Hz  {elapsed * 1e3:.1f} ms")
+
+
+def print_power(number, result):
+    def value(measured, unit, digits=3):
+        return "*" if measured == INVALID else f"{measured:.{digits}f} {unit}".rstrip()
+
+    print(f"{number:>6} moc  f {value(result.frequency, 'Hz', 2)} P {value(result.P, 'W')} Q {value(result.Q, 'Var')} "
+          f"S {value(result.S, 'VA')} PF {value(result.PF, '')} φ {value(result.phase, '°', 1)} "
+          f"THD U {value(result.THDu, '%', 2)} THD I {value(result.THDi, '%', 2)} okresy {result.cycles.size}")
+
+
+# pobranie frames ramek z wybranych kanałów; każda ramka jest opisywana na wyjściu i opcjonalnie nagrywana
+# server - serwer TCP, któremu udostępniane są kolejne ramki (wolni odbiorcy pomijają ramki, pomiary nie czekają)
+# executor - pula procesów (AnalysisExecutor), w której liczone są statystyki długich rekordów
+# power - analizator jakości energii (PowerAnalyzer) dla dwóch pierwszych kanałów (napięcie i prąd)
+# math - definicje kanałów matematycznych (MathChannels) liczonych z pobranych kanałów, nagrywanych jak kanały
+def run(oscyloskop, channels, frames, output=None, export_path=None, export_format='npz', timeout=2.0, device=None,
+        quiet=False, server=None, link=None, executor=None, power=None, math=None):
+    cache = InstrumentStateCache()
+    frame = Frame(0)  # bufory używane ponownie w kolejnych ramkach
+    recorder = Recorder(output) if output else None
+    results = []
+    derived = []
+    try:
+        for number in range(frames):
+            begin = time.perf_counter()
+            results = program_channels(oscyloskop, channels, cache, frame, timeout, link, executor)
+            elapsed = time.perf_counter() - begin
+            derived = math.bind({channel: data for channel, (data, XINC, XREF, frq) in zip(channels, results)},
+                                results[0][1][0], results[0][2][0]) if math is not None else []
+            if recorder is not None or server is not None:
+                records = []
+                for channel, (raw, preamble), (data, XINC, XREF, frq) in zip(channels, frame.records, results):
+                    records.append((channel, raw, preamble, measure_all(data).result() + (frq[0],)))
+                records += math_records(derived, frame)
+                if recorder is not None:
+                    recorder.submit(records, device=device, block=True)  # w trybie wsadowym żadna ramka nie jest pomijana
+                if server is not None:
+                    server.publish(records, device=device)
+            result = None
+            if power is not None and len(results) > 1:
+                (data1, XINC, XREF, frq), (data2, *rest) = results[:2]
+                result = power.analyze(data1, data2, XINC[0], XREF[0])
+            if not quiet:
+                print_frame(number, channels, results, elapsed)
+                print_math(number, derived, elapsed)
+                if result is not None:
+                    print_power(number, result)
+    finally:
+        if recorder is not None:
+            recorder.close()
+
+    if export_path and results:  # zapis ostatniej ramki w wybranym formacie
+        names = [f"CH{channel}" for channel in channels] + [name for channel, name, data in derived]
+        volts = [data for data, XINC, XREF, frq in results] + [data for channel, name, data in derived]
+        raws = [raw for raw, preamble in frame.records]
+        preambles = [preamble for raw, preamble in frame.records]
+        if export_format == 'raw':  # kanały matematyczne jako kody uint8 z danymi skalującymi
+            for channel, name, data in derived:
+                raw, preamble = data.encode()
+                raws.append(raw)
+                preambles.append(preamble)
+        export(export_path, export_format, names, volts, results[0][2][0], results[0][1][0], raws, preambles)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pomiary wsadowe bez interfejsu graficznego")
+    parser.add_argument('resource', nargs='?', help="nazwa zasobu VISA (np. USB0::0x1AB1::0x04CE::DS1ZA0000::INSTR)")
+    parser.add_argument('--list', action='store_true', help="wypisanie dostępnych urządzeń")
+    parser.add_argument('--channels', type=int, nargs='+', default=[1], choices=[1, 2, 3, 4])
+    parser.add_argument('--frames', type=int, default=1, help="liczba pobieranych ramek")
+    parser.add_argument('--scpi', action='append', default=[], help="komenda SCPI wysyłana przed pomiarami "
+                                                                   "(np. ':TIMebase:SCALe 0.001'), można powtarzać")
+    parser.add_argument('--timeout', type=float, default=2.0, help="czas oczekiwania na zatrzymanie akwizycji [s]")
+    parser.add_argument('--output', help="plik nagrania wszystkich ramek (odtwarzany w GUI)")
+    parser.add_argument('--export', help="zapis ostatniej ramki do pliku")
+    parser.add_argument('--format', default='npz', choices=['csv', 'npy', 'npz', 'raw'])
+    parser.add_argument('--backend', default='', help="backend pyvisa (np. '@py')")
+    parser.add_argument('--simulate', action='store_true', help="pomiary na symulowanym oscyloskopie")
+    parser.add_argument('--tune', action='store_true', help="dobranie ustawień transferu danych przed pomiarami "
+                                                            "(zapisywane w profilu urządzenia)")
+    parser.add_argument('--profiles', metavar='PLIK', help=f"plik profili łącza urządzeń (domyślnie {TUNING_FILE}; "
+                                                          "z --simulate profile są używane tylko z tą opcją)")
+    parser.add_argument('--serve', type=int, metavar='PORT', help="udostępnianie ramek odbiorcom TCP na podanym porcie")
+    parser.add_argument('--workers', type=int, metavar='N', help="analiza długich rekordów w N procesach "
+                                                                 "(0 - liczba rdzeni procesora)")
+    parser.add_argument('--power', action='store_true', help="analiza jakości energii (pierwszy kanał - napięcie, "
+                                                             "drugi - prąd)")
+    parser.add_argument('--math', action='append', default=[], metavar='NAZWA=WYRAŻENIE',
+                        help="kanał matematyczny (np. 'P = CH1 * CH2', 'I = integral(CH1)'), można powtarzać")
+    parser.add_argument('--quiet', action='store_true')
+    args = parser.parse_args(argv)
+
+    if args.simulate:
+        from simulator import SimulatedResourceManager
+        directory = SimulatedResourceManager()
+        directory.add_resource(args.resource or 'SIM::INSTR')
+    else:
+        directory = DeviceDirectory(backend=args.backend)
+
+    if args.list:
+        for name in directory.list_resources():
+            print(name)
+        return 0
+    if not args.resource and not args.simulate:
+        parser.error("podaj nazwę zasobu VISA lub użyj --list")
+
+    math = None
+    if args.math:
+        try:
+            math = MathChannels()
+            math.configure(MathChannels.parse("\n".join(args.math)))
+        except MathError as error:
+            parser.error(str(error))
+
+    name = args.resource or 'SIM::INSTR'
+    oscyloskop = directory.open_resource(name)
+    server = FrameServer(port=args.serve) if args.serve is not None else None
+    # pomiary na symulatorze nie odczytują ani nie zmieniają profili rzeczywistych urządzeń
+    profiles = LinkProfiles(args.profiles or TUNING_FILE) if args.profiles or not args.simulate else None
+    executor = AnalysisExecutor(args.workers or None) if args.workers is not None else None
+    try:
+        configure(oscyloskop, args.scpi)
+        if args.tune:
+            link = tune(oscyloskop, timeout=args.timeout)
+        else:
+            link = profiles.get(name) if profiles is not None else None
+        if link is not None:
+            link.apply(oscyloskop)
+            if not args.quiet:
+                print(f"Transfer danych: fragmenty po {link.sample} próbek, {link.throughput / 1e6:.1f} MB/s")
+        run(oscyloskop, args.channels, args.frames, args.output, args.export, args.format, args.timeout, name,
+            args.quiet, server, link, executor, PowerAnalyzer() if args.power else None, math)
+        if profiles is not None and link is not None and (args.tune or link.backoffs):  # z uwzględnieniem błędów
+            profiles.store(name, link)
+    finally:
+        oscyloskop.close()
+        if server is not None:
+            server.close()
+        if executor is not None:
+            executor.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
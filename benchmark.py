@@ -0,0 +1,172 @@
+import argparse
+import time
+import tracemalloc
+
+import numpy
+
+from acquisition import get_numerical_values, get_memory_depth, data_download_limit, get_all_data, \
+    get_all_data_buffer, make_volt, stop, start, wait_until_stopped
+from measurements import measure_all
+from pipeline import transfer_pipelined
+from simulator import SimulatedOscilloscope
+
+
+# pobranie jednej ramki ze wszystkich wybranych kanałów (oczekiwanie na zatrzymanie zamiast stałego time.sleep), składanie w liście
+# volts - przeliczenie na napięcia float64 (False - ramka z surowych próbek, jak przechowują ją pomiary)
+def capture(oscyloskop, channels, volts=True):
+    stop(oscyloskop)
+    wait_until_stopped(oscyloskop)
+    frame = []
+    for channel in range(1, channels + 1):
+        oscyloskop.write(f":WAVeform:SOURce CHANnel{channel}")
+        XINC, XREF, YOR, YREF, YINC = get_numerical_values(oscyloskop)
+        DepthMemory = get_memory_depth(oscyloskop)
+        data_download_limit(oscyloskop)
+        dane = get_all_data(oscyloskop, DepthMemory)
+        if volts:
+            dane, XINC, XREF, YREF, YINC = make_volt(dane, XINC, XREF, YOR, YREF, YINC)
+        frame.append(dane)
+    start(oscyloskop)
+    return frame
+
+
+# pobranie jednej ramki ze wszystkich wybranych kanałów, składanie we wcześniej zaalokowanym buforze uint8
+def capture_buffer(oscyloskop, channels, volts=True):
+    stop(oscyloskop)
+    wait_until_stopped(oscyloskop)
+    frame = []
+    for channel in range(1, channels + 1):
+        oscyloskop.write(f":WAVeform:SOURce CHANnel{channel}")
+        XINC, XREF, YOR, YREF, YINC = get_numerical_values(oscyloskop)
+        DepthMemory = get_memory_depth(oscyloskop)
+        dane = get_all_data_buffer(oscyloskop, DepthMemory)
+        if volts:
+            dane, XINC, XREF, YREF, YINC = make_volt(dane, XINC, XREF, YOR, YREF, YINC)
+        frame.append(dane)
+    start(oscyloskop)
+    return frame
+
+
+# pobranie jednej ramki ze wszystkich wybranych kanałów, pobieranie równoległe ze statystykami liczonymi na kodach
+def capture_pipeline(oscyloskop, channels, volts=True):
+    stop(oscyloskop)
+    wait_until_stopped(oscyloskop)
+    frame = []
+    for channel in range(1, channels + 1):
+        oscyloskop.write(f":WAVeform:SOURce CHANnel{channel}")
+        XINC, XREF, YOR, YREF, YINC = get_numerical_values(oscyloskop)
+        DepthMemory = get_memory_depth(oscyloskop)
+        data, stats = transfer_pipelined(oscyloskop, DepthMemory, YOR, YREF, YINC)
+        if volts:
+            data, XINC, XREF, YREF, YINC = make_volt(data, XINC, XREF, YOR, YREF, YINC)
+        frame.append(data)
+    start(oscyloskop)
+    return frame
+
+
+# dostępne metody składania rekordu porównywane w benchmarku; warianty *-raw zwracają surowe próbki zamiast napięć
+# (porównywane są tylko metody zwracające dane w tej samej postaci)
+METHODS = {
+    'list': capture,
+    'buffer': capture_buffer,
+    'pipeline': capture_pipeline,
+    'list-raw': lambda oscyloskop, channels: capture(oscyloskop, channels, volts=False),
+    'buffer-raw': lambda oscyloskop, channels: capture_buffer(oscyloskop, channels, volts=False),
+    'pipeline-raw': lambda oscyloskop, channels: capture_pipeline(oscyloskop, channels, volts=False),
+}
+
+
+# pomiar przepustowości, opóźnienia ramki i szczytowego zużycia pamięci dla jednej konfiguracji
+def run_case(channels, depth, repeats, bandwidth, latency, shape, method=capture):
+    oscyloskop = SimulatedOscilloscope(memory_depth=depth, shape=shape, bandwidth=bandwidth, latency=latency)
+    oscyloskop.write(":WAVeform:MODE RAW")
+    oscyloskop.write(":WAVeform:FORMat BYTE")
+    for channel in range(1, channels + 1):
+        oscyloskop.record(channel)  # wygenerowanie przebiegów przed rozpoczęciem pomiaru
+
+    latencies = []
+    peak = 0
+    for _ in range(repeats):
+        tracemalloc.start()
+        begin = time.perf_counter()
+        frame = method(oscyloskop, channels)
+        latencies.append(time.perf_counter() - begin)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        del frame
+
+    best = min(latencies)
+    return {
+        'channels': channels,
+        'depth': depth,
+        'samples_per_s': channels * depth / best,
+        'frame_latency': best,
+        'peak_memory': peak,
+    }
+
+
+# dotychczasowe pomiary: wbudowane max()/min() iterujące po elementach oraz osobny przebieg dla wartości skutecznej
+def measure_builtin(data, dx):
+    return max(data), min(data), numpy.sqrt(numpy.mean(data ** 2))
+
+
+# pomiary w jednym przebiegu po danych (z lokalnym pomiarem częstotliwości)
+def measure_kernel(data, dx):
+    return measure_all(data, dx).summary()
+
+
+MEASUREMENTS = {
+    'builtin': measure_builtin,
+    'kernel': measure_kernel,
+}
+
+
+# porównanie czasu obliczania statystyk przebiegu o podanej liczbie próbek
+def run_measure_case(depth, repeats, shape, method):
+    oscyloskop = SimulatedOscilloscope(memory_depth=depth, shape=shape)
+    data = (oscyloskop.record(1)[:depth] - oscyloskop.YOR - oscyloskop.YREF) * oscyloskop.YINC
+    times = []
+    for _ in range(repeats):
+        begin = time.perf_counter()
+        method(data, 1 / oscyloskop.sample_rate)
+        times.append(time.perf_counter() - begin)
+    return min(times)
+
+
+def print_result(name, result):
+    print(f"{name:<12} {result['channels']:>3} CH {result['depth']:>10} pkt "
+          f"{result['samples_per_s'] / 1e6:>10.2f} MSa/s "
+          f"{result['frame_latency'] * 1e3:>10.1f} ms/ramka "
+          f"{result['peak_memory'] / 2 ** 20:>10.1f} MiB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark akwizycji danych na symulowanym oscyloskopie")
+    parser.add_argument('--channels', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--depths', type=int, nargs='+', default=[12000, 120000, 1200000, 12000000, 24000000])
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--bandwidth', type=float, default=None, help="przepustowość łącza [B/s]")
+    parser.add_argument('--latency', type=float, default=0.0, help="opóźnienie zapytania [s]")
+    parser.add_argument('--shape', default='sine')
+    parser.add_argument('--methods', nargs='+', default=list(METHODS), choices=list(METHODS))
+    parser.add_argument('--measure', action='store_true', help="porównanie sposobów obliczania statystyk przebiegu")
+    args = parser.parse_args(argv)
+
+    if args.measure:
+        for depth in args.depths:
+            times = {name: run_measure_case(depth, args.repeats, args.shape, method)
+                     for name, method in MEASUREMENTS.items()}
+            print(f"{depth:>10} pkt " + " ".join(f"{name} {seconds * 1e3:>9.1f} ms" for name, seconds in times.items())
+                  + f"  przyspieszenie {times['builtin'] / times['kernel']:>6.1f}x")
+        return
+
+    for channels in args.channels:
+        for depth in args.depths:
+            for name in args.methods:
+                result = run_case(channels, depth, args.repeats, args.bandwidth, args.latency, args.shape,
+                                  METHODS[name])
+                print_result(name, result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+import math
+
+import numpy
+
+from profiling import profiler
+from waveform import RawWaveform, as_volts
+
+
+# stworzenie klasy przechowującej piramidę obwiedni min/max przebiegu (poziomy co 2x) do szybkiego rysowania
+class MinMaxPyramid:
+
+    def __init__(self, data, x0=0.0, dx=1.0, first_bucket=4, top_size=1024):
+        self.data = data  # pełny rekord próbek (poziom 0) - tablica napięć lub przebieg RawWaveform
+        self.x0 = x0  # czas pierwszej próbki
+        self.dx = dx  # odstęp czasu pomiędzy próbkami (XINC)
+        self.buckets = []  # liczba próbek przypadająca na jeden punkt obwiedni na każdym poziomie
+        self.mins = []
+        self.maxs = []
+
+        with profiler.stage('decimation'):
+            # pierwszy poziom: wartości min/max z grup po first_bucket próbek
+            bucket = first_bucket
+            source = data.raw if isinstance(data, RawWaveform) else data  # obwiednia liczona na kodach uint8
+            mins, maxs = self.reduce(source, source, bucket)
+            while mins.size > 1:
+                self.buckets.append(bucket)
+                self.mins.append(mins)
+                self.maxs.append(maxs)
+                if mins.size <= top_size:
+                    break
+                mins, maxs = self.reduce(mins, maxs, 2)  # każdy kolejny poziom jest 2x rzadszy
+                bucket *= 2
+            if source is not data:
+                self.scale_levels(data)
+
+    # przeliczenie poziomów obwiedni z kodów próbek na volty (w miejscu, tylko dla punktów obwiedni)
+    def scale_levels(self, waveform):
+        for level in self.mins + self.maxs:
+            level -= waveform.offset
+            level *= waveform.scale
+        if waveform.scale < 0:  # ujemny krok odwraca kolejność wartości
+            self.mins, self.maxs = self.maxs, self.mins
+
+    # redukcja tablic min/max w grupach po factor elementów (niepełna ostatnia grupa jest zachowywana)
+    @staticmethod
+    def reduce(mins, maxs, factor):
+        full = mins.size // factor * factor
+        newMins = mins[0:full:factor].astype(numpy.float32)
+        newMaxs = maxs[0:full:factor].astype(numpy.float32)
+        for offset in range(1, factor):  # porównania na widokach co factor-tej próbki są szybsze niż reshape().min()
+            numpy.minimum(newMins, mins[offset:full:factor], out=newMins, casting='unsafe')
+            numpy.maximum(newMaxs, maxs[offset:full:factor], out=newMaxs, casting='unsafe')
+        if full < mins.size:
+            newMins = numpy.append(newMins, numpy.float32(mins[full:].min()))
+            newMaxs = numpy.append(newMaxs, numpy.float32(maxs[full:].max()))
+        return newMins, newMaxs
+
+    def __len__(self):
+        return len(self.data)
+
+    # zakres czasu obejmowany przez rekord
+    def x_range(self):
+        return self.x0, self.x0 + (len(self.data) - 1) * self.dx
+
+    # zakres wartości przebiegu (odczytany z najwyższego poziomu piramidy)
+    def y_range(self):
+        if not self.mins:
+            return float(numpy.min(self.data)), float(numpy.max(self.data))
+        return float(self.mins[-1].min()), float(self.maxs[-1].max())
+
+    # pełny wektor czasu (tworzony dopiero na żądanie, np. przy zapisie do pliku)
+    def time(self):
+        return self.x0 + numpy.arange(len(self.data)) * self.dx
+
+    # punkty do narysowania w zakresie czasu [xmin, xmax], nie więcej niż około max_points
+    def view(self, xmin, xmax, max_points=4000):
+        size = len(self.data)
+        i0 = min(max(int(math.floor((xmin - self.x0) / self.dx)), 0), size)
+        i1 = min(max(int(math.ceil((xmax - self.x0) / self.dx)) + 1, 0), size)
+        count = i1 - i0
+
+        if count <= max_points or not self.buckets:
+            return self.x0 + numpy.arange(i0, i1) * self.dx, as_volts(self.data[i0:i1])
+
+        # wybór najdokładniejszego poziomu, który mieści się w limicie punktów (2 punkty na grupę)
+        level = len(self.buckets) - 1
+        for index, bucket in enumerate(self.buckets):
+            if 2 * count / bucket <= max_points:
+                level = index
+                break
+        bucket = self.buckets[level]
+        b0 = i0 // bucket
+        b1 = min(-(-i1 // bucket), self.mins[level].size)
+
+        y = numpy.empty(2 * (b1 - b0), dtype=numpy.float32)
+        y[0::2] = self.mins[level][b0:b1]
+        y[1::2] = self.maxs[level][b0:b1]
+        x = numpy.repeat(self.x0 + (numpy.arange(b0, b1) * bucket + bucket / 2) * self.dx, 2)
+        return x, y
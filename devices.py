@@ -0,0 +1,57 @@
+import json
+import os
+import threading
+
+
+# plik z ostatnio znalezioną listą urządzeń (wyświetlaną od razu po uruchomieniu programu)
+DEVICE_CACHE = os.path.join(os.path.expanduser("~"), ".oscilloscope_devices.json")
+
+
+# stworzenie klasy udostępniającej urządzenia VISA bez blokowania startu programu: menedżer zasobów jest tworzony
+# dopiero przy pierwszym użyciu, a lista urządzeń jest zapamiętywana w pliku
+class DeviceDirectory:
+
+    def __init__(self, cache_path=DEVICE_CACHE, backend=''):
+        self.cache_path = cache_path
+        self.backend = backend  # backend pyvisa ('' - domyślny, '@py' - pyvisa-py, '@sim' - pyvisa-sim)
+        self.manager = None
+        self.lock = threading.Lock()
+
+    # menedżer zasobów VISA (pyvisa jest importowane dopiero tutaj)
+    @property
+    def rm(self):
+        with self.lock:
+            if self.manager is None:
+                import pyvisa as visa
+                self.manager = visa.ResourceManager(self.backend)
+            return self.manager
+
+    def open_resource(self, name, **settings):
+        return self.rm.open_resource(name, **settings)
+
+    def list_resources(self):
+        return self.rm.list_resources()
+
+    # ostatnio znaleziona lista urządzeń (pusta, jeśli plik nie istnieje lub jest uszkodzony)
+    def cached(self):
+        try:
+            with open(self.cache_path) as file:
+                return [str(name) for name in json.load(file)]
+        except (OSError, ValueError, TypeError):
+            return []
+
+    # wyszukanie dostępnych urządzeń (może trwać kilka sekund) i zapamiętanie wyniku
+    def discover(self):
+        devices = list(self.list_resources())
+        try:
+            with open(self.cache_path, 'w') as file:
+                json.dump(devices, file)
+        except OSError:
+            pass  # brak możliwości zapisu nie przeszkadza w pomiarach
+        return devices
+
+    def close(self):
+        with self.lock:
+            if self.manager is not None:
+                self.manager.close()
+                self.manager = None
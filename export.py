@@ -0,0 +1,145 @@
+import json
+import math
+
+import numpy
+
+from waveform import as_volts
+
+
+# dostępne formaty zapisu (filtr okna dialogowego -> nazwa formatu)
+EXPORT_FORMATS = {
+    "Text Files(*.txt)": 'csv',
+    "CSV (*.csv)": 'csv',
+    "NumPy (*.npy)": 'npy',
+    "NumPy archiwum (*.npz)": 'npz',
+    "Surowe dane uint8 (*.bin)": 'raw',
+}
+
+
+# zamiana liczb na tekst w zapisie stałoprzecinkowym bez pętli po próbkach (macierz znaków, 0 - brak znaku);
+# wartości nieskończone, nan i zbyt duże dla liczb int64 są zapisywane jak repr() (np. 'nan', '-inf', '1e+20')
+def format_fixed(values, decimals):
+    values = numpy.asarray(values, dtype=numpy.float64)
+    special = ~(numpy.abs(values) < 10.0 ** (18 - decimals))  # również nan
+    finite = numpy.where(special, 0.0, values)
+    scaled = numpy.rint(numpy.abs(finite) * 10 ** decimals).astype(numpy.int64)
+    negative = numpy.signbit(finite) & (scaled > 0)  # wartości zaokrąglone do zera bez znaku
+    largest = int(scaled.max()) if scaled.size else 0
+    int_digits = max(len(str(largest // 10 ** decimals)), 1)
+    width = 1 + int_digits + (1 + decimals if decimals else 0)
+    texts = [repr(float(value)).encode() for value in values[special]]
+    width = max([width] + [len(text) for text in texts])
+
+    chars = numpy.zeros((values.size, width), dtype=numpy.uint8)
+    column = width - 1
+    for _ in range(decimals):  # cyfry części ułamkowej od końca
+        chars[:, column] = 48 + scaled % 10
+        scaled //= 10
+        column -= 1
+    if decimals:
+        chars[:, column] = ord('.')
+        column -= 1
+    for digit in range(int_digits):  # cyfry części całkowitej (bez zer wiodących)
+        significant = (scaled > 0) | (digit == 0)
+        chars[:, column] = numpy.where(significant, 48 + scaled % 10, 0)
+        scaled //= 10
+        column -= 1
+    chars[:, column] = numpy.where(negative, ord('-'), 0)
+    if texts:
+        rows = numpy.zeros((len(texts), width), dtype=numpy.uint8)
+        for row, text in zip(rows, texts):
+            row[:len(text)] = numpy.frombuffer(text, dtype=numpy.uint8)
+        chars[special] = rows
+    return chars
+
+
+# liczba miejsc po przecinku potrzebna do zapisania osi czasu o kroku dx
+def time_decimals(dx):
+    if dx <= 0:
+        return 9
+    return min(max(int(math.ceil(-math.log10(dx))) + 3, 0), 15)
+
+
+# zapis do pliku CSV fragmentami; oś czasu i napięcia (dla przebiegów RawWaveform) są wyliczane dla każdego fragmentu
+def export_csv(path, names, volts, x0, dx, chunk=1000000, decimals=6, progress=None):
+    size = min(len(volt) for volt in volts)
+    decimalsTime = time_decimals(dx)
+    with open(path, 'wb') as file:
+        file.write((",".join(f"{name} [V]" for name in names) + ",Czas [S]\n").encode())
+        for beginning in range(0, size, chunk):
+            end = min(beginning + chunk, size)
+            columns = [format_fixed(as_volts(volt[beginning:end], numpy.float64), decimals) for volt in volts]
+            columns.append(format_fixed(x0 + numpy.arange(beginning, end) * dx, decimalsTime))
+            separators = numpy.full((end - beginning, 1), ord(','), dtype=numpy.uint8)
+            parts = []
+            for column in columns:
+                parts.append(column)
+                parts.append(separators)
+            parts[-1] = numpy.full((end - beginning, 1), ord('\n'), dtype=numpy.uint8)
+            chars = numpy.hstack(parts)
+            file.write(chars[chars != 0].tobytes())
+            if progress is not None:
+                progress(end / size)
+
+
+# zapis wszystkich kanałów do pliku .npy jako tablica (liczba kanałów, liczba próbek) bez łączenia danych w pamięci
+def export_npy(path, names, volts, x0, dx, chunk=1000000, progress=None):
+    size = min(len(volt) for volt in volts)
+    header = {'descr': numpy.lib.format.dtype_to_descr(numpy.dtype(numpy.float64)),
+              'fortran_order': False, 'shape': (len(volts), size)}
+    with open(path, 'wb') as file:
+        numpy.lib.format.write_array_header_1_0(file, header)
+        for index, volt in enumerate(volts):
+            for beginning in range(0, size, chunk):  # przeliczanie na volty fragmentami
+                end = min(beginning + chunk, size)
+                file.write(numpy.ascontiguousarray(as_volts(volt[beginning:end], numpy.float64),
+                                                   dtype=numpy.float64).data)
+            if progress is not None:
+                progress((index + 1) / len(volts))
+
+
+# zapis kanałów do archiwum .npz razem z opisem osi czasu (x0, dx) zamiast pełnego wektora czasu
+def export_npz(path, names, volts, x0, dx, progress=None):
+    arrays = {name: volt for name, volt in zip(names, volts)}
+    numpy.savez(path, x0=x0, dx=dx, **arrays)
+    if progress is not None:
+        progress(1.0)
+
+
+# zapis surowych próbek uint8 (kanały jeden po drugim) oraz pliku .json z danymi skalującymi
+def export_raw(path, names, raws, preambles, progress=None):
+    with open(path, 'wb') as file:
+        for index, raw in enumerate(raws):
+            file.write(numpy.ascontiguousarray(raw, dtype=numpy.uint8).data)
+            if progress is not None:
+                progress((index + 1) / len(raws))
+
+    metadata = {
+        'channels': [],
+        'dtype': 'uint8',
+        'volt': '(code - YOR - YREF) * YINC',
+        'time': 'XREF + index * XINC',
+    }
+    offset = 0
+    for name, raw, (XINC, XREF, YOR, YREF, YINC) in zip(names, raws, preambles):
+        metadata['channels'].append({'name': name, 'offset': offset, 'length': len(raw), 'XINC': XINC,
+                                     'XREF': XREF, 'YOR': YOR, 'YREF': YREF, 'YINC': YINC})
+        offset += len(raw)
+    with open(path + '.json', 'w') as file:
+        json.dump(metadata, file, indent=2)
+
+
+# zapis danych w wybranym formacie
+def export(path, fmt, names, volts, x0, dx, raws=None, preambles=None, progress=None):
+    if fmt == 'csv':
+        export_csv(path, names, volts, x0, dx, progress=progress)
+    elif fmt == 'npy':
+        export_npy(path, names, volts, x0, dx, progress=progress)
+    elif fmt == 'npz':
+        export_npz(path, names, volts, x0, dx, progress=progress)
+    elif fmt == 'raw':
+        if raws is None or preambles is None:
+            raise ValueError("Brak surowych danych do zapisu")
+        export_raw(path, names, raws, preambles, progress=progress)
+    else:
+        raise ValueError(f"Nieznany format zapisu: {fmt}")
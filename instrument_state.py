@@ -0,0 +1,84 @@
+from acquisition import parse_preamble
+
+
+# liczba zapytań potrzebnych do pobrania stanu bez pamięci podręcznej (5 wartości skalujących + SRATe + TIMebase)
+QUERIES_WITHOUT_CACHE = 7
+
+# liczba zapytań potrzebnych do pobrania stanu przy braku wpisu w pamięci podręcznej (PREamble + TIMebase + SRATe)
+QUERIES_ON_MISS = 3
+
+# liczba zapytań sprawdzających przy każdym użyciu zapamiętanego stanu (PREamble + TIMebase)
+QUERIES_ON_HIT = 2
+
+# pola odpowiedzi :WAVeform:PREamble? wchodzące do odcisku ustawień (XINC, XORigin, XREF, YINC, YORigin, YREF);
+# liczba punktów zależy od zakresu :WAVeform:STARt/STOP i zmienia się przy pobieraniu kolejnych fragmentów
+PREAMBLE_FIELDS = slice(4, 10)
+
+
+# stworzenie klasy przechowującej dane skalujące i głębokość pamięci pomiędzy kolejnymi ramkami; przed każdym
+# użyciem zapamiętanego stanu porównywany jest odcisk ustawień (dane skalujące z :WAVeform:PREamble? zależne od
+# V/div, przesunięcia i częstotliwości próbkowania oraz podstawa czasu decydująca o głębokości pamięci)
+class InstrumentStateCache:
+
+    def __init__(self, check_query=":TIMebase:SCALe?"):
+        self.check_query = check_query  # zapytanie o podstawę czasu (wraz z SRATe wyznacza głębokość pamięci)
+        self.entries = {}  # zapamiętany stan dla poszczególnych kanałów: kanał -> (odcisk ustawień, stan)
+        self.source = None  # aktualnie wybrany kanał (ustawiany przez select_channel)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    # usunięcie zapamiętanego stanu (np. po zmianie trybu lub formatu danych)
+    def invalidate(self):
+        if self.entries:
+            self.invalidations += 1
+        self.entries.clear()
+
+    # zmiana źródła przebiegu; wpisy są przechowywane osobno dla każdego kanału i sprawdzane odciskiem ustawień,
+    # więc naprzemienne pobieranie kilku kanałów korzysta z zapamiętanego stanu każdego z nich
+    def select(self, channel):
+        self.source = channel
+
+    # zapis ustawienia zmieniającego stan oscyloskopu połączony z unieważnieniem pamięci podręcznej
+    def write(self, oscyloskop, command):
+        oscyloskop.write(command)
+        self.invalidate()
+
+    # odcisk aktualnych ustawień oscyloskopu oraz odpowiedź na zapytanie :WAVeform:PREamble?
+    def fingerprint(self, oscyloskop):
+        preamble = oscyloskop.query_ascii_values(":WAVeform:PREamble?")
+        time_base = oscyloskop.query_ascii_values(self.check_query)
+        return tuple(preamble[PREAMBLE_FIELDS]) + tuple(time_base), preamble, time_base
+
+    # pobranie danych skalujących i głębokości pamięci w postaci zwracanej przez get_waveform_state
+    def get(self, oscyloskop):
+        fingerprint, preamble, time_base = self.fingerprint(oscyloskop)
+        entry = self.entries.get(self.source)
+        if entry is not None and entry[0] == fingerprint:
+            self.hits += 1
+            return entry[1]
+        if entry is not None:  # zmienione ustawienia - zapamiętane dane skalujące kanału są nieaktualne
+            self.invalidations += 1
+            del self.entries[self.source]
+
+        self.misses += 1
+        XINC, XREF, YOR, YREF, YINC = parse_preamble(preamble)
+        samp_time = oscyloskop.query_ascii_values(":ACQuire:SRATe?")
+        DepthMemory = (time_base[0] * 12) * samp_time[0]
+
+        state = XINC, XREF, YOR, YREF, YINC, DepthMemory
+        self.entries[self.source] = fingerprint, state
+        return state
+
+    # liczba zaoszczędzonych zapytań w porównaniu z pobieraniem stanu w każdej ramce
+    def saved_queries(self):
+        total = (self.hits + self.misses) * QUERIES_WITHOUT_CACHE
+        return total - self.misses * QUERIES_ON_MISS - self.hits * QUERIES_ON_HIT
+
+    def statistics(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'saved_queries': self.saved_queries(),
+        }
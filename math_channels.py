@@ -0,0 +1,425 @@
+import ast
+import collections
+import itertools
+import math
+import re
+import threading
+
+import numpy
+
+from measurements import RunningStats, BLOCK
+from power import volts_block
+
+
+# numery kanałów matematycznych w nagraniach i strumieniu ramek (M1 -> 101, M2 -> 102, ...)
+MATH_CHANNEL = 100
+
+# funkcje dostępne w wyrażeniach (działające na całych tablicach próbek)
+FUNCTIONS = {
+    'abs': numpy.abs, 'sqrt': numpy.sqrt, 'exp': numpy.exp, 'log': numpy.log, 'log10': numpy.log10,
+    'sin': numpy.sin, 'cos': numpy.cos, 'tan': numpy.tan, 'sign': numpy.sign,
+    'minimum': numpy.minimum, 'maximum': numpy.maximum, 'clip': numpy.clip,
+}
+CONSTANTS = {'pi': numpy.float64(numpy.pi), 'e': numpy.float64(numpy.e)}
+
+# operacje zależne od próbek spoza obliczanego zakresu: całka od początku rekordu i pochodna
+OPERATORS = ('integral', 'derivative')
+
+# dozwolone elementy wyrażeń (bez atrybutów, indeksowania i wywołań spoza listy funkcji)
+NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.Name, ast.Load, ast.Constant, ast.Add, ast.Sub,
+         ast.Mult, ast.Div, ast.Pow, ast.Mod, ast.USub, ast.UAdd)
+
+# pamięć wyników [B] wspólna dla wszystkich kanałów matematycznych
+CACHE_BYTES = 64 * 2 ** 20
+
+# liczba próbek obliczanych naraz przy przeglądaniu całego rekordu (wielokrotność BLOCK)
+BATCH_SAMPLES = 2 ** 20
+
+# najmniejsza liczba punktów obwiedni całego rekordu liczonej raz dla ramki w wątku pomiarowym (zakres osi Y
+# i widok całego rekordu bez obliczania wyrażenia w wątku GUI)
+OVERVIEW_POINTS = 16384
+
+# kolejne numery przebiegów matematycznych - klucze pamięci wyników (każda ramka ma własne wyniki)
+WAVEFORM_KEYS = itertools.count()
+
+
+# wyjątek zgłaszany przy błędnej definicji kanału matematycznego
+class MathError(Exception):
+    pass
+
+
+# stworzenie klasy wyrażenia kanału matematycznego: tekst jest sprawdzany i kompilowany raz, a obliczenie
+# dowolnego zakresu próbek to jedno wywołanie kodu na tablicach numpy; argumenty całek i pochodnych są osobnymi
+# wyrażeniami, ponieważ wymagają próbek spoza obliczanego zakresu
+class MathExpression:
+
+    def __init__(self, text):
+        self.text = text.strip()
+        try:
+            tree = ast.parse(self.text, mode='eval')
+        except SyntaxError as error:
+            raise MathError(f"Błąd składni w wyrażeniu '{self.text}': {error.msg}")
+        self.parts = []  # wyrażenia argumentów integral() i derivative()
+        self.names = set()  # kanały użyte bezpośrednio w wyrażeniu
+        self.channels = set()  # wszystkie potrzebne kanały (również w argumentach całek i pochodnych)
+        self.time = False  # użycie osi czasu t
+        self.prepare(tree)
+        self.check_constants(tree)
+        self.code = compile(ast.fix_missing_locations(tree), '<kanał matematyczny>', 'eval')
+        if not self.channels:
+            raise MathError(f"Wyrażenie '{self.text}' nie używa żadnego kanału (CH1..CH4)")
+
+    # sprawdzenie elementów wyrażenia i zastąpienie argumentów integral()/derivative() numerami podwyrażeń
+    def prepare(self, node):
+        if not isinstance(node, NODES):
+            raise MathError(f"Niedozwolony element wyrażenia '{self.text}': {type(node).__name__}")
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.keywords:
+                raise MathError(f"Niedozwolone wywołanie w wyrażeniu '{self.text}'")
+            name = node.func.id
+            if name in OPERATORS:
+                if len(node.args) != 1:
+                    raise MathError(f"{name}() przyjmuje jeden argument")
+                part = MathExpression(ast.unparse(node.args[0]))
+                node.args = [ast.Constant(len(self.parts))]
+                self.parts.append(part)
+                self.channels |= part.channels
+                return
+            if name not in FUNCTIONS:
+                raise MathError(f"Nieznana funkcja '{name}'")
+            for argument in node.args:
+                self.prepare(argument)
+            return
+        if isinstance(node, ast.Name):
+            match = re.fullmatch(r'CH([1-4])', node.id)
+            if match:
+                self.names.add(int(match.group(1)))
+                self.channels.add(int(match.group(1)))
+            elif node.id == 't':
+                self.time = True
+            elif node.id not in CONSTANTS and node.id != 'dt':
+                raise MathError(f"Nieznana nazwa '{node.id}' (dostępne: CH1..CH4, t, dt, pi, e)")
+            return
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                raise MathError(f"Niedozwolona stała {node.value!r}")
+            try:  # stałe całkowite jako float - potęgi stałych nie są liczone na dowolnie dużych liczbach całkowitych
+                node.value = float(node.value)
+            except OverflowError:
+                raise MathError(f"Zbyt duża stała w wyrażeniu '{self.text}'")
+            return
+        for child in ast.iter_child_nodes(node):
+            self.prepare(child)
+
+    # obliczenie podwyrażeń złożonych wyłącznie ze stałych (np. 9 ** 9 ** 9) - przepełnienie lub dzielenie przez
+    # zero jest zgłaszane przy definiowaniu kanału, a nie w wątku pomiarowym
+    def check_constants(self, tree):
+        for node in ast.walk(tree):
+            if not isinstance(node, (ast.BinOp, ast.UnaryOp)):
+                continue
+            children = list(ast.walk(node))
+            if any(isinstance(child, ast.Call) or isinstance(child, ast.Name) and child.id not in CONSTANTS
+                   for child in children):
+                continue
+            try:
+                eval(compile(ast.fix_missing_locations(ast.Expression(node)), '<stała>', 'eval'),
+                     {'__builtins__': {}}, dict(CONSTANTS))
+            except ArithmeticError as error:
+                raise MathError(f"Błąd obliczenia stałej w wyrażeniu '{self.text}': {error}")
+
+    # wartości wyrażenia dla próbek [beginning, end) przebiegu matematycznego waveform
+    def evaluate(self, waveform, beginning, end):
+        namespace = dict(FUNCTIONS, **CONSTANTS)
+        namespace['dt'] = numpy.float64(waveform.dx)  # działania numpy zamiast wyjątków przepełnienia float
+        for channel in self.names:
+            namespace[f'CH{channel}'] = volts_block(waveform.sources[channel], beginning, end)
+        if self.time:
+            namespace['t'] = waveform.x0 + numpy.arange(beginning, end) * waveform.dx
+        namespace['integral'] = lambda index: waveform.integral(self.parts[index], beginning, end)
+        namespace['derivative'] = lambda index: waveform.derivative(self.parts[index], beginning, end)
+        with numpy.errstate(all='ignore'):  # np. log z wartości ujemnych daje nan zamiast ostrzeżeń
+            values = numpy.asarray(eval(self.code, {'__builtins__': {}}, namespace), dtype=numpy.float64)
+        if values.shape != (end - beginning,):  # wyrażenie stałe w zakresie
+            values = numpy.full(end - beginning, values)
+        return values
+
+
+# stworzenie klasy pamięci wyników kanałów matematycznych (LRU ograniczone liczbą bajtów), dzięki której ponowne
+# rysowanie, przybliżanie i zapis tej samej ramki nie powtarzają obliczeń
+class MathCache:
+
+    def __init__(self, capacity=CACHE_BYTES):
+        self.capacity = capacity
+        self.entries = collections.OrderedDict()  # klucz -> (wynik, liczba bajtów)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()  # wyniki są używane przez wątki pomiarowe i GUI
+
+    # wynik z pamięci lub obliczony przez compute() i zapamiętany (zbyt duże wyniki nie są zapamiętywane)
+    def get(self, key, compute):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        value = compute()
+        size = sum(array.nbytes for array in (value if isinstance(value, tuple) else (value,)))
+        if size <= self.capacity // 4:
+            with self.lock:
+                if key not in self.entries:
+                    self.entries[key] = (value, size)
+                    self.size += size
+                while self.size > self.capacity:
+                    oldest, removed = self.entries.popitem(last=False)[1]
+                    self.size -= removed
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+CACHE = MathCache()
+
+
+# stworzenie klasy przebiegu matematycznego jednej ramki: wartości liczone leniwie dla potrzebnego zakresu
+# (widocznego fragmentu, zapisu do pliku, nagrania); przebieg można rysować jak piramidę MinMaxPyramid
+# i zapisywać jak tablicę napięć
+class MathWaveform:
+
+    def __init__(self, expression, sources, dx, x0=0.0, cache=CACHE):
+        self.expression = expression
+        self.sources = sources  # kanał -> przebieg (RawWaveform lub tablica napięć)
+        self.dx = dx  # odstęp czasu pomiędzy próbkami
+        self.x0 = x0  # czas pierwszej próbki
+        self.size = min(len(sources[channel]) for channel in expression.channels)
+        self.key = next(WAVEFORM_KEYS)
+        self.cache = cache
+        self.stats = None
+        self.overview = None  # obwiednia całego rekordu (min, max) w grupach po overview_bucket próbek
+        self.overview_bucket = 2 ** max(math.ceil(math.log2(max(self.size, 1) / OVERVIEW_POINTS)), 0)
+        self.previews = {}  # krok -> przebieg liczony z co step-tej próbki kanałów (do wyświetlania)
+
+    @property
+    def XINC(self):
+        return self.dx
+
+    @property
+    def XREF(self):
+        return self.x0
+
+    def __len__(self):
+        return self.size
+
+    # wartości wyrażenia dla próbek [beginning, end); krótkie zakresy (np. widoczny fragment) są zapamiętywane,
+    # długie (zapis do pliku) liczone jednorazowo, aby nie usuwały z pamięci pozostałych wyników
+    def values(self, expression, beginning, end):
+        if end - beginning > BLOCK:
+            return expression.evaluate(self, beginning, end)
+        return self.cache.get((self.key, expression.text, beginning, end),
+                              lambda: expression.evaluate(self, beginning, end))
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            index = range(self.size)[key]
+            return float(self.values(self.expression, index, index + 1)[0])
+        start, stop, step = key.indices(self.size)
+        if step < 0:
+            return self.values(self.expression, 0, self.size)[key]
+        return self.values(self.expression, start, max(stop, start))[::step]
+
+    # pełny przebieg (np. dla numpy.savez)
+    def __array__(self, dtype=None, copy=None):
+        values = self.values(self.expression, 0, self.size)
+        return values if dtype is None else values.astype(dtype)
+
+    # kolejne fragmenty wartości wyrażenia (domyślnie całego kanału) liczone bez zapamiętywania
+    # (statystyki, obwiednia, zapis nagrania)
+    def chunks(self, expression=None, beginning=0, end=None, batch=BATCH_SAMPLES):
+        expression = expression or self.expression
+        end = self.size if end is None else end
+        for start in range(beginning, end, batch):
+            yield start, expression.evaluate(self, start, min(start + batch, end))
+
+    # całka (metoda prostokątów) od początku rekordu: suma fragmentów BLOCK próbek przed zakresem jest liczona
+    # raz dla ramki, a pozostała część - tylko od początku bloku zawierającego beginning
+    def integral(self, part, beginning, end):
+        block = beginning // BLOCK
+        prefix = self.block_sums(part)[block] + self.values(part, block * BLOCK, beginning).sum()
+        values = numpy.cumsum(self.values(part, beginning, end))
+        values += prefix
+        values *= self.dx
+        return values
+
+    # skumulowane sumy argumentu całki w blokach BLOCK próbek (element k - suma próbek [0, k * BLOCK))
+    def block_sums(self, part):
+        def compute():
+            sums = [numpy.zeros(1)]
+            for start, values in self.chunks(part, batch=BATCH_SAMPLES // BLOCK * BLOCK):
+                sums.append(numpy.add.reduceat(values, numpy.arange(0, values.size, BLOCK)))
+            return numpy.cumsum(numpy.concatenate(sums))
+
+        return self.cache.get((self.key, part.text, 'sums'), compute)
+
+    # pochodna liczona z jedną dodatkową próbką po obu stronach zakresu (różnice centralne jak w całym rekordzie)
+    def derivative(self, part, beginning, end):
+        low, high = max(beginning - 1, 0), min(end + 1, self.size)
+        values = self.values(part, low, high)
+        if values.size < 2:
+            return numpy.zeros(end - beginning)
+        return numpy.gradient(values, self.dx)[beginning - low:end - low]
+
+    # zakres czasu obejmowany przez rekord
+    def x_range(self):
+        return self.x0, self.x0 + (self.size - 1) * self.dx
+
+    # przebieg z co step-tej próbki kanałów (całki i pochodne liczone z krokiem step * dx); do wyświetlania
+    # wystarczy obliczenie wyrażenia dla około tylu próbek, ile punktów ma wykres
+    def decimated(self, step):
+        if step <= 1:
+            return self
+        preview = self.previews.get(step)
+        if preview is None:
+            sources = {channel: self.sources[channel][::step] for channel in self.expression.channels}
+            preview = self.previews[step] = MathWaveform(self.expression, sources, self.dx * step, self.x0, self.cache)
+        return preview
+
+    # zakres wartości (pomijane są wartości nieskończone i nan): z obwiedni całego rekordu, jeśli została już
+    # policzona (zapis, nagrywanie), a w przeciwnym razie z co overview_bucket-tej próbki
+    def y_range(self):
+        if self.overview is not None:
+            values = numpy.concatenate(self.overview)
+        else:
+            preview = self.decimated(self.overview_bucket)
+            values = preview.values(self.expression, 0, preview.size)
+        values = values[numpy.isfinite(values)]
+        if not values.size:
+            return 0.0, 0.0
+        return float(values.min()), float(values.max())
+
+    # punkty do narysowania w zakresie czasu [xmin, xmax] jak w MinMaxPyramid.view; w długich zakresach wyrażenie
+    # jest liczone tylko dla co step-tej próbki (krok będący potęgą dwójki - te same próbki przy przesuwaniu
+    # wykresu), a obwiednia całego rekordu jest używana, jeśli została już policzona
+    def view(self, xmin, xmax, max_points=4000):
+        i0 = min(max(int(math.floor((xmin - self.x0) / self.dx)), 0), self.size)
+        i1 = min(max(int(math.ceil((xmax - self.x0) / self.dx)) + 1, 0), self.size)
+        count = i1 - i0
+        if count <= max_points:
+            return self.x0 + numpy.arange(i0, i1) * self.dx, self.values(self.expression, i0, i1)
+
+        bucket = 2 ** math.ceil(math.log2(2 * count / max_points))
+        if self.overview is None or bucket < self.overview_bucket:
+            step = bucket // 2  # dwa punkty na grupę, jak w obwiedni
+            preview = self.decimated(step)
+            j0, j1 = i0 // step, min(-(-i1 // step), preview.size)
+            return self.x0 + numpy.arange(j0, j1) * step * self.dx, preview.values(self.expression, j0, j1)
+
+        b0, b1 = i0 // bucket, -(-i1 // bucket)  # grupy obwiedni całego rekordu
+        factor = bucket // self.overview_bucket
+        groups = numpy.arange(b0 * factor, min(b1 * factor, self.overview[0].size), factor)
+        mins, maxs = (numpy.fmin.reduceat(self.overview[0], groups) if groups.size else self.overview[0][:0],
+                      numpy.fmax.reduceat(self.overview[1], groups) if groups.size else self.overview[1][:0])
+        y = numpy.empty(2 * mins.size, dtype=numpy.float32)
+        y[0::2] = mins
+        y[1::2] = maxs
+        x = numpy.repeat(self.x0 + (numpy.arange(b0, b0 + mins.size) * bucket + bucket / 2) * self.dx, 2)
+        return x, y
+
+    # jeden przebieg po całym rekordzie: statystyki (max, min, rms, częstotliwość) i obwiednia całego rekordu
+    def summarize(self):
+        stats = RunningStats(self.dx)
+        bucket = self.overview_bucket
+        mins, maxs = [numpy.empty(0, dtype=numpy.float32)], [numpy.empty(0, dtype=numpy.float32)]
+        for start, values in self.chunks(batch=max(BATCH_SAMPLES // bucket, 1) * bucket):
+            stats.update(values)
+            groups = numpy.arange(0, values.size, bucket)
+            mins.append(numpy.fmin.reduceat(values, groups).astype(numpy.float32))
+            maxs.append(numpy.fmax.reduceat(values, groups).astype(numpy.float32))
+        self.stats = stats
+        self.overview = numpy.concatenate(mins), numpy.concatenate(maxs)
+        return stats
+
+    # statystyki całego przebiegu liczone razem z obwiednią całego rekordu
+    def statistics(self):
+        if self.stats is None:
+            self.summarize()
+        return self.stats
+
+    # zamiana na surowe kody uint8 z danymi skalującymi (XINC, XREF, YOR, YREF, YINC), tak jak kanały
+    # oscyloskopu w nagraniach i strumieniu ramek; out - bufor na kody (np. bufor ramki); wartości są liczone
+    # fragmentami, bez tablicy całego rekordu
+    def encode(self, out=None):
+        stats = self.statistics()
+        low, high = stats.minValue, stats.maxValue
+        if not numpy.isfinite(low) or not numpy.isfinite(high):
+            low, high = 0.0, 0.0
+        YINC = (high - low) / 250 if high > low else 1.0
+        YREF = 2 - low / YINC  # kod 2 odpowiada wartości najmniejszej
+        raw = numpy.empty(self.size, dtype=numpy.uint8) if out is None else out[:self.size]
+        for start, values in self.chunks():
+            codes = numpy.nan_to_num(values / YINC + YREF, nan=0.0)
+            raw[start:start + values.size] = numpy.clip(numpy.rint(codes), 0, 255)
+        return raw, (self.dx, self.x0, 0.0, YREF, YINC)
+
+
+# stworzenie klasy przechowującej definicje kanałów matematycznych wspólne dla wątków pomiarowych
+class MathChannels:
+
+    def __init__(self):
+        self.definitions = []  # lista (nazwa, wyrażenie MathExpression)
+        self.lock = threading.Lock()
+
+    # definicje z tekstu: jedna w wierszu, 'nazwa = wyrażenie' lub samo wyrażenie (nazwa M1, M2, ...)
+    @staticmethod
+    def parse(text):
+        definitions = []
+        for number, line in enumerate(text.splitlines(), 1):
+            line = line.split('#')[0].strip()
+            if not line:
+                continue
+            name, separator, expression = line.partition('=')
+            if not separator:
+                name, expression = f"M{len(definitions) + 1}", line
+            name = name.strip()
+            if not name.isidentifier() or re.fullmatch(r'CH[1-4]', name):
+                raise MathError(f"Wiersz {number}: niepoprawna nazwa kanału '{name}'")
+            try:
+                definitions.append((name, MathExpression(expression)))
+            except MathError as error:
+                raise MathError(f"Wiersz {number}: {error}")
+        return definitions
+
+    def configure(self, definitions):
+        with self.lock:
+            self.definitions = list(definitions)
+
+    def text(self):
+        return "\n".join(f"{name} = {expression.text}" for name, expression in self.definitions)
+
+    @property
+    def enabled(self):
+        return bool(self.definitions)
+
+    # przebiegi matematyczne ramki: lista (numer kanału, nazwa, MathWaveform) dla definicji, których kanały
+    # zostały pobrane; sources - kanał -> przebieg
+    def bind(self, sources, dx, x0=0.0):
+        with self.lock:
+            definitions = list(self.definitions)
+        return [(MATH_CHANNEL + index + 1, name, MathWaveform(expression, sources, dx, x0))
+                for index, (name, expression) in enumerate(definitions) if expression.channels <= set(sources)]
+
+
+# wpisy kanałów matematycznych w postaci zapisywanej przez Recorder i udostępnianej przez FrameServer:
+# (kanał, surowe kody, dane skalujące, (max, min, rms, freq)); kody trafiają do buforów ramki
+def math_records(channels, frame=None):
+    records = []
+    for number, name, waveform in channels:
+        out = frame.buffer(f'math{number}', len(waveform), numpy.uint8) if frame is not None else None
+        raw, preamble = waveform.encode(out)
+        stats = waveform.statistics()
+        records.append((number, raw, preamble, stats.result() + (stats.frequency(),)))
+    return records
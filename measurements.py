@@ -0,0 +1,363 @@
+import numpy
+
+from profiling import profiler
+
+
+# wartość zwracana, gdy pomiar nie jest możliwy (taka sama jak zwracana przez oscyloskop)
+INVALID = 9.9e+37
+
+# liczba próbek przetwarzanych naraz - fragment mieści się w pamięci podręcznej procesora podczas wszystkich redukcji
+BLOCK = 65536
+
+# największy stosunek najdłuższego do najkrótszego odstępu pomiędzy zboczami, przy którym częstotliwość jest
+# uznawana za poprawną (nieregularne zbocza pochodzą od szumu, a nie od sygnału okresowego)
+REGULARITY = 1.5
+
+# najmniejsza połowa szerokości pasma histerezy dla surowych kodów próbek (szum i kwantyzacja przetwornika)
+MIN_BAND_CODES = 2
+
+
+# zakres wartości skończonych (nan i nieskończoności pomijane), None - brak wartości skończonych
+def finite_range(values):
+    minValue, maxValue = float(values.min()), float(values.max())
+    if not numpy.isfinite(minValue) or not numpy.isfinite(maxValue):
+        values = values[numpy.isfinite(values)]
+        if not values.size:
+            return None
+        minValue, maxValue = float(values.min()), float(values.max())
+    return minValue, maxValue
+
+
+# stworzenie klasy przechowującej statystyki przebiegu aktualizowane po każdym odebranym fragmencie danych
+# (max, min, średnia, wartość skuteczna, odchylenie standardowe, międzyszczytowa i częstotliwość w jednym przebiegu)
+class RunningStats:
+
+    def __init__(self, dx=None, hysteresis=0.1):
+        self.dx = dx  # odstęp czasu pomiędzy próbkami (XINC); None - bez pomiaru częstotliwości
+        self.hysteresis = hysteresis  # szerokość pasma histerezy jako część wartości międzyszczytowej
+        self.count = 0
+        self.missing = 0  # liczba próbek nan pominiętych w statystykach
+        self.maxValue = -numpy.inf
+        self.minValue = numpy.inf
+        self.sum = 0.0
+        self.sumSquares = 0.0
+
+        # stan detektora zboczy narastających (zachowywany pomiędzy fragmentami)
+        self.level = None  # poziom, przy którym liczone są przejścia (środek zakresu wartości)
+        self.low = None  # dolny i górny próg histerezy
+        self.high = None
+        self.levelRange = None  # zakres wartości, z którego wyznaczono poziom
+        self.seen = None  # zakres wartości skończonych dotychczas przetworzonych próbek
+        self.fixed = False  # poziom podany dla całego rekordu (set_level) - bez ponownego wyznaczania
+        self.state = 0  # ostatni stan sygnału: -1 poniżej progu dolnego, 1 powyżej górnego, 0 nieznany
+        self.lastIndex = 0  # położenie i wartość ostatniej próbki poza pasmem histerezy
+        self.lastValue = 0.0
+        self.crossings = 0  # liczba zboczy narastających
+        self.firstCrossing = None  # interpolowane położenia pierwszego i ostatniego zbocza [próbki]
+        self.lastCrossing = None
+        self.shortest = None  # najkrótszy i najdłuższy odstęp pomiędzy kolejnymi zboczami [próbki]
+        self.longest = None
+        self.firstState = 0  # stan, położenie i wartość pierwszej próbki poza pasmem histerezy (do łączenia fragmentów)
+        self.firstIndex = 0
+        self.firstValue = 0.0
+        self.edges = None  # położenia wszystkich zboczy (lista tablic); None - zapisywane tylko pierwsze i ostatnie
+
+    # aktualizacja statystyk o kolejny fragment przebiegu (w voltach)
+    def update(self, chunk):
+        with profiler.stage('measure'):
+            if self.dx is not None and self.level is None and chunk.size:
+                # poziom przejść wyznaczany z całego pierwszego fragmentu (dodatkowy odczyt tylko jeden raz);
+                # w kolejnych fragmentach sprawdzane jest, czy zakres całego rekordu nie jest znacznie szerszy
+                self.check_level(finite_range(chunk))
+            for beginning in range(0, chunk.size, BLOCK):
+                self.update_block(chunk[beginning:beginning + BLOCK])
+
+    def update_block(self, block):
+        if block.size == 0:
+            return
+        maxValue = float(block.max())
+        minValue = float(block.min())
+        values = block
+        if numpy.isnan(maxValue) or numpy.isnan(minValue):  # próbki nan (np. kanały matematyczne) są pomijane
+            values = block[~numpy.isnan(block)]
+            self.missing += block.size - values.size
+            maxValue, minValue = (float(values.max()), float(values.min())) if values.size else (-numpy.inf, numpy.inf)
+        self.maxValue = max(self.maxValue, maxValue)
+        self.minValue = min(self.minValue, minValue)
+        self.sum += float(values.sum())
+        self.sumSquares += float(numpy.dot(values, values))
+        if self.dx is not None:
+            finite = numpy.isfinite(minValue) and numpy.isfinite(maxValue)
+            self.check_level((minValue, maxValue) if finite else finite_range(values) if values.size else None)
+        if self.level is not None:
+            self.find_crossings(block)
+        self.count += block.size
+
+    # poziom przejść podany dla całego rekordu (np. przy łączeniu statystyk fragmentów liczonych osobno)
+    def set_level(self, minValue, maxValue, fixed=True):
+        self.level = (maxValue + minValue) / 2
+        band = (maxValue - minValue) * self.hysteresis / 2
+        self.low = self.level - band
+        self.high = self.level + band
+        self.levelRange = minValue, maxValue
+        self.fixed = fixed
+
+    # wyznaczenie poziomu z zakresu dotychczasowych próbek; jeśli zakres rekordu jest znacznie szerszy niż ten,
+    # z którego wyznaczono poziom, wcześniejsze zbocza (liczone przy zbyt wąskiej histerezie) są odrzucane
+    def check_level(self, values):
+        if values is None or self.fixed:
+            return
+        minValue, maxValue = values
+        if self.seen is not None:
+            minValue, maxValue = min(minValue, self.seen[0]), max(maxValue, self.seen[1])
+        self.seen = minValue, maxValue
+        if maxValue <= minValue:
+            return
+        if self.level is not None:
+            levelLow, levelHigh = self.levelRange
+            if maxValue - minValue <= 2 * (levelHigh - levelLow) and self.low <= (maxValue + minValue) / 2 <= self.high:
+                return
+            self.reset_crossings()
+        self.set_level(minValue, maxValue, fixed=False)
+
+    def reset_crossings(self):
+        self.state = 0
+        self.crossings = 0
+        self.firstCrossing = None
+        self.lastCrossing = None
+        self.shortest = None
+        self.longest = None
+        self.firstState = 0
+        if self.edges is not None:
+            self.edges = []
+
+    # uwzględnienie odstępów pomiędzy kolejnymi zboczami [próbki]
+    def add_intervals(self, shortest, longest):
+        self.shortest = shortest if self.shortest is None else min(self.shortest, shortest)
+        self.longest = longest if self.longest is None else max(self.longest, longest)
+
+    # wyszukanie zboczy narastających: przejście od próbki poniżej progu dolnego do próbki powyżej progu górnego
+    # stan każdej próbki: -1 poniżej progu dolnego, 1 powyżej górnego, 0 w paśmie histerezy
+    def classify(self, block):
+        states = numpy.zeros(block.size, dtype=numpy.int8)
+        states[block < self.low] = -1
+        states[block > self.high] = 1
+        return states
+
+    def find_crossings(self, block):
+        states = self.classify(block)
+        indices = numpy.flatnonzero(states)  # próbki poza pasmem histerezy
+        if indices.size == 0:
+            return
+        states = states[indices]
+        if not self.firstState and not self.state:
+            self.firstState = int(states[0])
+            self.firstIndex = int(indices[0]) + self.count
+            self.firstValue = float(block[indices[0]])
+        carried = bool(self.state)
+        if carried:  # dołączenie ostatniej próbki poprzedniego fragmentu (indeks -1 zastępowany poniżej)
+            indices = numpy.concatenate(([-1], indices))
+            states = numpy.concatenate(([self.state], states))
+
+        rising = numpy.flatnonzero((states[:-1] < 0) & (states[1:] > 0))
+        if rising.size:
+            # interpolacja liniowa położenia przejścia przez poziom pomiędzy próbkami po obu stronach histerezy
+            # (wartości odczytywane tylko dla próbek przy zboczach; kody uint8 zamieniane na float przed odejmowaniem)
+            before, after = indices[rising], indices[rising + 1]
+            valueBefore = block[before].astype(numpy.float64)
+            valueAfter = block[after].astype(numpy.float64)
+            before = before + self.count
+            if carried and rising[0] == 0:
+                before[0] = self.lastIndex
+                valueBefore[0] = self.lastValue
+            positions = before + (self.level - valueBefore) / (valueAfter - valueBefore) * (after + self.count - before)
+            if self.lastCrossing is not None:
+                intervals = numpy.diff(positions, prepend=self.lastCrossing)
+                self.add_intervals(float(intervals.min()), float(intervals.max()))
+            elif positions.size > 1:
+                intervals = numpy.diff(positions)
+                self.add_intervals(float(intervals.min()), float(intervals.max()))
+            if self.firstCrossing is None:
+                self.firstCrossing = float(positions[0])
+            self.lastCrossing = float(positions[-1])
+            self.crossings += rising.size
+            if self.edges is not None:
+                self.edges.append(positions)
+
+        self.state = int(states[-1])
+        self.lastIndex = int(indices[-1]) + self.count
+        self.lastValue = float(block[indices[-1]])
+
+    def add_crossing(self, position):
+        if self.firstCrossing is None:
+            self.firstCrossing = position
+        else:
+            self.add_intervals(position - self.lastCrossing, position - self.lastCrossing)
+        self.lastCrossing = position
+        self.crossings += 1
+        if self.edges is not None:
+            self.edges.append(numpy.array([position]))
+
+    # dołączenie statystyk następnego fragmentu przebiegu liczonych osobno (np. w innym procesie) przy tym samym
+    # poziomie przejść; zbocze pomiędzy fragmentami jest wykrywane tak samo jak przy przetwarzaniu ciągłym
+    def merge(self, other):
+        if other.count == 0:
+            return
+        offset = self.count
+        self.maxValue = max(self.maxValue, other.maxValue)
+        self.minValue = min(self.minValue, other.minValue)
+        self.sum += other.sum
+        self.sumSquares += other.sumSquares
+        self.count += other.count
+        self.missing += other.missing
+        if not other.firstState:
+            return
+        if self.state < 0 and other.firstState > 0:
+            after = other.firstIndex + offset
+            self.add_crossing(self.lastIndex + (self.level - self.lastValue) / (other.firstValue - self.lastValue)
+                              * (after - self.lastIndex))
+        elif not self.state and not self.firstState:
+            self.firstState = other.firstState
+            self.firstIndex = other.firstIndex + offset
+            self.firstValue = other.firstValue
+        if other.crossings:
+            if self.firstCrossing is None:
+                self.firstCrossing = other.firstCrossing + offset
+            else:
+                interval = other.firstCrossing + offset - self.lastCrossing
+                self.add_intervals(interval, interval)
+            if other.shortest is not None:
+                self.add_intervals(other.shortest, other.longest)
+            self.lastCrossing = other.lastCrossing + offset
+            self.crossings += other.crossings
+            if self.edges is not None and other.edges is not None:
+                self.edges.extend(positions + offset for positions in other.edges)
+        self.state = other.state
+        self.lastIndex = other.lastIndex + offset
+        self.lastValue = other.lastValue
+
+    # położenia wszystkich zboczy narastających [próbki] (zapisywane, gdy przed aktualizacją edges = [])
+    def edge_positions(self):
+        return numpy.concatenate(self.edges) if self.edges else numpy.empty(0)
+
+    # liczba próbek uwzględnionych w statystykach (bez próbek nan)
+    def valid(self):
+        return self.count - self.missing
+
+    def mean(self):
+        return self.sum / self.valid() if self.valid() else INVALID
+
+    def rms(self):
+        return numpy.sqrt(self.sumSquares / self.valid()) if self.valid() else INVALID
+
+    def std(self):
+        if not self.valid():
+            return INVALID
+        mean = self.sum / self.valid()
+        return numpy.sqrt(max(self.sumSquares / self.valid() - mean * mean, 0.0))
+
+    def peak_to_peak(self):
+        return self.maxValue - self.minValue if self.valid() else INVALID
+
+    # częstotliwość wyznaczona z odległości pomiędzy pierwszym i ostatnim zboczem narastającym; wymagane są co
+    # najmniej dwa zbocza (pełny okres) w regularnych odstępach, jak w pomiarze FREQ oscyloskopu
+    def frequency(self):
+        if self.crossings < 2 or self.lastCrossing <= self.firstCrossing:
+            return INVALID
+        if self.longest > REGULARITY * self.shortest:
+            return INVALID
+        return (self.crossings - 1) / ((self.lastCrossing - self.firstCrossing) * self.dx)
+
+    # wartości w tej samej postaci co zwracane przez funkcję measure
+    def result(self):
+        if not self.valid():
+            return INVALID, INVALID, INVALID
+        return self.maxValue, self.minValue, self.rms()
+
+    # wszystkie wyniki pomiarów: max, min, średnia, skuteczna, odchylenie standardowe, międzyszczytowa, częstotliwość
+    def summary(self):
+        max, min, rms = self.result()
+        return max, min, self.mean(), rms, self.std(), self.peak_to_peak(), self.frequency()
+
+
+# stworzenie klasy statystyk liczonych na surowych kodach uint8: histogram 256 kodów zastępuje redukcje na napięciach,
+# a wartości w voltach są wyznaczane z histogramu na końcu (przejścia przez poziom liczone są w kodach)
+class RawStats(RunningStats):
+
+    def __init__(self, offset, scale, dx=None, hysteresis=0.1):
+        super().__init__(dx, hysteresis)
+        self.offset = offset  # napięcie = (kod - offset) * scale
+        self.scale = scale
+        self.counts = numpy.zeros(256, dtype=numpy.int64)  # liczba próbek o każdym kodzie
+
+    def update(self, chunk):
+        super().update(chunk)
+        self.scale_values()
+
+    def update_block(self, block):
+        if block.size == 0:
+            return
+        self.counts += numpy.bincount(block, minlength=256)
+        if self.dx is not None and not self.fixed:  # zakres kodów odczytany z histogramu
+            present = numpy.flatnonzero(self.counts)
+            self.check_level((int(present[0]), int(present[-1])))
+        if self.level is not None:
+            self.find_crossings(block)
+        self.count += block.size
+
+    # stan próbek odczytany z tablicy 256 kodów zamiast dwóch porównań z progami
+    def classify(self, block):
+        return self.states[block]
+
+    def set_level(self, minValue, maxValue, fixed=True):
+        super().set_level(minValue, maxValue, fixed)
+        self.low = min(self.low, self.level - MIN_BAND_CODES)
+        self.high = max(self.high, self.level + MIN_BAND_CODES)
+        codes = numpy.arange(256)
+        self.states = numpy.zeros(256, dtype=numpy.int8)
+        self.states[codes < self.low] = -1
+        self.states[codes > self.high] = 1
+
+    def merge(self, other):
+        super().merge(other)
+        self.counts += other.counts
+        self.scale_values()
+
+    # wartości w voltach wyznaczone z histogramu kodów
+    def scale_values(self):
+        present = numpy.flatnonzero(self.counts)
+        if present.size == 0:
+            return
+        volts = (numpy.arange(256) - self.offset) * self.scale
+        lowest, highest = volts[present[0]], volts[present[-1]]
+        self.maxValue, self.minValue = float(max(lowest, highest)), float(min(lowest, highest))
+        self.sum = float(numpy.dot(self.counts, volts))
+        self.sumSquares = float(numpy.dot(self.counts, volts * volts))
+
+
+# suma iloczynów dwóch przebiegów (lub kodów pomniejszonych o offset1 i offset2) liczona fragmentami BLOCK próbek
+def product_sum(data1, data2, offset1=0.0, offset2=0.0):
+    total = 0.0
+    for beginning in range(0, len(data1), BLOCK):
+        block1 = data1[beginning:beginning + BLOCK] - numpy.float64(offset1)
+        block2 = data2[beginning:beginning + BLOCK] - numpy.float64(offset2)
+        total += float(numpy.dot(block1, block2))
+    return total
+
+
+# moc czynna - średnia z iloczynu przebiegów; przebiegi RawWaveform są mnożone na kodach próbek
+def active_power(data1, data2):
+    if not len(data1):
+        return INVALID
+    if hasattr(data1, 'raw') and hasattr(data2, 'raw'):
+        return product_sum(data1.raw, data2.raw, data1.offset, data2.offset) * data1.scale * data2.scale / len(data1)
+    return product_sum(data1, data2) / len(data1)
+
+
+# obliczenie wszystkich statystyk przebiegu w jednym przebiegu po danych
+def measure_all(data, dx=None):
+    if hasattr(data, 'statistics'):  # przebieg RawWaveform - statystyki z histogramu kodów próbek
+        return data.statistics()
+    stats = RunningStats(dx)
+    stats.update(data)
+    return stats
@@ -0,0 +1,64 @@
+import numpy
+import queue
+import threading
+
+from acquisition import get_waveform_state, read_chunks, stop, start, wait_until_stopped
+from measurements import RawStats
+from waveform import RawWaveform
+
+
+# pobieranie kolejnych fragmentów danych w osobnym wątku, statystyki surowych kodów w wątku wywołującym
+# (przeliczanie na volty nie jest potrzebne - zwracane są surowe próbki uint8)
+def transfer_pipelined(oscyloskop, DepthMemory, YOR, YREF, YINC, sample=500000, frame=None, XINC=None, link=None):
+    DepthMemory = int(round(DepthMemory))
+    if frame is not None:  # bufor wielokrotnego użytku z pierścienia ramek
+        raw = frame.buffer('raw', DepthMemory, numpy.uint8)
+    else:
+        raw = numpy.empty(DepthMemory, dtype=numpy.uint8)  # bufor na surowe próbki
+    chunks = queue.Queue()  # kolejka z zakresami fragmentów gotowych do przeliczenia
+
+    # wątek pobierający kolejne fragmenty danych z oscyloskopu
+    def producer():
+        try:
+            for item in read_chunks(oscyloskop, raw, DepthMemory, sample, link):
+                chunks.put(item)
+            chunks.put(None)  # znacznik końca pobierania
+        except Exception as error:
+            chunks.put(error)
+
+    worker = threading.Thread(target=producer, daemon=True)
+    worker.start()
+
+    # częstotliwość liczona lokalnie, jeśli znany jest XINC
+    stats = RawStats(YOR[0] + YREF[0], YINC[0], XINC[0] if XINC is not None else None)
+    length = 0
+    while True:
+        item = chunks.get()
+        if item is None:
+            break
+        if isinstance(item, Exception):
+            worker.join()
+            raise item
+        beginning, end = item
+        stats.update(raw[beginning:end])
+        length = max(length, end)
+    worker.join()
+
+    return raw[:length], stats
+
+
+# odpowiednik funkcji program, w którym pobieranie danych odbywa się równolegle z ich przetwarzaniem
+def program_pipelined(oscyloskop, sample=500000, timeout=2.0, cache=None, frame=None, link=None):
+    stop(oscyloskop)
+    try:
+        wait_until_stopped(oscyloskop, timeout)  # oczekiwanie na zakończenie akwizycji przed pobieraniem danych
+        XINC, XREF, YOR, YREF, YINC, DepthMemory = get_waveform_state(oscyloskop, cache)
+        raw, stats = transfer_pipelined(oscyloskop, DepthMemory, YOR, YREF, YINC, sample, frame, XINC, link)
+    finally:
+        start(oscyloskop)  # oscyloskop jest wznawiany również po przekroczeniu czasu lub błędzie transferu
+    data = RawWaveform(raw, XINC[0], XREF[0], YOR[0], YREF[0], YINC[0], stats)
+    if frame is not None:
+        frame.records = [(raw, data.preamble)]
+    frq = [stats.frequency()]  # częstotliwość z przejść przez poziom zamiast zapytania :MEAS:ITEM? FREQ
+
+    return data, XINC, XREF, frq, stats.result()
@@ -0,0 +1,226 @@
+import threading
+import time
+
+import numpy
+
+from measurements import RunningStats, RawStats, INVALID, BLOCK
+from profiling import profiler
+from waveform import RawWaveform
+
+
+# liczba wyznaczanych harmonicznych (łącznie z podstawową)
+HARMONICS = 40
+
+# liczba pełnych okresów, z których wyznaczane są harmoniczne (okno 10 okresów jak w IEC 61000-4-7)
+HARMONIC_CYCLES = 10
+
+# największa długość transformaty harmonicznych; dłuższe okna są przed FFT uśredniane blokami próbek
+HARMONIC_SAMPLES = 2 ** 20
+
+# liczba ramek przechowywanych w historii wyników (trendy)
+TREND_LENGTH = 3600
+
+# wyniki kolejnych okresów podstawowej: czas początku i długość okresu [s], moce, współczynnik mocy,
+# przesunięcie fazowe podstawowych harmonicznych napięcia i prądu [°] oraz wartości skuteczne
+CYCLE_DTYPE = numpy.dtype([
+    ('start', '<f8'), ('duration', '<f8'), ('P', '<f8'), ('Q', '<f8'), ('S', '<f8'), ('PF', '<f8'), ('phase', '<f8'),
+    ('Urms', '<f8'), ('Irms', '<f8'),
+])
+
+# wyniki całych ramek zapisywane w historii (trendy)
+TREND_DTYPE = numpy.dtype([
+    ('timestamp', '<f8'), ('frequency', '<f8'), ('P', '<f8'), ('Q', '<f8'), ('S', '<f8'), ('PF', '<f8'),
+    ('phase', '<f8'), ('Urms', '<f8'), ('Irms', '<f8'), ('THDu', '<f8'), ('THDi', '<f8'),
+])
+
+
+# napięcia fragmentu [beginning, end) przebiegu w float64 (przebiegi RawWaveform przeliczane tylko dla fragmentu)
+def volts_block(data, beginning, end):
+    if isinstance(data, RawWaveform):
+        return (data.raw[beginning:end] - numpy.float64(data.offset)) * data.scale
+    return numpy.asarray(data[beginning:end], dtype=numpy.float64)
+
+
+# położenia zboczy narastających przebiegu [próbki] - granice kolejnych okresów podstawowej
+def cycle_edges(data, dx, hysteresis=0.1):
+    if isinstance(data, RawWaveform):  # przejścia wyszukiwane na kodach próbek
+        detector = RawStats(data.offset, data.scale, dx, hysteresis)
+        samples = data.raw
+    else:
+        detector = RunningStats(dx, hysteresis)
+        samples = numpy.asarray(data)
+    detector.edges = []
+    detector.update(samples)
+    return detector.edge_positions()
+
+
+# dodanie do totals sum wartości z kolejnych okresów [bounds[k], bounds[k + 1]) zawartych we fragmencie values
+# zaczynającym się od próbki beginning (ostatnia oś values i totals - próbki i okresy)
+def add_cycle_sums(totals, values, beginning, bounds):
+    end = beginning + values.shape[-1]
+    first = numpy.searchsorted(bounds, beginning, 'right')  # granice wewnątrz fragmentu
+    last = numpy.searchsorted(bounds, end, 'left')
+    indices = numpy.concatenate(([0], bounds[first:last] - beginning))
+    sums = numpy.add.reduceat(values, indices, axis=-1)  # suma każdej części fragmentu pomiędzy granicami
+    # część j należy do okresu first - 1 + j; pomijane są próbki przed pierwszą i za ostatnią granicą
+    lowest, highest = max(first - 1, 0), min(last, bounds.size - 1)
+    if highest > lowest:
+        totals[..., lowest:highest] += sums[..., lowest - first + 1:highest - first + 1]
+
+
+# zespolone amplitudy skuteczne harmonicznych 1..count przebiegu z ostatnich cycles pełnych okresów
+# (okno obejmuje całkowitą liczbę okresów, więc harmoniczna h leży dokładnie w prążku h * cycles)
+def harmonics(data, bounds, cycles=HARMONIC_CYCLES, count=HARMONICS, samples=HARMONIC_SAMPLES):
+    cycles = min(cycles, bounds.size - 1)
+    beginning, end = int(bounds[-1 - cycles]), int(bounds[-1])
+    factor = max(-(-(end - beginning) // samples), 1)  # uśrednianie bloków factor próbek (filtr przed decymacją)
+    end = beginning + (end - beginning) // factor * factor
+    window = numpy.empty((end - beginning) // factor)
+    step = max(BLOCK // factor, 1) * factor
+    for start in range(beginning, end, step):
+        stop = min(start + step, end)
+        window[(start - beginning) // factor:(stop - beginning) // factor] = \
+            volts_block(data, start, stop).reshape(-1, factor).mean(axis=1)
+    spectrum = numpy.fft.rfft(window)
+    orders = numpy.arange(1, count + 1) * cycles
+    return spectrum[orders[orders < spectrum.size]] * (numpy.sqrt(2) / window.size)
+
+
+# współczynnik zawartości harmonicznych THD [%] z amplitud harmonicznych (pierwsza - podstawowa)
+def thd(amplitudes):
+    if amplitudes is None or amplitudes.size < 2 or not abs(amplitudes[0]):
+        return INVALID
+    return 100 * numpy.sqrt(numpy.sum(numpy.abs(amplitudes[1:]) ** 2)) / abs(amplitudes[0])
+
+
+# kąt przesunięcia napięcia względem prądu [°] w zakresie (-180, 180] - dodatni przy prądzie opóźnionym
+def phase_angle(voltage, current):
+    return numpy.degrees(numpy.angle(voltage * numpy.conj(current)))
+
+
+# moc bierna z mocy pozornej i czynnej, ze znakiem przesunięcia fazowego podstawowych harmonicznych
+def reactive_power(S, P, phase):
+    return numpy.copysign(numpy.sqrt(numpy.maximum(S ** 2 - P ** 2, 0.0)), numpy.sin(numpy.radians(phase)))
+
+
+# stworzenie klasy wyników analizy jakości energii jednej ramki (CH1 - napięcie, CH2 - prąd)
+class PowerQuality:
+
+    def __init__(self, frequency, P, S, phase, Urms, Irms, cycles, harmonicsU=None, harmonicsI=None):
+        self.frequency = frequency  # częstotliwość podstawowa [Hz]
+        self.P = P  # moc czynna [W]
+        self.S = S  # moc pozorna [VA]
+        self.phase = phase  # przesunięcie fazowe podstawowych harmonicznych [°]
+        self.Q = reactive_power(S, P, phase) if phase != INVALID else numpy.sqrt(max(S ** 2 - P ** 2, 0.0))
+        self.Urms = Urms
+        self.Irms = Irms
+        self.cycles = cycles  # wyniki kolejnych okresów (CYCLE_DTYPE)
+        self.harmonicsU = harmonicsU  # zespolone amplitudy skuteczne harmonicznych napięcia i prądu
+        self.harmonicsI = harmonicsI
+
+    @property
+    def PF(self):
+        return self.P / self.S if self.S else INVALID
+
+    @property
+    def THDu(self):
+        return thd(self.harmonicsU)
+
+    @property
+    def THDi(self):
+        return thd(self.harmonicsI)
+
+    # wartości w tej samej kolejności co moce zwracane przez measureTwoChannel
+    def values(self):
+        return self.P, self.S, self.Q
+
+    def trend(self, timestamp):
+        return (timestamp, self.frequency, self.P, self.Q, self.S, self.PF, self.phase, self.Urms, self.Irms,
+                self.THDu, self.THDi)
+
+
+# analiza mocy jednej ramki: wszystkie sumy okresów i całego rekordu są liczone w jednym przebiegu po danych
+# (fragmentami BLOCK próbek), a składowe podstawowe okresów jako iloczyny z fazorem o częstotliwości podstawowej
+def analyze_power(voltage, current, dx, x0=0.0, count=HARMONICS, cycles=HARMONIC_CYCLES, hysteresis=0.1):
+    length = len(voltage)
+    edges = cycle_edges(voltage, dx, hysteresis)
+    bounds = numpy.unique(numpy.ceil(edges).astype(numpy.int64))
+    periodic = bounds.size > 1
+    if periodic:
+        frequency = (edges.size - 1) / ((edges[-1] - edges[0]) * dx)
+        rotation = numpy.exp(-2j * numpy.pi * frequency * dx * numpy.arange(BLOCK))
+    else:
+        frequency = INVALID
+    totals = numpy.zeros(3)  # sumy u*i, u^2, i^2 całego rekordu
+    sums = numpy.zeros((3, max(bounds.size - 1, 0)))  # to samo w kolejnych okresach
+    fundamentals = numpy.zeros((2, sums.shape[1]), dtype=numpy.complex128)  # składowe podstawowe okresów
+
+    for beginning in range(0, length, BLOCK):
+        end = min(beginning + BLOCK, length)
+        u = volts_block(voltage, beginning, end)
+        i = volts_block(current, beginning, end)
+        products = numpy.stack((u * i, u * u, i * i))
+        totals += products.sum(axis=1)
+        if periodic and beginning < bounds[-1] and end > bounds[0]:
+            add_cycle_sums(sums, products, beginning, bounds)
+            phasor = rotation[:end - beginning] * numpy.exp(-2j * numpy.pi * frequency * dx * beginning)
+            add_cycle_sums(fundamentals, numpy.stack((u * phasor, i * phasor)), beginning, bounds)
+
+    Urms, Irms = numpy.sqrt(totals[1:] / length)
+    P = totals[0] / length
+    result = PowerQuality(frequency, P, Urms * Irms, INVALID, Urms, Irms, numpy.zeros(0, dtype=CYCLE_DTYPE))
+    if not periodic:
+        return result
+
+    samples = numpy.diff(bounds)
+    cycle = result.cycles = numpy.zeros(samples.size, dtype=CYCLE_DTYPE)
+    cycle['start'] = x0 + edges[:-1] * dx if edges.size == bounds.size else x0 + bounds[:-1] * dx
+    cycle['duration'] = samples * dx
+    cycle['P'] = sums[0] / samples
+    cycle['Urms'], cycle['Irms'] = numpy.sqrt(sums[1:] / samples)
+    cycle['S'] = cycle['Urms'] * cycle['Irms']
+    cycle['phase'] = phase_angle(*fundamentals)
+    cycle['Q'] = reactive_power(cycle['S'], cycle['P'], cycle['phase'])
+    cycle['PF'] = numpy.divide(cycle['P'], cycle['S'], out=numpy.full(samples.size, INVALID), where=cycle['S'] > 0)
+
+    result.harmonicsU = harmonics(voltage, bounds, cycles, count)
+    result.harmonicsI = harmonics(current, bounds, cycles, count)
+    if result.harmonicsU.size:  # okno krótsze niż dwie próbki na okres - brak składowej podstawowej
+        result.phase = float(phase_angle(result.harmonicsU[0], result.harmonicsI[0]))
+        result.Q = float(reactive_power(result.S, P, result.phase))
+    return result
+
+
+# stworzenie klasy analizatora jakości energii: analiza kolejnych ramek oraz historia wyników (trendy)
+class PowerAnalyzer:
+
+    def __init__(self, harmonics=HARMONICS, cycles=HARMONIC_CYCLES, length=TREND_LENGTH, hysteresis=0.1):
+        self.harmonics = harmonics  # liczba wyznaczanych harmonicznych
+        self.cycles = cycles  # liczba okresów okna harmonicznych
+        self.hysteresis = hysteresis  # histereza detektora okresów jako część wartości międzyszczytowej
+        self.history = numpy.zeros(length, dtype=TREND_DTYPE)  # bufor cykliczny wyników kolejnych ramek
+        self.frames = 0  # liczba przeanalizowanych ramek
+        self.lock = threading.Lock()
+
+    # analiza ramki (CH1 - napięcie, CH2 - prąd); None, gdy przebiegi mają różne długości
+    def analyze(self, voltage, current, dx, x0=0.0, timestamp=None):
+        if len(voltage) != len(current) or not len(voltage):
+            return None
+        with profiler.stage('power'):
+            result = analyze_power(voltage, current, dx, x0, self.harmonics, self.cycles, self.hysteresis)
+        with self.lock:
+            self.history[self.frames % self.history.size] = result.trend(time.time() if timestamp is None
+                                                                         else timestamp)
+            self.frames += 1
+        return result
+
+    # wyniki kolejnych ramek od najstarszej (kopia, bezpieczna do użycia w innym wątku)
+    def trend(self):
+        with self.lock:
+            if self.frames <= self.history.size:
+                return self.history[:self.frames].copy()
+            return numpy.roll(self.history, -(self.frames % self.history.size))
+
+    def reset(self):
+        with self.lock:
+            self.frames = 0
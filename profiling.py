@@ -0,0 +1,163 @@
+import collections
+import json
+import threading
+import time
+
+import numpy
+
+
+# etapy ścieżki pomiaru w kolejności wykonywania oraz ich nazwy wyświetlane w panelu wydajności
+STAGES = {
+    'stop': "Zatrzymanie",
+    'scpi': "Zapytania SCPI",
+    'transfer': "Transfer danych",
+    'make_volt': "Przeliczanie na V",
+    'decimation': "Decymacja",
+    'measure': "Pomiary",
+    'trigger': "Wyzwalanie",
+    'spectrum': "Widmo (FFT)",
+    'power': "Jakość energii",
+    'accumulation': "Akumulacja",
+    'draw': "Rysowanie",
+}
+
+# granice przedziałów histogramu czasów trwania etapów [s] (od 1 us do 10 s, skala logarytmiczna)
+HISTOGRAM_EDGES = numpy.logspace(-6, 1, 29)
+
+BARS = " ▁▂▃▄▅▆▇█"
+
+
+# stworzenie klasy mierzącej czas trwania jednego wykonania etapu (używana w instrukcji with)
+class Stage:
+    __slots__ = ('profiler', 'name', 'bytes', 'start')
+
+    def __init__(self, profiler, name, bytes):
+        self.profiler = profiler
+        self.name = name
+        self.bytes = bytes  # liczba przesłanych bajtów (może zostać uzupełniona wewnątrz bloku with)
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        self.profiler.record(self.name, self.start, time.perf_counter(), self.bytes)
+        return False
+
+
+# etap zwracany przy wyłączonym pomiarze wydajności - nie mierzy czasu i niczego nie zapisuje
+class NullStage:
+    bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        return False
+
+
+NULL_STAGE = NullStage()
+
+
+# stworzenie klasy przechowującej ostatnie pomiary jednego etapu w buforze o stałym rozmiarze
+class StageHistory:
+
+    def __init__(self, size):
+        self.durations = numpy.zeros(size)  # czasy trwania ostatnich wykonań [s]
+        self.bytes = numpy.zeros(size)  # liczby bajtów przesłanych w ostatnich wykonaniach
+        self.count = 0  # liczba wszystkich wykonań etapu
+
+    def add(self, duration, bytes):
+        position = self.count % self.durations.size
+        self.durations[position] = duration
+        self.bytes[position] = bytes
+        self.count += 1
+
+    # pomiary zapisane w buforze (bez zachowania kolejności, co nie ma znaczenia dla statystyk)
+    def samples(self):
+        filled = min(self.count, self.durations.size)
+        return self.durations[:filled], self.bytes[:filled]
+
+
+# stworzenie klasy zbierającej czasy trwania etapów ścieżki pomiaru (od zapytań SCPI do narysowania ramki)
+class Profiler:
+
+    def __init__(self, size=512, trace_size=100000, enabled=False):
+        self.size = size  # liczba ostatnich wykonań etapu uwzględnianych w statystykach i histogramie
+        self.enabled = enabled
+        self.histories = {}  # nazwa etapu -> StageHistory
+        self.events = collections.deque(maxlen=trace_size)  # zdarzenia zapisywane do pliku śladu
+        self.origin = time.perf_counter()  # początek osi czasu śladu
+        self.lock = threading.Lock()
+
+    # etap do pomiaru w instrukcji with; przy wyłączonym pomiarze zwracany jest wspólny, pusty obiekt
+    def stage(self, name, bytes=0):
+        if not self.enabled:
+            return NULL_STAGE
+        return Stage(self, name, bytes)
+
+    def record(self, name, start, end, bytes=0):
+        with self.lock:
+            history = self.histories.get(name)
+            if history is None:
+                history = self.histories[name] = StageHistory(self.size)
+            history.add(end - start, bytes)
+            self.events.append((name, start, end - start, threading.get_ident(), bytes))
+
+    def reset(self):
+        with self.lock:
+            self.histories = {}
+            self.events.clear()
+            self.origin = time.perf_counter()
+
+    # statystyki etapów: nazwa -> (liczba wykonań, średni czas, mediana, 95. percentyl, maksimum [s], przepływność [MB/s])
+    def summary(self):
+        with self.lock:
+            samples = {name: [array.copy() for array in history.samples()] + [history.count]
+                       for name, history in self.histories.items()}
+        result = {}
+        for name in sorted(samples, key=lambda name: list(STAGES).index(name) if name in STAGES else len(STAGES)):
+            durations, bytes, count = samples[name]
+            median, p95 = numpy.percentile(durations, (50, 95))
+            total = durations.sum()
+            rate = bytes.sum() / total / 1e6 if bytes.any() and total > 0 else None
+            result[name] = (count, durations.mean(), median, p95, durations.max(), rate)
+        return result
+
+    # histogram czasów trwania ostatnich wykonań etapu (przedziały HISTOGRAM_EDGES)
+    def histogram(self, name):
+        with self.lock:
+            history = self.histories.get(name)
+            durations = history.samples()[0].copy() if history is not None else numpy.zeros(0)
+        return numpy.histogram(durations, HISTOGRAM_EDGES)[0]
+
+    # opis statystyk w postaci tekstu do panelu wydajności (histogram przedstawiony jako pasek znaków)
+    def report(self):
+        lines = [f"{'Etap':<18}{'n':>7}{'śr. [ms]':>10}{'p95 [ms]':>10}{'max [ms]':>10}{'MB/s':>9}  Histogram (1 us - 10 s)"]
+        for name, (count, mean, median, p95, maximum, rate) in self.summary().items():
+            counts = self.histogram(name)
+            levels = numpy.ceil(counts / max(counts.max(), 1) * (len(BARS) - 1)).astype(int)
+            lines.append(f"{STAGES.get(name, name):<18}{count:>7}{mean * 1e3:>10.2f}{p95 * 1e3:>10.2f}"
+                         f"{maximum * 1e3:>10.2f}{'' if rate is None else f'{rate:.1f}':>9}  "
+                         + "".join(BARS[level] for level in levels))
+        return "\n".join(lines)
+
+    # zapis zdarzeń w formacie Chrome Trace Event (chrome://tracing, Perfetto) do analizy poza programem
+    def export_trace(self, path):
+        with self.lock:
+            events = list(self.events)
+            origin = self.origin
+        threads = {}
+        trace = []
+        for name, start, duration, thread, bytes in events:
+            trace.append({'name': STAGES.get(name, name), 'cat': name, 'ph': 'X', 'pid': 1,
+                          'tid': threads.setdefault(thread, len(threads) + 1),
+                          'ts': (start - origin) * 1e6, 'dur': duration * 1e6, 'args': {'bytes': bytes}})
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, file)
+        return len(trace)
+
+
+# wspólny obiekt pomiaru wydajności używany przez moduły pomiarowe i GUI (domyślnie wyłączony)
+profiler = Profiler()
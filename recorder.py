@@ -0,0 +1,216 @@
+import json
+import mmap
+import os
+import queue
+import threading
+import time
+
+import numpy
+
+
+# opis jednego wpisu indeksu nagrania (jeden kanał jednej ramki)
+INDEX_DTYPE = numpy.dtype([
+    ('offset', '<u8'),  # położenie próbek w pliku danych [B]
+    ('length', '<u8'),  # liczba próbek
+    ('timestamp', '<f8'),  # czas wykonania pomiaru (time.time())
+    ('frame', '<u8'),  # numer ramki w nagraniu
+    ('channel', '<u2'),  # numer kanału oscyloskopu
+    ('device', '<u2'),  # numer urządzenia na liście 'devices' w pliku .json
+    ('XINC', '<f8'),
+    ('XREF', '<f8'),
+    ('YOR', '<f8'),
+    ('YREF', '<f8'),
+    ('YINC', '<f8'),
+    ('max', '<f8'),
+    ('min', '<f8'),
+    ('rms', '<f8'),
+    ('freq', '<f8'),
+])
+
+CAPTURE_VERSION = 2
+
+
+# nazwy plików nagrania: dane (.dat), indeks kanałów (.idx), indeks ramek (.frm) i opis (.json)
+def capture_paths(path):
+    base, extension = os.path.splitext(path)
+    if extension in ('.dat', '.idx', '.frm', '.json'):
+        path = base
+    return path + '.dat', path + '.idx', path + '.frm', path + '.json'
+
+
+# stworzenie klasy zapisującej kolejne ramki do pliku nagrania w osobnym wątku
+class Recorder:
+
+    def __init__(self, path, queue_size=8, grow=256 * 2 ** 20):
+        self.dataPath, self.indexPath, self.framesPath, self.infoPath = capture_paths(path)
+        self.grow = grow  # o ile bajtów powiększany jest plik danych, gdy zabraknie miejsca
+        self.queue = queue.Queue(maxsize=queue_size)  # ramki oczekujące na zapis
+        self.frames = 0  # liczba zapisanych ramek
+        self.records = 0  # liczba zapisanych wpisów indeksu
+        self.bytes = 0  # liczba zapisanych bajtów próbek
+        self.dropped = 0  # ramki pominięte, gdy zapis nie nadążał za pomiarami
+        self.error = None
+        self.devices = []  # nazwy urządzeń, z których pochodzą nagrane ramki
+        self.created = time.time()
+
+        self.write_info()
+        self.dataFile = open(self.dataPath, 'w+b')
+        self.indexFile = open(self.indexPath, 'wb')
+        self.framesFile = open(self.framesPath, 'wb')
+        self.capacity = 0
+        self.map = None
+
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    # zapis pliku z opisem nagrania (format indeksu, lista urządzeń)
+    def write_info(self):
+        with open(self.infoPath, 'w') as file:
+            json.dump({'version': CAPTURE_VERSION, 'index': INDEX_DTYPE.descr, 'created': self.created,
+                       'devices': self.devices}, file)
+
+    # numer urządzenia w nagraniu (nowe urządzenie jest dopisywane do pliku .json)
+    def device_number(self, device):
+        if device not in self.devices:
+            self.devices.append(device)
+            self.write_info()
+        return self.devices.index(device)
+
+    # przekazanie ramki do zapisu; records - lista (kanał, surowe próbki, dane skalujące, (max, min, rms, freq))
+    # block - oczekiwanie na miejsce w kolejce zamiast pominięcia ramki
+    def submit(self, records, timestamp=None, device=None, block=False):
+        if timestamp is None:
+            timestamp = time.time()
+        # kopia surowych próbek (1 B na próbkę), ponieważ bufory ramek są używane ponownie
+        copied = [(channel, numpy.array(raw, dtype=numpy.uint8), preamble, measurements)
+                  for channel, raw, preamble, measurements in records]
+        try:
+            self.queue.put((timestamp, copied, device), block=block)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    # powiększenie pliku danych i ponowne odwzorowanie go w pamięci
+    def reserve(self, size):
+        if self.bytes + size <= self.capacity:
+            return
+        if self.map is not None:
+            self.map.close()
+        self.capacity = max(self.capacity + self.grow, self.bytes + size)
+        self.dataFile.truncate(self.capacity)
+        self.map = mmap.mmap(self.dataFile.fileno(), self.capacity)
+
+    def write(self, timestamp, records, device=None):
+        entries = numpy.zeros(len(records), dtype=INDEX_DTYPE)
+        deviceNumber = self.device_number(device)
+        for entry, (channel, raw, preamble, measurements) in zip(entries, records):
+            if raw.size:
+                self.reserve(raw.size)
+                self.map[self.bytes:self.bytes + raw.size] = raw.data
+            entry['offset'] = self.bytes
+            entry['length'] = raw.size
+            entry['timestamp'] = timestamp
+            entry['frame'] = self.frames
+            entry['channel'] = channel
+            entry['device'] = deviceNumber
+            entry['XINC'], entry['XREF'], entry['YOR'], entry['YREF'], entry['YINC'] = preamble
+            entry['max'], entry['min'], entry['rms'], entry['freq'] = measurements
+            self.bytes += raw.size
+        # indeks zapisywany przed wpisem ramki i przekazywany do systemu po każdej ramce, dzięki czemu nagranie
+        # przerwane awarią programu można odtworzyć (próbki są już w pliku odwzorowanym w pamięci)
+        self.indexFile.write(entries.tobytes())
+        self.indexFile.flush()
+        self.framesFile.write(numpy.uint64(self.records).tobytes())  # pierwszy wpis indeksu danej ramki
+        self.framesFile.flush()
+        self.records += len(records)
+        self.frames += 1
+
+    # wątek zapisujący ramki z kolejki (None - koniec nagrywania)
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self.error is not None:
+                continue
+            try:
+                self.write(*item)
+            except Exception as error:
+                self.error = error
+
+    # zakończenie nagrywania: zapis pozostałych ramek i obcięcie pliku danych do faktycznego rozmiaru
+    def close(self):
+        self.queue.put(None)
+        self.worker.join()
+        if self.map is not None:
+            self.map.flush()
+            self.map.close()
+            self.map = None
+        self.dataFile.truncate(self.bytes)
+        self.dataFile.close()
+        self.indexFile.close()
+        self.framesFile.close()
+        if self.error is not None:
+            raise self.error
+
+
+# stworzenie klasy odczytującej nagranie bez wczytywania go do pamięci (odwzorowanie plików w pamięci);
+# nagrania niezamknięte poprawnie (plik danych nieobcięty, niepełny wpis na końcu indeksu) są odczytywane
+# do ostatniej kompletnej ramki
+class CaptureFile:
+
+    def __init__(self, path):
+        self.dataPath, self.indexPath, self.framesPath, self.infoPath = capture_paths(path)
+        with open(self.infoPath) as file:
+            self.info = json.load(file)
+        if self.info.get('version') != CAPTURE_VERSION:
+            raise ValueError(f"Nieobsługiwana wersja pliku nagrania: {self.info.get('version')}")
+        self.data = self.memmap(self.dataPath, numpy.uint8)
+        self.index = self.memmap(self.indexPath, INDEX_DTYPE)
+        self.firsts = self.memmap(self.framesPath, numpy.uint64)
+        self.recover()
+
+    # odwzorowanie pełnych wpisów pliku (niepełny wpis na końcu jest pomijany)
+    @staticmethod
+    def memmap(path, dtype):
+        count = os.path.getsize(path) // numpy.dtype(dtype).itemsize
+        if count == 0:
+            return numpy.zeros(0, dtype=dtype)
+        return numpy.memmap(path, dtype=dtype, mode='r', shape=(count,))
+
+    # pominięcie ramek, których wpisy indeksu lub próbki nie zostały w całości zapisane przed przerwaniem nagrania
+    def recover(self):
+        complete = self.index['offset'] + self.index['length'] <= self.data.size  # próbki obecne w pliku danych
+        while len(self.firsts):
+            first = int(self.firsts[-1])
+            if first < len(self.index):
+                frames = self.index['frame'][first:]
+                last = first + int(numpy.count_nonzero(frames == frames[0]))  # wpisy ostatniej ramki
+                if complete[first:last].all():
+                    self.index = self.index[:last]
+                    return
+            self.firsts = self.firsts[:-1]
+        self.index = self.index[:0]
+
+    def __len__(self):
+        return len(self.firsts)
+
+    # nazwa urządzenia, z którego pochodzi wpis indeksu
+    def device(self, entry):
+        return self.info['devices'][int(entry['device'])]
+
+    # wpisy indeksu dla ramki o podanym numerze
+    def entries(self, frame):
+        first = int(self.firsts[frame])
+        last = int(self.firsts[frame + 1]) if frame + 1 < len(self.firsts) else len(self.index)
+        return self.index[first:last]
+
+    # surowe próbki kanału opisanego wpisem indeksu (widok na plik, bez kopiowania)
+    def samples(self, entry):
+        offset = int(entry['offset'])
+        return self.data[offset:offset + int(entry['length'])]
+
+    # przebieg napięcia kanału opisanego wpisem indeksu
+    def volts(self, entry):
+        return (self.samples(entry) - entry['YOR'] - entry['YREF']) * entry['YINC']
@@ -0,0 +1,174 @@
+import collections
+import time
+
+from PyQt6 import QtCore
+
+from profiling import profiler
+
+
+# stworzenie klasy rysującej przebiegi na MplCanvas bez przebudowy wykresu w każdej ramce (blitting)
+class PlotRenderer:
+
+    # release - funkcja zwalniająca ramkę, której bufory nie są już rysowane (None - ramki nie są śledzone)
+    def __init__(self, canvas, margin=0.1, points_per_pixel=2, release=None):
+        self.canvas = canvas
+        self.axes = canvas.axes
+        self.margin = margin  # zapas na osi Y przy zmianie zakresu wykresu
+        self.points_per_pixel = points_per_pixel  # liczba punktów przebiegu na kolumnę pikseli (min i max)
+        self.lines = []  # obiekty Line2D aktualizowane w kolejnych ramkach
+        self.traces = []  # piramidy min/max aktualnie rysowanych przebiegów
+        self.frames = ()  # ramki, których bufory wskazują rysowane przebiegi (potrzebne przy przybliżaniu)
+        self.release = release
+        self.image = None  # obraz poświaty rysowany pod przebiegami (AxesImage)
+        self.layout = None  # etykiety i tytuł aktualnie zbudowanego wykresu
+        self.background = None  # zapamiętane tło osi (siatka, opisy) bez przebiegów
+        self.view = None  # zakresy osi ustawione ostatnio automatycznie
+        self.pending = None  # ostatnia ramka oczekująca na narysowanie
+        self.scheduled = False
+        self.drawn = 0  # liczba narysowanych ramek
+        self.skipped = 0  # liczba ramek pominiętych, gdy GUI nie nadążało
+        self.times = collections.deque(maxlen=50)  # czasy narysowania ostatnich ramek
+
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+
+    # zbudowanie osi, siatki, opisów i linii przebiegów (tylko przy zmianie konfiguracji wykresu)
+    def configure(self, labels, title, xlabel="Czas [S]", ylabel="V"):
+        if self.layout == (tuple(labels), title, xlabel, ylabel):
+            return
+        self.layout = (tuple(labels), title, xlabel, ylabel)
+        self.axes.clear()
+        self.lines = [self.axes.plot([], [], label=label, animated=True)[0] for label in labels]
+        self.image = None
+        self.axes.set_autoscale_on(False)  # zakresy osi ustawia wyłącznie rescale
+        self.axes.yaxis.grid(True, linestyle='--')
+        self.axes.xaxis.grid(True, linestyle='--')
+        self.axes.set_title(title)
+        self.axes.set_ylabel(ylabel)
+        self.axes.set_xlabel(xlabel)
+        self.axes.legend(handles=self.lines, loc='upper right')
+        self.background = None
+        self.view = None
+        self.axes.callbacks.connect('xlim_changed', self.on_xlim_changed)
+
+    # przekazanie nowej ramki do narysowania; starsza, nienarysowana ramka jest pomijana
+    # image - obraz poświaty (tablica znormalizowana do 0..1, zakres (xmin, xmax, ymin, ymax)) lub None
+    # frames - ramki, z których buforów pochodzą przebiegi; nie wracają do pierścienia, dopóki są rysowane
+    def submit(self, traces, image=None, frames=()):
+        if self.pending is not None:
+            self.skipped += 1
+            skipped, self.pending = self.pending, None
+            self.drop(skipped[2], frames)
+        self.pending = traces, image, tuple(frames)
+        if not self.scheduled:
+            self.scheduled = True
+            QtCore.QTimer.singleShot(0, self.render_pending)
+
+    def render_pending(self):
+        self.scheduled = False
+        pending, self.pending = self.pending, None
+        if pending is not None:
+            self.render(*pending)
+
+    # narysowanie ramki: aktualizacja danych linii i odświeżenie tylko obszaru osi
+    def render(self, traces, image=None, frames=()):
+        previous, self.frames = self.frames, tuple(frames)
+        self.traces = traces
+        self.drop(previous, self.frames)
+        self.set_image(image)
+        with profiler.stage('draw'):
+            full = self.rescale(traces) or self.background is None
+            self.refine()
+
+            if full:
+                self.canvas.draw()  # pełne rysowanie, tło zostanie zapamiętane w on_draw
+            else:
+                self.canvas.restore_region(self.background)
+                self.draw_lines()
+                self.canvas.blit(self.axes.bbox)
+
+        self.drawn += 1
+        self.times.append(time.perf_counter())
+
+    # czy bufory ramki są rysowane lub oczekują na narysowanie
+    def holds(self, frame):
+        return frame in self.frames or (self.pending is not None and frame in self.pending[2])
+
+    # zwolnienie ramek, które przestały być rysowane (z pominięciem nadal używanych)
+    def drop(self, frames, kept):
+        if self.release is None:
+            return
+        for frame in frames:
+            if frame not in kept and not self.holds(frame):
+                self.release(frame)
+
+    # dopasowanie zakresów osi do danych; zwraca True, jeśli konieczne jest pełne przerysowanie
+    def rescale(self, traces):
+        if self.view is not None and self.view != (self.axes.get_xlim(), self.axes.get_ylim()):
+            return False  # użytkownik przybliżył lub przesunął wykres za pomocą paska narzędzi
+
+        traces = [trace for trace in traces if len(trace)]
+        if not traces:
+            return False
+        xmin = min(trace.x_range()[0] for trace in traces)
+        xmax = max(trace.x_range()[1] for trace in traces)
+        ymin = min(trace.y_range()[0] for trace in traces)
+        ymax = max(trace.y_range()[1] for trace in traces)
+        changed = False
+
+        if self.axes.get_xlim() != (xmin, xmax) and xmax > xmin:
+            self.axes.set_xlim(xmin=xmin, xmax=xmax)
+            changed = True
+
+        bottom, top = self.axes.get_ylim()
+        span = max(ymax - ymin, 1e-12)
+        if ymin < bottom or ymax > top or (top - bottom) > span * (1 + 2 * self.margin) * 2:
+            self.axes.set_ylim(ymin - span * self.margin, ymax + span * self.margin)
+            changed = True
+
+        self.view = (self.axes.get_xlim(), self.axes.get_ylim())
+        return changed
+
+    # pobranie z piramid punktów dla aktualnie widocznego zakresu osi X
+    def refine(self):
+        xmin, xmax = self.axes.get_xlim()
+        points = max(int(self.axes.bbox.width) * self.points_per_pixel, 100)
+        for line, trace in zip(self.lines, self.traces):
+            line.set_data(*trace.view(xmin, xmax, points))
+
+    # przybliżenie lub przesunięcie wykresu - odczyt danych z dokładniejszego poziomu piramidy
+    def on_xlim_changed(self, axes):
+        if self.traces:
+            self.refine()
+
+    # jeden obraz poświaty zamiast wielu nałożonych linii
+    def set_image(self, image):
+        if image is None:
+            if self.image is not None:
+                self.image.remove()
+                self.image = None
+            return
+        density, extent = image
+        if self.image is None:
+            self.image = self.axes.imshow(density, origin='lower', aspect='auto', extent=extent, cmap='inferno',
+                                          interpolation='nearest', vmin=0.0, vmax=1.0, animated=True, zorder=0)
+        else:
+            self.image.set_data(density)
+            self.image.set_extent(extent)
+
+    def draw_lines(self):
+        if self.image is not None:
+            self.axes.draw_artist(self.image)
+        for line in self.lines:
+            self.axes.draw_artist(line)
+
+    # zapamiętanie tła po każdym pełnym rysowaniu (również po przybliżeniu lub przesunięciu wykresu)
+    def on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.axes.bbox)
+        self.draw_lines()
+        self.canvas.blit(self.axes.bbox)
+
+    # liczba ramek na sekundę wyliczona z ostatnich narysowanych ramek
+    def fps(self):
+        if len(self.times) < 2:
+            return 0.0
+        return (len(self.times) - 1) / (self.times[-1] - self.times[0])
@@ -0,0 +1,75 @@
+import numpy
+
+from math_channels import MATH_CHANNEL
+from recorder import CaptureFile
+from waveform import RawWaveform
+
+
+# kanały oscyloskopu nagrania, które GUI potrafi wyświetlić: jeden dowolny kanał (widok jednego kanału) lub kanały
+# 1 i 2 (widok dwóch kanałów); kanały matematyczne są pomijane, pozostałe nagrania są odrzucane (ValueError)
+def display_channels(channels):
+    scope = sorted(channel for channel in channels if channel <= MATH_CHANNEL)
+    if len(scope) == 1 or scope == [1, 2]:
+        return scope
+    names = ", ".join(f"CH{channel}" for channel in scope) or "brak"
+    raise ValueError(f"Nagranie kanałów {names} nie może zostać wyświetlone (obsługiwany jest jeden kanał "
+                     f"lub kanały CH1 i CH2)")
+
+
+# stworzenie klasy odtwarzającej ramki z pliku nagrania (dane odczytywane leniwie z plików odwzorowanych w pamięci)
+class ReplaySource:
+
+    def __init__(self, path, rate=10.0, loop=False):
+        self.capture = CaptureFile(path)  # otwarcie nagrania nie wczytuje próbek do pamięci
+        self.rate = rate  # liczba odtwarzanych ramek na sekundę
+        self.loop = loop  # odtwarzanie od początku po dojściu do końca nagrania
+        self.position = 0  # numer następnej odtwarzanej ramki
+
+    def __len__(self):
+        return len(self.capture)
+
+    # przejście do ramki o podanym numerze
+    def seek(self, frame):
+        self.position = min(max(int(frame), 0), len(self))
+
+    # przejście do pierwszej ramki zarejestrowanej co najmniej seconds sekund po rozpoczęciu nagrania
+    def seek_time(self, seconds):
+        timestamps = self.capture.index['timestamp']
+        if not len(timestamps):
+            return
+        entry = int(numpy.searchsorted(timestamps, timestamps[0] + seconds))
+        if entry >= len(timestamps):
+            self.seek(len(self))
+        else:
+            self.seek(self.capture.index['frame'][entry])
+
+    # czas ramki liczony od początku nagrania
+    def frame_time(self, frame):
+        entries = self.capture.entries(frame)
+        return float(entries['timestamp'][0] - self.capture.index['timestamp'][0])
+
+    # numery kanałów zapisanych w następnej ramce
+    def channels(self):
+        if self.position >= len(self):
+            return []
+        return [int(channel) for channel in self.capture.entries(self.position)['channel']]
+
+    # odczyt następnej ramki: lista (kanał, surowe próbki, przebieg RawWaveform, dane skalujące, częstotliwość)
+    # próbki nie są kopiowane ani przeliczane - przebieg wskazuje na plik odwzorowany w pamięci
+    def read(self, frame=None):
+        if self.position >= len(self):
+            if not self.loop or not len(self):
+                return None
+            self.position = 0
+
+        channels = []
+        for entry in self.capture.entries(self.position):
+            raw = self.capture.samples(entry)
+            preamble = tuple(float(entry[name]) for name in ('XINC', 'XREF', 'YOR', 'YREF', 'YINC'))
+            channels.append((int(entry['channel']), raw, RawWaveform.from_preamble(raw, preamble), preamble,
+                             float(entry['freq'])))
+
+        if frame is not None:
+            frame.records = [(raw, preamble) for channel, raw, volt, preamble, frq in channels]
+        self.position += 1
+        return channels
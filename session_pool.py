@@ -0,0 +1,137 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from acquisition import select_channel
+from decimation import MinMaxPyramid
+from instrument_state import InstrumentStateCache
+from pipeline import program_pipelined
+from transport import FrameRing, FrameRingExhausted
+
+
+# stworzenie klasy sesji jednego urządzenia (własne połączenie, pamięć podręczna stanu, bufory i wątek pomiarowy)
+class DeviceSession:
+
+    def __init__(self, name, oscyloskop, channel=1, slots=4, link=None):
+        self.name = name  # nazwa zasobu VISA, którą oznaczane są ramki
+        self.oscyloskop = oscyloskop
+        self.channel = channel  # kanał, z którego pobierany jest przebieg
+        self.link = link  # ustawienia łącza urządzenia (LinkTuning z profilu), None - ustawienia domyślne
+        self.cache = InstrumentStateCache()
+        self.ring = FrameRing(slots)
+        self.worker = None
+        self.isRunning = False
+        self.frames = 0  # liczba pobranych ramek
+        self.error = None  # ostatni błąd, który przerwał pomiary
+
+    # ustawienie trybu odczytu danych i ustawień łącza (jak w funkcji Connection)
+    def configure(self):
+        self.cache.write(self.oscyloskop, ":WAVeform:MODE RAW")
+        self.cache.write(self.oscyloskop, ":WAVeform:FORMat BYTE")
+        select_channel(self.oscyloskop, self.channel, self.cache)
+        if self.link is not None:
+            self.link.apply(self.oscyloskop)
+
+    # pobranie jednej ramki do bufora z pierścienia; payload ma postać argumentów funkcji Measure
+    def capture(self, frame, timeout=2.0):
+        data, XINC, XREF, frq, (max, min, rms) = program_pipelined(self.oscyloskop, timeout=timeout, cache=self.cache,
+                                                                   frame=frame, link=self.link)
+        frame.device = self.name
+        frame.payload = MinMaxPyramid(data, XREF[0], XINC[0]), XINC[0], XREF[0], frq[0], max, min, rms
+        self.frames += 1
+        return frame
+
+    # wątek pomiarowy urządzenia; on_capture(session, frame) jest wywoływane przed, a on_frame(session) po
+    # opublikowaniu każdej ramki
+    def run(self, on_frame, count, timeout, on_capture=None):
+        while self.isRunning and (count is None or self.frames < count):
+            try:
+                frame = self.ring.acquire(timeout)  # oczekiwanie na bufor zwolniony przez GUI
+            except FrameRingExhausted as error:
+                self.error = error
+                break
+            try:
+                self.capture(frame, timeout)
+            except Exception as error:
+                self.ring.release(frame)
+                self.error = error
+                break
+            if on_capture is not None:
+                on_capture(self, frame)
+            self.ring.publish(frame)
+            if on_frame is not None:
+                on_frame(self)
+        self.isRunning = False
+
+    def start(self, on_frame=None, count=None, timeout=2.0, on_capture=None):
+        self.isRunning = True
+        self.error = None
+        self.worker = threading.Thread(target=self.run, args=(on_frame, count, timeout, on_capture), daemon=True)
+        self.worker.start()
+
+    def stop(self, wait=True):
+        self.isRunning = False
+        if wait and self.worker is not None:
+            self.worker.join()
+
+    def close(self):
+        self.stop()
+        self.oscyloskop.close()
+
+
+# stworzenie klasy puli sesji pozwalającej na równoczesne pomiary z wielu oscyloskopów
+class SessionPool:
+
+    def __init__(self, resource_manager, profiles=None):
+        self.rm = resource_manager
+        self.profiles = profiles  # profile łącza urządzeń (LinkProfiles), None - ustawienia domyślne
+        self.sessions = {}  # nazwa zasobu -> DeviceSession
+
+    # otwarcie połączenia z urządzeniem (ponowne wywołanie zwraca istniejącą sesję)
+    def open(self, name, channel=1):
+        session = self.sessions.get(name)
+        if session is None:
+            link = self.profiles.get(name) if self.profiles is not None else None
+            session = DeviceSession(name, self.rm.open_resource(name), channel, link=link)
+            session.configure()
+            self.sessions[name] = session
+        return session
+
+    def close(self, name):
+        session = self.sessions.pop(name, None)
+        if session is not None:
+            session.close()
+            # zapamiętanie wielkości fragmentu zmniejszonej po błędach odczytu (jak w wątku pomiarowym GUI)
+            if self.profiles is not None and session.link is not None and session.link.backoffs:
+                self.profiles.store(name, session.link)
+
+    def close_all(self):
+        for name in list(self.sessions):
+            self.close(name)
+
+    # uruchomienie wątków pomiarowych wszystkich otwartych urządzeń
+    def start(self, on_frame=None, count=None, timeout=2.0, on_capture=None):
+        for session in self.sessions.values():
+            session.start(on_frame, count, timeout, on_capture)
+
+    def stop(self):
+        for session in self.sessions.values():
+            session.stop(wait=False)
+        for session in self.sessions.values():
+            session.stop()
+
+    # jednorazowe, równoległe pobranie ramki ze wszystkich urządzeń (nazwa zasobu -> ramka)
+    def capture_all(self, timeout=2.0):
+        if not self.sessions:
+            return {}
+
+        def capture(session):
+            frame = session.ring.acquire(timeout)
+            try:
+                return session.capture(frame, timeout)
+            except Exception:
+                session.ring.release(frame)
+                raise
+
+        with ThreadPoolExecutor(max_workers=len(self.sessions)) as executor:
+            futures = {name: executor.submit(capture, session) for name, session in self.sessions.items()}
+            return {name: future.result() for name, future in futures.items()}
@@ -0,0 +1,275 @@
+import numpy
+import time
+import re
+
+
+# wyjątek zgłaszany przez symulowany oscyloskop (odpowiednik błędu VISA)
+class SimulatedVisaError(Exception):
+    pass
+
+
+# zamiana komendy SCPI na postać skróconą (np. ":WAVeform:XINCrement?" -> "WAV:XINC?")
+def short_form(command):
+    command = command.strip().lstrip(':')
+    header, _, argument = command.partition(' ')
+    header = re.sub(r'[a-z]', '', header) if re.search(r'[A-Z]', header) else header.upper()
+    argument = argument.strip()
+    if re.search(r'[A-Z]', argument) and re.search(r'[a-z]', argument):
+        argument = re.sub(r'[a-z]', '', argument)  # skrócenie argumentów typu CHANnel1 -> CHAN1
+    return header, argument.upper()
+
+
+# stworzenie klasy symulującej oscyloskop podłączony przez VISA (podzbiór SCPI używany przez program)
+class SimulatedOscilloscope:
+
+    def __init__(self, memory_depth=12000, shape='sine', frequency=1000.0, amplitude=2.0, offset=0.0, noise=0.02,
+                 sample_rate=1e8, bandwidth=None, latency=0.0, max_chunk=500000, channels=4, seed=0, stop_delay=0.0):
+        self.memory_depth = int(memory_depth)  # liczba próbek w pamięci oscyloskopu
+        self.shape = shape  # kształt przebiegu: sine, square, triangle, noise, dc
+        self.frequency = frequency  # częstotliwość sygnału [Hz]
+        self.amplitude = amplitude  # amplituda sygnału [V]
+        self.offset = offset  # składowa stała [V]
+        self.noise = noise  # odchylenie standardowe szumu [V]
+        self.sample_rate = sample_rate  # częstotliwość próbkowania [Sa/s]
+        self.bandwidth = bandwidth  # przepustowość łącza [B/s], None - brak ograniczenia
+        self.latency = latency  # opóźnienie każdego zapytania [s]
+        self.max_chunk = max_chunk  # maksymalna liczba próbek w jednym odczycie :WAVeform:DATA?
+        self.channels = channels  # liczba kanałów oscyloskopu
+        self.seed = seed
+        self.stop_delay = stop_delay  # czas od komendy :STOP do faktycznego zatrzymania akwizycji [s]
+
+        # dane potrzebne do konwersji liczb na volty (jak w oscyloskopach Rigol)
+        self.YINC = 0.04
+        self.YOR = 0.0
+        self.YREF = 127.0
+        self.XREF = 0.0
+
+        self.waveform_source = 1
+        self.measure_source = 1
+        self.mode = 'NORM'
+        self.format = 'BYTE'
+        self.start = 1
+        self.stop = self.memory_depth
+        self.running = True
+        self.stopped_at = 0.0  # chwila, w której akwizycja faktycznie się zatrzyma
+        self.frame = 0  # numer aktualnej akwizycji (zwiększany po każdym :RUN)
+        self.pending = None  # odpowiedź oczekująca na odczyt
+        self.position = 0  # liczba bajtów odpowiedzi już odczytanych
+        self.queries = 0  # liczba wykonanych zapytań
+        self.bytes_sent = 0  # liczba przesłanych bajtów danych
+        self.records = {}  # wygenerowane rekordy dla poszczególnych kanałów
+
+    # podstawa czasu odpowiadająca wybranej głębokości pamięci (12 działek na ekranie)
+    @property
+    def time_base(self):
+        return self.memory_depth / (12 * self.sample_rate)
+
+    # wygenerowanie rekordu próbek dla wybranego kanału (z zapasem na przesunięcie między akwizycjami)
+    def record(self, channel):
+        if channel not in self.records:
+            margin = min(self.memory_depth, 65536)
+            rng = numpy.random.default_rng(self.seed + channel)
+            t = numpy.arange(self.memory_depth + margin) / self.sample_rate
+            phase = 2 * numpy.pi * self.frequency * t + (channel - 1) * numpy.pi / 3
+            if self.shape == 'sine':
+                volt = numpy.sin(phase)
+            elif self.shape == 'square':
+                volt = numpy.sign(numpy.sin(phase))
+            elif self.shape == 'triangle':
+                volt = 2 / numpy.pi * numpy.arcsin(numpy.sin(phase))
+            elif self.shape in ('noise', 'dc'):
+                volt = numpy.zeros(t.size)
+            else:
+                raise ValueError(f"Nieznany kształt przebiegu: {self.shape}")
+            del t, phase
+            volt *= self.amplitude
+            volt += self.offset
+            if self.noise:
+                volt += rng.normal(0, self.noise, volt.size)
+            codes = numpy.rint(volt / self.YINC + self.YOR + self.YREF)
+            del volt
+            self.records[channel] = numpy.clip(codes, 0, 255).astype(numpy.uint8)
+        return self.records[channel]
+
+    # aktualnie dostępne próbki wybranego kanału (każda akwizycja jest przesunięta w czasie)
+    def samples(self, channel, begin, end):
+        record = self.record(channel)
+        margin = record.size - self.memory_depth
+        shift = (self.frame * 7919) % margin if margin else 0
+        return record[shift + begin:shift + end]
+
+    # symulacja opóźnienia i przepustowości łącza
+    def transfer(self, size, first=False):
+        delay = self.latency if first else 0.0
+        if self.bandwidth:
+            delay += size / self.bandwidth
+        if delay > 0:
+            time.sleep(delay)
+
+    def write(self, command):
+        self.pending, self.position = None, 0
+        header, argument = short_form(command)
+        if header.endswith('?'):
+            self.pending = self.answer(header, argument)
+        elif header == 'STOP':
+            if self.running:
+                self.stopped_at = time.monotonic() + self.stop_delay
+            self.running = False
+        elif header == 'RUN':
+            if not self.running:
+                self.frame += 1
+            self.running = True
+        elif header == 'SING':
+            self.running = False
+            self.stopped_at = time.monotonic() + self.stop_delay
+            self.frame += 1
+        elif header == 'WAV:STAR':
+            self.start = int(round(float(argument)))
+        elif header == 'WAV:STOP':
+            self.stop = int(round(float(argument)))
+        elif header == 'WAV:MODE':
+            self.mode = argument
+        elif header == 'WAV:FORM':
+            self.format = argument
+        elif header == 'WAV:SOUR':
+            self.waveform_source = self.channel_number(argument)
+        elif header == 'MEAS:SOUR':
+            self.measure_source = self.channel_number(argument)
+        else:
+            raise SimulatedVisaError(f"Nieobsługiwana komenda: {command}")
+        return len(command)
+
+    # czy akwizycja została już faktycznie zatrzymana
+    def stopped(self):
+        return not self.running and time.monotonic() >= self.stopped_at
+
+    def channel_number(self, argument):
+        channel = int(argument.replace('CHAN', ''))
+        if not 1 <= channel <= self.channels:
+            raise SimulatedVisaError(f"Nieprawidłowy kanał: {argument}")
+        return channel
+
+    # odpowiedź na zapytanie SCPI (tekst lub blok binarny)
+    def answer(self, header, argument):
+        if header == 'WAV:DATA?':
+            return self.data_block()
+        if header == 'WAV:PRE?':
+            points = min(self.stop, self.memory_depth) - max(self.start, 1) + 1 if self.mode == 'RAW' else 1200
+            preamble = (0, 2, points, 1, 1 / self.sample_rate, 0.0, self.XREF, self.YINC, self.YOR, self.YREF)
+            return (','.join(f"{value:.10E}" for value in preamble) + '\n').encode()
+        if header == 'WAV:XINC?':
+            value = 1 / self.sample_rate
+        elif header == 'WAV:XREF?':
+            value = self.XREF
+        elif header == 'WAV:YOR?':
+            value = self.YOR
+        elif header == 'WAV:YREF?':
+            value = self.YREF
+        elif header == 'WAV:YINC?':
+            value = self.YINC
+        elif header == 'ACQ:SRAT?':
+            value = self.sample_rate
+        elif header == 'TIM:SCAL?':
+            value = self.time_base
+        elif header == 'MEAS:ITEM?' and argument == 'FREQ':
+            value = self.frequency if self.shape in ('sine', 'square', 'triangle') else 9.9e+37
+        elif header == 'TRIG:STAT?':
+            return b'STOP\n' if self.stopped() else b'TD\n'
+        elif header == '*OPC?':
+            if not self.running:
+                time.sleep(max(self.stopped_at - time.monotonic(), 0))
+            return b'1\n'
+        elif header == '*IDN?':
+            return b'SIMULATED,OSCILLOSCOPE,0,1.0\n'
+        else:
+            raise SimulatedVisaError(f"Nieobsługiwane zapytanie: {header} {argument}".strip())
+        return f"{value:.10E}\n".encode()
+
+    # przygotowanie bloku danych w formacie IEEE 488.2 (#9 + długość + dane)
+    def data_block(self):
+        begin = max(self.start, 1) - 1
+        end = min(self.stop, self.memory_depth)
+        if self.mode == 'RAW' and not self.stopped():
+            raise SimulatedVisaError("Odczyt pamięci wymaga zatrzymania oscyloskopu")
+        if self.mode != 'RAW':
+            begin, end = 0, min(1200, self.memory_depth)  # tryb NORMal zwraca tylko punkty z ekranu
+        if end - begin > self.max_chunk:
+            raise SimulatedVisaError(f"Zbyt duży fragment danych: {end - begin} > {self.max_chunk}")
+        payload = self.samples(self.waveform_source, begin, max(end, begin)).tobytes()
+        return b'#9' + f"{len(payload):09d}".encode() + payload + b'\n'
+
+    def read_raw(self, size=None):
+        return self.read_bytes(None)
+
+    # odczyt określonej liczby bajtów odpowiedzi (None - cała pozostała odpowiedź)
+    def read_bytes(self, count):
+        if self.pending is None:
+            raise SimulatedVisaError("Brak odpowiedzi do odczytania (Query UNTERMINATED)")
+        first = self.position == 0  # opóźnienie zapytania doliczane jest przy pierwszym odczycie odpowiedzi
+        if first:
+            self.queries += 1
+        end = len(self.pending) if count is None else min(self.position + count, len(self.pending))
+        response = self.pending[self.position:end]
+        self.position = end
+        if self.position >= len(self.pending):
+            self.pending, self.position = None, 0
+        self.bytes_sent += len(response)
+        self.transfer(len(response), first)
+        return response
+
+    def read(self):
+        return self.read_raw().decode().rstrip('\n')
+
+    def query(self, command):
+        self.write(command)
+        return self.read()
+
+    def query_ascii_values(self, command, converter='f', separator=',', container=list):
+        values = [float(value) for value in self.query(command).split(separator)]
+        return container(values)
+
+    def query_binary_values(self, command, datatype='B', is_big_endian=False, container=list):
+        self.write(command)
+        response = self.read_raw()
+        data = numpy.frombuffer(response, dtype=numpy.uint8, count=parse_block_length(response),
+                                offset=block_header_length(response))
+        if datatype != 'B':
+            data = data.view(numpy.dtype(datatype).newbyteorder('>' if is_big_endian else '<'))
+        if container is list:
+            return data.tolist()
+        return container(data)
+
+    def close(self):
+        self.pending, self.position = None, 0
+
+
+# długość nagłówka bloku binarnego IEEE 488.2
+def block_header_length(response):
+    return 2 + int(response[1:2])
+
+
+# liczba bajtów danych w bloku binarnym IEEE 488.2
+def parse_block_length(response):
+    if response[:1] != b'#':
+        raise SimulatedVisaError("Niepoprawny nagłówek bloku danych")
+    digits = int(response[1:2])
+    return int(response[2:2 + digits])
+
+
+# stworzenie klasy udającej visa.ResourceManager dla symulowanych urządzeń
+class SimulatedResourceManager:
+
+    def __init__(self, **settings):
+        self.settings = settings
+        self.resources = {}
+
+    def add_resource(self, name, **settings):
+        self.resources[name] = dict(self.settings, **settings)
+
+    def list_resources(self):
+        return tuple(self.resources)
+
+    def open_resource(self, name):
+        if name not in self.resources:
+            raise SimulatedVisaError(f"Nie znaleziono urządzenia: {name}")
+        return SimulatedOscilloscope(**self.resources[name])
@@ -0,0 +1,147 @@
+import collections
+import threading
+
+import numpy
+from numpy.lib.stride_tricks import sliding_window_view
+
+from profiling import profiler
+from waveform import RawWaveform
+
+
+# okno flat-top (dokładny pomiar amplitudy prążków kosztem rozdzielczości)
+def flattop(size):
+    n = numpy.arange(size) * (2 * numpy.pi / max(size - 1, 1))
+    return (0.21557895 - 0.41663158 * numpy.cos(n) + 0.277263158 * numpy.cos(2 * n)
+            - 0.083578947 * numpy.cos(3 * n) + 0.006947368 * numpy.cos(4 * n))
+
+
+# dostępne funkcje okna (nazwa wyświetlana w GUI -> funkcja tworząca okno o podanej długości)
+WINDOWS = {
+    "Prostokątne": numpy.ones,
+    "Hann": numpy.hanning,
+    "Hamming": numpy.hamming,
+    "Blackman": numpy.blackman,
+    "Flat-top": flattop,
+}
+
+# rodzaje uśredniania widm kolejnych ramek
+AVERAGING = ("Brak", "Liniowe", "Wykładnicze")
+
+# liczba próbek przetwarzanych jednocześnie (ogranicza zużycie pamięci przy rekordach 24M punktów)
+BATCH_SAMPLES = 2 ** 22
+
+
+# suma widm mocy (bez skalowania) segmentów first..last-1 o długości size przesuwanych co step próbek,
+# przetwarzanych partiami stałej wielkości
+def segment_power(data, window, step, first, last):
+    size = window.size
+    segments = sliding_window_view(data, size)[::step][first:last]  # widok na segmenty, bez kopiowania danych
+    batch = max(BATCH_SAMPLES // size, 1)
+    power = numpy.zeros(size // 2 + 1)
+    for beginning in range(0, len(segments), batch):
+        part = segments[beginning:beginning + batch]
+        part = (part - part.mean(axis=1, keepdims=True)) * window  # usunięcie składowej stałej segmentu
+        spectrum = numpy.fft.rfft(part, axis=1)
+        power += (spectrum.real ** 2 + spectrum.imag ** 2).sum(axis=0)
+    return power
+
+
+# liczba segmentów o długości size przesuwanych co step próbek w rekordzie length próbek
+def segment_count(length, size, step):
+    return (length - size) // step + 1
+
+
+# stworzenie klasy obliczającej widmo przebiegu metodą Welcha (segmenty z nakładaniem, uśrednianie ramek)
+class SpectrumAnalyzer:
+
+    def __init__(self, window="Hann", segment=65536, overlap=0.5, averaging="Brak", frames=10, alpha=0.25):
+        self.window = window  # nazwa funkcji okna ze słownika WINDOWS
+        self.segment = segment  # maksymalna długość segmentu (liczba punktów jednej transformaty)
+        self.overlap = overlap  # część segmentu wspólna z poprzednim segmentem
+        self.averaging = averaging  # rodzaj uśredniania ze zbioru AVERAGING
+        self.frames = frames  # liczba ramek uśrednianych liniowo
+        self.alpha = alpha  # waga najnowszej ramki przy uśrednianiu wykładniczym
+        self.plans = collections.OrderedDict()  # (okno, długość, XINC) -> okno, oś częstotliwości, skala
+        self.averages = {}  # kanał -> stan uśredniania widm kolejnych ramek
+        self.lock = threading.Lock()
+
+    # zmiana ustawień analizy (uśrednione widma są liczone od nowa)
+    def configure(self, **settings):
+        with self.lock:
+            for name, value in settings.items():
+                setattr(self, name, value)
+            self.averages = {}
+
+    def reset(self):
+        with self.lock:
+            self.averages = {}
+
+    # okno, oś częstotliwości i współczynniki skalowania dla danej długości segmentu (liczone raz, potem z pamięci)
+    def plan(self, size, dx):
+        key = (self.window, size, dx)
+        plan = self.plans.get(key)
+        if plan is None:
+            window = WINDOWS[self.window](size)
+            scale = numpy.full(size // 2 + 1, 2 / window.sum() ** 2)  # widmo jednostronne w V^2 (wartości skuteczne)
+            scale[0] /= 2
+            if size % 2 == 0:
+                scale[-1] /= 2
+            plan = window, numpy.fft.rfftfreq(size, dx), scale
+            self.plans[key] = plan
+            if len(self.plans) > 8:
+                self.plans.popitem(last=False)
+        else:
+            self.plans.move_to_end(key)
+        return plan
+
+    # długość segmentu i przesunięcie kolejnych segmentów dla rekordu o podanej długości
+    def segmentation(self, length):
+        size = min(self.segment, length)
+        return size, max(int(size * (1 - self.overlap)), 1)
+
+    # widmo mocy rekordu [V^2]: średnia z widm segmentów przetwarzanych partiami stałej wielkości
+    def welch(self, data, dx):
+        size, step = self.segmentation(data.size)
+        window, frequency, scale = self.plan(size, dx)
+        power = segment_power(data, window, step, 0, None)
+        power *= scale / segment_count(data.size, size, step)
+        return frequency, power
+
+    # uśrednienie widma z widmami poprzednich ramek danego kanału
+    def average(self, channel, key, power):
+        if self.averaging == "Brak":
+            return power
+        state = self.averages.get(channel)
+        if state is None or state[0] != key:
+            state = self.averages[channel] = [key, None, collections.deque()]
+        if self.averaging == "Liniowe":  # średnia arytmetyczna z ostatnich self.frames ramek
+            history = state[2]
+            history.append(power)
+            state[1] = power.copy() if state[1] is None else state[1] + power
+            while len(history) > self.frames:
+                state[1] -= history.popleft()
+            return state[1] / len(history)
+        if state[1] is None:
+            state[1] = power.copy()
+        else:
+            state[1] += self.alpha * (power - state[1])
+        return state[1].copy()
+
+    # widmo przebiegu w dBV; zwraca oś częstotliwości, widmo oraz częstotliwość największego prążka
+    def compute(self, data, dx, channel=1):
+        with profiler.stage('spectrum'), self.lock:
+            if data.size < 2:
+                return numpy.zeros(1), numpy.full(1, -numpy.inf), 0.0
+            gain = 1.0
+            if isinstance(data, RawWaveform):  # przebieg RawWaveform: widmo kodów próbek przeskalowane do V^2 na końcu
+                data, gain = data.raw, data.scale ** 2
+            frequency, power = self.welch(data, dx)
+            power *= gain
+            return self.finish(channel, frequency, power, dx)
+
+    # uśrednienie z poprzednimi ramkami i przeliczenie widma mocy na dBV
+    def finish(self, channel, frequency, power, dx):
+        power = self.average(channel, (self.window, frequency.size, dx), power)
+        decibels = 10 * numpy.log10(numpy.maximum(power, 1e-20))
+        peak = frequency[numpy.argmax(power[1:]) + 1] if power.size > 1 else 0.0
+        return frequency, decibels, float(peak)
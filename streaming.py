@@ -0,0 +1,234 @@
+import collections
+import socket
+import struct
+import threading
+import time
+
+import numpy
+
+from recorder import INDEX_DTYPE
+from waveform import RawWaveform
+
+
+# domyślny port serwera udostępniającego ramki
+STREAM_PORT = 5555
+
+# nagłówek komunikatu: znacznik, wersja, liczba kanałów, numer ramki, długość nazwy urządzenia, długość próbek [B];
+# po nim nazwa urządzenia (UTF-8), opisy kanałów w formacie indeksu nagrania (INDEX_DTYPE) i surowe próbki uint8
+MESSAGE_HEADER = struct.Struct('<4sHHQIQ')
+MAGIC = b'OSCF'
+STREAM_VERSION = 1
+
+
+# wyjątek zgłaszany, gdy odebrane dane nie są komunikatem z ramką
+class StreamError(Exception):
+    pass
+
+
+# zakodowanie ramki; records - lista (kanał, surowe próbki, dane skalujące, (max, min, rms, freq)) jak w Recorder
+# zwraca nagłówek (z opisami kanałów) i próbki wszystkich kanałów jako osobne bufory
+def encode_frame(number, records, timestamp, device=None):
+    entries = numpy.zeros(len(records), dtype=INDEX_DTYPE)
+    offset = 0
+    for entry, (channel, raw, preamble, measurements) in zip(entries, records):
+        entry['offset'] = offset
+        entry['length'] = raw.size
+        entry['timestamp'] = timestamp
+        entry['frame'] = number
+        entry['channel'] = channel
+        entry['XINC'], entry['XREF'], entry['YOR'], entry['YREF'], entry['YINC'] = preamble
+        entry['max'], entry['min'], entry['rms'], entry['freq'] = measurements
+        offset += raw.size
+    # jedna kopia próbek wspólna dla wszystkich odbiorców, ponieważ bufory ramek są używane ponownie
+    payload = b''.join(numpy.ascontiguousarray(raw, dtype=numpy.uint8).data for channel, raw, preamble, measurements
+                       in records)
+    name = (device or '').encode()
+    header = MESSAGE_HEADER.pack(MAGIC, STREAM_VERSION, len(records), number, len(name), len(payload))
+    return header + name + entries.tobytes(), payload
+
+
+# stworzenie klasy odbiorcy podłączonego do serwera: własna kolejka komunikatów i wątek wysyłający, dzięki czemu
+# wolny odbiorca nie spowalnia pomiarów ani pozostałych odbiorców
+class StreamSubscriber:
+
+    def __init__(self, connection, address, queue_size=4, on_close=None):
+        self.connection = connection
+        self.address = address
+        self.queue_size = queue_size  # największa liczba komunikatów oczekujących na wysłanie
+        self.queue = collections.deque()
+        self.condition = threading.Condition()
+        self.on_close = on_close
+        self.closed = False
+        self.sent = 0  # liczba wysłanych ramek
+        self.dropped = 0  # ramki pominięte, gdy odbiorca nie nadążał z odbiorem
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    # dodanie komunikatu do kolejki; przy pełnej kolejce najstarszy komunikat jest pomijany (wygrywa najnowszy),
+    # a przy block=True oczekiwanie na miejsce w kolejce (odbiorca spowalnia nadawcę)
+    def put(self, message, block=False):
+        with self.condition:
+            while block and not self.closed and len(self.queue) >= self.queue_size:
+                self.condition.wait()
+            if self.closed:
+                return False
+            if len(self.queue) >= self.queue_size:
+                self.queue.popleft()
+                self.dropped += 1
+            self.queue.append(message)
+            self.condition.notify_all()
+        return True
+
+    # wątek wysyłający komunikaty; blokowanie w sendall przenosi przeciwciśnienie TCP tylko na ten wątek
+    def run(self):
+        try:
+            while True:
+                with self.condition:
+                    while not self.queue and not self.closed:
+                        self.condition.wait()
+                    if self.closed:
+                        break
+                    header, payload = self.queue.popleft()
+                    self.condition.notify_all()
+                self.connection.sendall(header)
+                self.connection.sendall(payload)
+                self.sent += 1
+        except OSError:
+            pass  # odbiorca rozłączył się
+        finally:
+            self.close()
+
+    def close(self):
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.queue.clear()
+            self.condition.notify_all()
+        try:
+            self.connection.close()
+        except OSError:
+            pass
+        if self.on_close is not None:
+            self.on_close(self)
+
+
+# stworzenie klasy serwera TCP udostępniającego kolejne ramki wielu odbiorcom jednocześnie
+class FrameServer:
+
+    def __init__(self, host='127.0.0.1', port=STREAM_PORT, queue_size=4):
+        self.queue_size = queue_size  # długość kolejki każdego odbiorcy
+        self.socket = socket.create_server((host, port))
+        self.address = self.socket.getsockname()[:2]  # faktyczny adres (port 0 - wybrany przez system)
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.frames = 0  # liczba udostępnionych ramek
+        self.droppedClosed = 0  # ramki pominięte przez odbiorców, którzy już się rozłączyli
+        self.worker = threading.Thread(target=self.accept, daemon=True)
+        self.worker.start()
+
+    @property
+    def port(self):
+        return self.address[1]
+
+    # wątek przyjmujący nowych odbiorców
+    def accept(self):
+        while True:
+            try:
+                connection, address = self.socket.accept()
+            except OSError:
+                break  # serwer został zamknięty
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            subscriber = StreamSubscriber(connection, address, self.queue_size, self.remove)
+            with self.lock:
+                self.subscribers.append(subscriber)
+
+    def remove(self, subscriber):
+        with self.lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+                self.droppedClosed += subscriber.dropped
+
+    @property
+    def clients(self):
+        return len(self.subscribers)
+
+    # ramki pominięte przez wszystkich odbiorców
+    @property
+    def dropped(self):
+        with self.lock:
+            return self.droppedClosed + sum(subscriber.dropped for subscriber in self.subscribers)
+
+    # udostępnienie ramki; records - lista (kanał, surowe próbki, dane skalujące, (max, min, rms, freq))
+    # bez odbiorców ramka nie jest nawet kodowana; block - oczekiwanie na miejsce w kolejkach odbiorców
+    def publish(self, records, timestamp=None, device=None, block=False):
+        with self.lock:
+            subscribers = list(self.subscribers)
+            number = self.frames
+            self.frames += 1
+        if not subscribers:
+            return 0
+        if timestamp is None:
+            timestamp = time.time()
+        message = encode_frame(number, records, timestamp, device)
+        return sum(subscriber.put(message, block) for subscriber in subscribers)
+
+    def close(self):
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)  # przerwanie oczekiwania w accept
+        except OSError:
+            pass
+        self.socket.close()
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            subscriber.close()
+
+
+# stworzenie klasy odbierającej ramki z serwera (np. dla paneli, rejestratorów lub testów z pętlą zwrotną)
+class FrameClient:
+
+    def __init__(self, host='127.0.0.1', port=STREAM_PORT, timeout=None):
+        self.connection = socket.create_connection((host, port), timeout=timeout)
+        self.buffer = bytearray()  # bufor próbek używany ponownie w kolejnych ramkach
+
+    # odebranie dokładnie size bajtów do bufora
+    def receive_into(self, view):
+        received = 0
+        while received < len(view):
+            count = self.connection.recv_into(view[received:])
+            if count == 0:
+                raise ConnectionError("Serwer zamknął połączenie")
+            received += count
+
+    def receive(self, size):
+        data = bytearray(size)
+        self.receive_into(memoryview(data))
+        return data
+
+    # odebranie następnej ramki: (numer ramki, czas, nazwa urządzenia, lista (kanał, przebieg RawWaveform,
+    # (max, min, rms, freq))); przebiegi wskazują na bufor klienta i są ważne do następnego wywołania read
+    def read(self):
+        magic, version, channels, number, nameLength, payloadLength = MESSAGE_HEADER.unpack(
+            self.receive(MESSAGE_HEADER.size))
+        if magic != MAGIC or version != STREAM_VERSION:
+            raise StreamError(f"Nieobsługiwany komunikat (znacznik {magic!r}, wersja {version})")
+        device = self.receive(nameLength).decode() or None
+        entries = numpy.frombuffer(self.receive(channels * INDEX_DTYPE.itemsize), dtype=INDEX_DTYPE)
+        if len(self.buffer) < payloadLength:
+            self.buffer = bytearray(payloadLength)
+        self.receive_into(memoryview(self.buffer)[:payloadLength])
+        samples = numpy.frombuffer(self.buffer, dtype=numpy.uint8, count=payloadLength)
+
+        result = []
+        for entry in entries:
+            offset, length = int(entry['offset']), int(entry['length'])
+            preamble = tuple(float(entry[name]) for name in ('XINC', 'XREF', 'YOR', 'YREF', 'YINC'))
+            measurements = tuple(float(entry[name]) for name in ('max', 'min', 'rms', 'freq'))
+            result.append((int(entry['channel']), RawWaveform.from_preamble(samples[offset:offset + length], preamble),
+                           measurements))
+        timestamp = float(entries['timestamp'][0]) if channels else 0.0
+        return number, timestamp, device, result
+
+    def close(self):
+        self.connection.close()
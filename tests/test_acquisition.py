@@ -0,0 +1,57 @@
+import numpy
+import pytest
+
+from acquisition import get_all_data_buffer, program_channels, AcquisitionTimeout
+from pipeline import program_pipelined
+from simulator import SimulatedOscilloscope
+
+
+# symulator zwracający krótsze bloki niż zażądano (najwyżej limit próbek) i nic poza pamięcią available
+class ShortBlocks(SimulatedOscilloscope):
+
+    def __init__(self, limit, available=None, **settings):
+        super().__init__(**settings)
+        self.limit = limit
+        self.available = available
+
+    def data_block(self):
+        self.stop = min(self.stop, max(self.start, 1) + self.limit - 1)
+        if self.available is not None:
+            self.stop = min(self.stop, self.available)
+        return super().data_block()
+
+
+def stopped(oscyloskop):
+    oscyloskop.write(":WAVeform:MODE RAW")
+    oscyloskop.write(":STOP")
+    return oscyloskop
+
+
+def test_short_blocks_are_contiguous():
+    oscyloskop = stopped(ShortBlocks(700, memory_depth=5000))
+    out = get_all_data_buffer(oscyloskop, 5000, sample=1000)
+    numpy.testing.assert_array_equal(out, oscyloskop.samples(1, 0, 5000))
+
+
+def test_record_shorter_than_expected():
+    oscyloskop = stopped(ShortBlocks(1000, available=2500, memory_depth=5000))
+    out = get_all_data_buffer(oscyloskop, 5000, sample=1000)
+    numpy.testing.assert_array_equal(out, oscyloskop.samples(1, 0, 2500))
+
+
+def test_channels_share_one_acquisition():
+    oscyloskop = SimulatedOscilloscope(memory_depth=4000, frequency=1e6)
+    oscyloskop.write(":WAVeform:MODE RAW")
+    (data1, XINC, XREF, frq), (data2, *rest) = program_channels(oscyloskop, (1, 2))
+    assert len(data1) == len(data2) == 4000
+    assert oscyloskop.running
+    assert frq[0] == pytest.approx(oscyloskop.frequency, rel=0.01)
+
+
+@pytest.mark.parametrize('capture', [lambda oscyloskop: program_channels(oscyloskop, (1,), timeout=0.01),
+                                     lambda oscyloskop: program_pipelined(oscyloskop, timeout=0.01)])
+def test_acquisition_restarts_after_timeout(capture):
+    oscyloskop = SimulatedOscilloscope(stop_delay=1.0)
+    with pytest.raises(AcquisitionTimeout):
+        capture(oscyloskop)
+    assert oscyloskop.running
@@ -0,0 +1,33 @@
+import json
+
+import batch
+from tuning import LinkProfiles
+
+
+def test_simulated_tuning_leaves_profiles_alone(monkeypatch, capsys):
+    stored = []
+    monkeypatch.setattr(LinkProfiles, 'store', lambda self, resource, link: stored.append(self.path))
+    monkeypatch.setattr(LinkProfiles, 'load', lambda self: stored.append(self.path) or {})
+    assert batch.main(['--simulate', '--tune', '--frames', '2', '--quiet']) == 0
+    assert stored == []
+
+
+def test_simulated_tuning_with_explicit_profile_file(tmp_path, capsys):
+    path = tmp_path / "profile.json"
+    assert batch.main(['--simulate', '--tune', '--frames', '1', '--profiles', str(path)]) == 0
+    profiles = json.loads(path.read_text())
+    assert profiles['SIM::INSTR']['sample'] > 0
+    assert "Transfer danych" in capsys.readouterr().out
+
+    link = LinkProfiles(str(path)).get('SIM::INSTR')  # ponowne uruchomienie korzysta z zapisanego profilu
+    assert batch.main(['--simulate', '--frames', '1', '--quiet', '--profiles', str(path)]) == 0
+    assert LinkProfiles(str(path)).get('SIM::INSTR').sample == link.sample
+
+
+def test_batch_export_and_math(tmp_path, capsys):
+    path = tmp_path / "ramka.csv"
+    assert batch.main(['--simulate', '--channels', '1', '2', '--math', 'P = CH1 * CH2', '--export', str(path),
+                       '--format', 'csv']) == 0
+    output = capsys.readouterr().out
+    assert " CH1 " in output and " CH2 " in output and " P " in output
+    assert path.read_text().splitlines()[0] == "CH1 [V],CH2 [V],P [V],Czas [S]"
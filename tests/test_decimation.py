@@ -0,0 +1,50 @@
+import numpy
+import pytest
+
+from decimation import MinMaxPyramid
+from waveform import RawWaveform
+
+
+def spiky_record(size=1_000_000):
+    generator = numpy.random.default_rng(0)
+    data = generator.normal(0.0, 0.1, size)
+    data[size // 8 + 1] = 5.0  # pojedyncze szpilki, które nie mogą zniknąć po decymacji
+    data[size * 7 // 8 + 3] = -4.0
+    return data
+
+
+def test_overview_keeps_every_spike():
+    data = spiky_record()
+    pyramid = MinMaxPyramid(data, 0.0, 1e-6)
+    x, y = pyramid.view(0.0, 1.0, 2000)
+    assert y.size <= 2000
+    assert y.max() == pytest.approx(5.0)
+    assert y.min() == pytest.approx(-4.0)
+    assert pyramid.y_range() == pytest.approx((-4.0, 5.0))
+
+
+def test_zoomed_view_returns_raw_samples():
+    data = spiky_record()
+    pyramid = MinMaxPyramid(data, 0.5, 1e-6)
+    x, y = pyramid.view(0.5 + 1000e-6, 0.5 + 1999e-6, 4000)
+    numpy.testing.assert_array_equal(y, data[1000:2000])
+    numpy.testing.assert_allclose(x, 0.5 + numpy.arange(1000, 2000) * 1e-6)
+
+
+def test_envelope_of_every_level_bounds_the_data():
+    data = spiky_record(100_003)  # niepełna ostatnia grupa
+    pyramid = MinMaxPyramid(data)
+    for bucket, mins, maxs in zip(pyramid.buckets, pyramid.mins, pyramid.maxs):
+        groups = numpy.arange(0, data.size, bucket)
+        numpy.testing.assert_allclose(mins, numpy.minimum.reduceat(data, groups).astype(numpy.float32))
+        numpy.testing.assert_allclose(maxs, numpy.maximum.reduceat(data, groups).astype(numpy.float32))
+
+
+def test_raw_waveform_levels_are_in_volts():
+    raw = numpy.random.default_rng(1).integers(20, 230, 200_000).astype(numpy.uint8)
+    raw[5000] = 255
+    waveform = RawWaveform(raw, 1e-6, 0.0, 0.0, 127.0, 0.04)
+    pyramid = MinMaxPyramid(waveform, 0.0, 1e-6)
+    assert pyramid.y_range() == pytest.approx(((int(raw.min()) - 127) * 0.04, (255 - 127) * 0.04))
+    x, y = pyramid.view(0.0, 0.2, 1000)
+    assert y.max() == pytest.approx((255 - 127) * 0.04)
@@ -0,0 +1,72 @@
+import json
+import warnings
+
+import numpy
+import pytest
+
+from export import export, export_csv, format_fixed
+
+
+def rows(chars):
+    return [bytes(row[row != 0]).decode() for row in chars]
+
+
+def test_fixed_point_text():
+    assert rows(format_fixed([1.5, -2.25, 0.0, 123.4567891], 6)) == ['1.500000', '-2.250000', '0.000000',
+                                                                     '123.456789']
+    assert rows(format_fixed([7.0, -3.4], 0)) == ['7', '-3']
+
+
+def test_values_without_fixed_point_form_round_trip(tmp_path):
+    values = numpy.array([numpy.nan, numpy.inf, -numpy.inf, 1e20, -1e-9, 0.25])
+    path = str(tmp_path / "dane.csv")
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')  # bez ostrzeżeń przy rzutowaniu nan/inf na int64
+        export(path, 'csv', ['M1'], [values], 0.0, 1e-3)
+    with open(path) as file:
+        header = file.readline()
+        lines = file.read().splitlines()
+    assert header.strip() == "M1 [V],Czas [S]"
+    written = [line.split(',')[0] for line in lines]
+    assert written == ['nan', 'inf', '-inf', '1e+20', '0.000000', '0.250000']
+    parsed = numpy.array([float(text) for text in written])
+    numpy.testing.assert_array_equal(parsed[1:4], values[1:4])
+    assert numpy.isnan(parsed[0])
+
+
+def test_csv_is_written_in_chunks(tmp_path):
+    volts = [numpy.linspace(-1, 1, 2501), numpy.linspace(5, 6, 2501)]
+    path = str(tmp_path / "dane.csv")
+    progress = []
+    export_csv(path, ['CH1', 'CH2'], volts, 0.5, 1e-6, chunk=1000, progress=progress.append)
+    assert progress == pytest.approx([1000 / 2501, 2000 / 2501, 1.0])
+    table = numpy.loadtxt(path, delimiter=',', skiprows=1)
+    numpy.testing.assert_allclose(table[:, 0], volts[0], atol=5e-7)
+    numpy.testing.assert_allclose(table[:, 1], volts[1], atol=5e-7)
+    numpy.testing.assert_allclose(table[:, 2], 0.5 + numpy.arange(2501) * 1e-6, atol=1e-12)
+
+
+@pytest.mark.parametrize('fmt', ['npy', 'npz'])
+def test_binary_formats(tmp_path, fmt):
+    volts = [numpy.arange(10.0), -numpy.arange(10.0)]
+    path = str(tmp_path / f"dane.{fmt}")
+    export(path, fmt, ['CH1', 'CH2'], volts, 2.0, 0.1)
+    if fmt == 'npy':
+        numpy.testing.assert_array_equal(numpy.load(path), numpy.stack(volts))
+    else:
+        with numpy.load(path) as archive:
+            assert archive['x0'] == 2.0 and archive['dx'] == 0.1
+            numpy.testing.assert_array_equal(archive['CH2'], volts[1])
+
+
+def test_raw_codes_with_scaling(tmp_path):
+    raw = numpy.arange(256, dtype=numpy.uint8)
+    preamble = (1e-6, 0.0, 0.0, 127.0, 0.04)
+    path = str(tmp_path / "dane.bin")
+    export(path, 'raw', ['CH1', 'CH2'], [raw, raw[:10]], 0.0, 1e-6, raws=[raw, raw[:10]], preambles=[preamble, preamble])
+    with open(path + '.json') as file:
+        metadata = json.load(file)
+    assert [channel['offset'] for channel in metadata['channels']] == [0, 256]
+    numpy.testing.assert_array_equal(numpy.fromfile(path, dtype=numpy.uint8)[:256], raw)
+    with pytest.raises(ValueError):
+        export(path, 'raw', ['CH1'], [raw], 0.0, 1e-6)
@@ -0,0 +1,59 @@
+from acquisition import program_channels, select_channel
+from instrument_state import InstrumentStateCache, QUERIES_ON_HIT, QUERIES_ON_MISS
+from pipeline import program_pipelined
+from simulator import SimulatedOscilloscope
+from transport import Frame
+
+
+def scope():
+    oscyloskop = SimulatedOscilloscope(memory_depth=6000)
+    oscyloskop.write(":WAVeform:MODE RAW")
+    return oscyloskop
+
+
+def test_two_channels_hit_after_first_frame():
+    oscyloskop, cache, frame = scope(), InstrumentStateCache(), Frame(0)
+    for _ in range(5):
+        program_channels(oscyloskop, (1, 2), cache, frame)
+    assert cache.statistics()['hits'] == 8
+    assert cache.misses == 2
+    assert cache.invalidations == 0
+    assert set(cache.entries) == {1, 2}
+
+
+def test_changed_scaling_is_detected():
+    oscyloskop, cache = scope(), InstrumentStateCache()
+    program_pipelined(oscyloskop, cache=cache)
+    oscyloskop.YINC = 0.08  # zmiana V/div na panelu oscyloskopu
+    data, XINC, XREF, frq, result = program_pipelined(oscyloskop, cache=cache)
+    assert data.preamble[4] == 0.08
+    assert (cache.hits, cache.misses, cache.invalidations) == (0, 2, 1)
+    program_pipelined(oscyloskop, cache=cache)
+    assert cache.hits == 1
+
+
+def test_changed_scaling_keeps_other_channels():
+    oscyloskop, cache, frame = scope(), InstrumentStateCache(), Frame(0)
+    program_channels(oscyloskop, (1, 2), cache, frame)
+    select_channel(oscyloskop, 1, cache)
+    oscyloskop.XREF = 5.0
+    cache.get(oscyloskop)
+    assert 2 in cache.entries and cache.invalidations == 1
+
+
+def test_write_invalidates_every_channel():
+    oscyloskop, cache, frame = scope(), InstrumentStateCache(), Frame(0)
+    program_channels(oscyloskop, (1, 2), cache, frame)
+    cache.write(oscyloskop, ":WAVeform:FORMat BYTE")
+    assert cache.entries == {} and cache.invalidations == 1
+    program_channels(oscyloskop, (1, 2), cache, frame)
+    assert cache.misses == 4
+
+
+def test_saved_queries():
+    oscyloskop, cache = scope(), InstrumentStateCache()
+    before = oscyloskop.queries
+    for _ in range(3):
+        cache.get(oscyloskop)
+    assert oscyloskop.queries - before == QUERIES_ON_MISS + 2 * QUERIES_ON_HIT
+    assert cache.saved_queries() > 0
@@ -0,0 +1,149 @@
+import numpy
+import pytest
+
+from math_channels import (MathChannels, MathError, MathExpression, MathWaveform, MathCache, MATH_CHANNEL, BLOCK,
+                           math_records)
+from transport import Frame
+from waveform import RawWaveform
+
+DX = 1e-6
+
+
+def sources(size=3 * BLOCK + 123):
+    t = numpy.arange(size) * DX
+    return {1: numpy.sin(2 * numpy.pi * 1000 * t), 2: 0.5 + numpy.cos(2 * numpy.pi * 3000 * t)}
+
+
+def waveform(text, channels=None, cache=None):
+    return MathWaveform(MathExpression(text), channels or sources(), DX, cache=cache or MathCache())
+
+
+def test_product_matches_numpy():
+    channels = sources()
+    numpy.testing.assert_allclose(numpy.asarray(waveform("CH1 * CH2", channels)), channels[1] * channels[2])
+
+
+def test_integral_matches_cumulative_sum():
+    channels = sources()
+    data = waveform("integral(CH1 - 0.25)", channels)
+    expected = numpy.cumsum(channels[1] - 0.25) * DX
+    numpy.testing.assert_allclose(numpy.asarray(data), expected, rtol=1e-9, atol=1e-15)
+    # fragment z dalszej części rekordu zaczyna się od sumy wcześniejszych próbek
+    numpy.testing.assert_allclose(data[2 * BLOCK + 10:2 * BLOCK + 500], expected[2 * BLOCK + 10:2 * BLOCK + 500],
+                                  rtol=1e-9, atol=1e-15)
+
+
+def test_derivative_matches_gradient():
+    channels = sources()
+    data = waveform("derivative(CH2)", channels)
+    expected = numpy.gradient(channels[2], DX)
+    numpy.testing.assert_allclose(numpy.asarray(data), expected)
+    numpy.testing.assert_allclose(data[BLOCK - 5:BLOCK + 5], expected[BLOCK - 5:BLOCK + 5])
+
+
+def test_raw_waveform_sources():
+    codes = numpy.arange(1000, dtype=numpy.uint8)
+    raw = RawWaveform(codes, DX, 0.0, 0.0, 128.0, 0.1)
+    data = waveform("2 * CH1", {1: raw})
+    numpy.testing.assert_allclose(numpy.asarray(data), 2 * numpy.asarray(raw))
+
+
+@pytest.mark.parametrize('text', ["CH1.__class__", "open('x')", "CH5 + 1", "foo(CH1)", "CH1 if CH2 else 0",
+                                  "CH1**9**9**9", "1/0*CH1", "2 + 3", "CH1 +"])
+def test_rejected_expressions(text):
+    with pytest.raises(MathError):
+        MathExpression(text)
+
+
+def test_short_ranges_are_cached():
+    cache = MathCache()
+    data = waveform("CH1 * CH2", cache=cache)
+    first = data[100:200]
+    second = data[100:200]
+    numpy.testing.assert_array_equal(first, second)
+    assert cache.misses == 1
+    assert cache.hits == 1
+
+
+def test_cache_is_bounded():
+    cache = MathCache(capacity=64 * 1024)
+    data = waveform("CH1 + CH2", cache=cache)
+    for start in range(0, 20000, 1000):
+        data[start:start + 1000]
+    assert cache.size <= cache.capacity
+
+
+def test_summary_and_view():
+    channels = sources()
+    data = waveform("CH1 * CH2", channels)
+    expected = channels[1] * channels[2]
+    x, y = data.view(10 * DX, 109 * DX)  # krótki zakres - wartości próbek
+    numpy.testing.assert_allclose(y, expected[10:110])
+    numpy.testing.assert_allclose(x, numpy.arange(10, 110) * DX)
+
+    xmin, xmax = data.x_range()
+    x, y = data.view(xmin, xmax, max_points=1000)  # cały rekord - co step-ta próbka
+    step = int(round((x[1] - x[0]) / DX))
+    assert y.size <= 1000
+    numpy.testing.assert_allclose(y, expected[::step])
+    low, high = data.y_range()
+    assert expected.min() <= low < high <= expected.max()
+
+    stats = data.statistics()  # pełny rekord, np. przy zapisie
+    assert stats.maxValue == pytest.approx(expected.max())
+    assert stats.minValue == pytest.approx(expected.min())
+    assert data.y_range() == pytest.approx((expected.min(), expected.max()), rel=1e-6)
+    x, y = data.view(xmin, xmax, max_points=100)  # obwiednia policzona przy statystykach
+    assert y.min() == pytest.approx(expected.min(), rel=1e-6)
+
+
+def test_display_evaluates_only_drawn_points(monkeypatch):
+    evaluated = []
+    evaluate = MathExpression.evaluate
+    monkeypatch.setattr(MathExpression, 'evaluate',
+                        lambda self, data, beginning, end: evaluated.append(end - beginning) or
+                        evaluate(self, data, beginning, end))
+    data = waveform("CH1 * CH2 + derivative(CH1)", sources(size=2 ** 22))
+    data.y_range()
+    xmin, xmax = data.x_range()
+    data.view(xmin, xmax, 4000)
+    data.view(xmin + (xmax - xmin) / 3, xmin + (xmax - xmin) / 2, 4000)
+    assert sum(evaluated) < 64 * 4000
+
+
+def test_encode_round_trip():
+    channels = sources()
+    data = waveform("CH1 * CH2", channels)
+    raw, (XINC, XREF, YOR, YREF, YINC) = data.encode()
+    assert raw.dtype == numpy.uint8
+    decoded = (raw - YOR - YREF) * YINC
+    numpy.testing.assert_allclose(decoded, channels[1] * channels[2], atol=YINC)
+
+
+def test_math_records():
+    channels = sources()
+    math = MathChannels()
+    math.configure(MathChannels.parse("P = CH1 * CH2\nCH2 - CH1\n# komentarz"))
+    derived = math.bind(channels, DX)
+    frame = Frame(0)
+    records = math_records(derived, frame)
+    assert [number for number, raw, preamble, measurements in records] == [MATH_CHANNEL + 1, MATH_CHANNEL + 2]
+    number, raw, preamble, (max, min, rms, freq) = records[0]
+    assert raw.size == len(derived[0][2])
+    assert max == pytest.approx((channels[1] * channels[2]).max())
+    number, raw, preamble, measurements = records[1]
+    XINC, XREF, YOR, YREF, YINC = preamble
+    numpy.testing.assert_allclose((raw - YOR - YREF) * YINC, channels[2] - channels[1], atol=YINC)
+
+
+def test_parse_and_bind():
+    definitions = MathChannels.parse("P = CH1 * CH2\nI = integral(CH3)\nCH1 + 1")
+    assert [name for name, expression in definitions] == ['P', 'I', 'M3']
+    math = MathChannels()
+    math.configure(definitions)
+    assert math.enabled
+    bound = math.bind(sources(), DX)  # brak kanału 3 - definicja I jest pomijana
+    assert [(number, name) for number, name, data in bound] == [(MATH_CHANNEL + 1, 'P'), (MATH_CHANNEL + 3, 'M3')]
+    with pytest.raises(MathError):
+        MathChannels.parse("CH1 = CH2 * 2")
+    assert MathChannels.parse(math.text())[0][0] == 'P'
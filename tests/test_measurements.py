@@ -0,0 +1,122 @@
+import numpy
+import pytest
+
+from measurements import RunningStats, RawStats, measure_all, active_power, BLOCK, INVALID
+from waveform import RawWaveform
+
+
+def sine(size=500_000, frequency=1000.0, dx=1e-6, amplitude=2.0, noise=0.0):
+    t = numpy.arange(size) * dx
+    data = amplitude * numpy.sin(2 * numpy.pi * frequency * t + 0.3)
+    if noise:
+        data += numpy.random.default_rng(0).normal(0.0, noise, size)
+    return data
+
+
+def test_single_pass_matches_numpy():
+    data = sine(noise=0.05)
+    stats = measure_all(data, 1e-6)
+    maxValue, minValue, mean, rms, std, peak, frequency = stats.summary()
+    assert maxValue == data.max() and minValue == data.min()
+    assert mean == pytest.approx(data.mean(), abs=1e-12)
+    assert rms == pytest.approx(numpy.sqrt(numpy.mean(data ** 2)))
+    assert std == pytest.approx(data.std())
+    assert peak == pytest.approx(data.max() - data.min())
+    assert frequency == pytest.approx(1000.0, rel=1e-3)
+
+
+def test_chunked_updates_equal_one_update():
+    data = sine(noise=0.05)
+    whole = RunningStats(1e-6)
+    whole.update(data)
+    chunked = RunningStats(1e-6)
+    for beginning in range(0, data.size, 12345):
+        chunked.update(data[beginning:beginning + 12345])
+    assert chunked.result() == pytest.approx(whole.result())
+    assert chunked.crossings == whole.crossings
+    assert chunked.frequency() == pytest.approx(whole.frequency())
+
+
+def test_merged_parts_equal_continuous_pass():
+    data = sine(size=4 * BLOCK + 100)
+    whole = RunningStats(1e-6)
+    whole.edges = []
+    whole.update(data)
+    first = RunningStats(1e-6)
+    first.edges = []
+    first.set_level(data.min(), data.max())
+    first.update(data[:2 * BLOCK])
+    second = RunningStats(1e-6)
+    second.edges = []
+    second.set_level(data.min(), data.max())
+    second.update(data[2 * BLOCK:])
+    first.merge(second)
+    assert first.crossings == whole.crossings
+    numpy.testing.assert_allclose(first.edge_positions(), whole.edge_positions())
+    assert first.rms() == pytest.approx(whole.rms())
+
+
+def test_raw_statistics_from_histogram():
+    raw = numpy.clip(numpy.rint(sine(noise=0.02) / 0.04 + 127), 0, 255).astype(numpy.uint8)
+    volts = (raw - 127.0) * 0.04
+    stats = RawStats(127.0, 0.04, 1e-6)
+    stats.update(raw)
+    reference = measure_all(volts, 1e-6)
+    assert stats.result() == pytest.approx(reference.result())
+    assert stats.frequency() == pytest.approx(reference.frequency(), rel=1e-6)
+
+
+def test_active_power_on_codes():
+    voltage = sine(frequency=50.0, dx=1e-5, amplitude=1.0)
+    current = sine(frequency=50.0, dx=1e-5, amplitude=0.5)
+    raw1 = numpy.rint(voltage / 0.01 + 128).astype(numpy.uint8)
+    raw2 = numpy.rint(current / 0.005 + 128).astype(numpy.uint8)
+    wave1 = RawWaveform(raw1, 1e-5, 0.0, 0.0, 128.0, 0.01)
+    wave2 = RawWaveform(raw2, 1e-5, 0.0, 0.0, 128.0, 0.005)
+    expected = numpy.mean(numpy.asarray(wave1) * numpy.asarray(wave2))
+    assert active_power(wave1, wave2) == pytest.approx(expected)
+    assert active_power(voltage, current) == pytest.approx(0.25, rel=1e-3)
+
+
+def test_empty_record_is_invalid():
+    assert RunningStats().result() == (INVALID, INVALID, INVALID)
+    assert active_power(numpy.zeros(0), numpy.zeros(0)) == INVALID
+
+
+def test_record_shorter_than_a_period_has_no_frequency():
+    # fragment 0.12 okresu przy szczycie sinusa z szumem (jak 12k próbek przy 1 kHz i 100 MSa/s)
+    t = numpy.arange(12000) * 1e-8
+    data = 2.0 * numpy.sin(2 * numpy.pi * 1000.0 * t + 1.2) + numpy.random.default_rng(0).normal(0.0, 0.02, t.size)
+    assert measure_all(data, 1e-8).frequency() == INVALID
+    raw = numpy.clip(numpy.rint(data / 0.04 + 127), 0, 255).astype(numpy.uint8)
+    assert RawWaveform(raw, 1e-8, 0.0, 0.0, 127.0, 0.04).statistics().frequency() == INVALID
+
+
+def test_noise_has_no_frequency():
+    noise = numpy.random.default_rng(1).normal(0.0, 0.1, 200_000)
+    assert measure_all(noise, 1e-6).frequency() == INVALID
+
+
+def test_level_follows_range_of_whole_record():
+    # pierwszy fragment obejmuje mały wycinek okresu - poziom jest wyznaczany ponownie z szerszego zakresu
+    data = sine(noise=0.01)
+    stats = RunningStats(1e-6)
+    stats.update(data[:50])
+    for beginning in range(50, data.size, 20000):
+        stats.update(data[beginning:beginning + 20000])
+    low, high = stats.levelRange
+    assert high - low > 0.5 * (data.max() - data.min())
+    assert stats.frequency() == pytest.approx(1000.0, rel=1e-3)
+
+
+def test_nan_samples_are_skipped():
+    data = sine(size=100_000)
+    data[[10, 5000, 70000]] = numpy.nan
+    stats = measure_all(data, 1e-6)
+    finite = data[~numpy.isnan(data)]
+    assert stats.maxValue == finite.max() and stats.minValue == finite.min()
+    assert stats.rms() == pytest.approx(numpy.sqrt(numpy.mean(finite ** 2)))
+    assert stats.frequency() == pytest.approx(1000.0, rel=1e-3)
+    data[100] = numpy.inf
+    assert measure_all(data, 1e-6).maxValue == numpy.inf
+    assert measure_all(numpy.full(10, numpy.nan), 1e-6).result() == (INVALID, INVALID, INVALID)
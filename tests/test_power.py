@@ -0,0 +1,90 @@
+import numpy
+import pytest
+
+from power import analyze_power, harmonics, thd, PowerAnalyzer, CYCLE_DTYPE
+from measurements import INVALID
+from waveform import RawWaveform
+
+DX = 1e-5  # 100 kSa/s, 2000 próbek na okres 50 Hz
+
+
+def signals(cycles=20, phase=30.0, third=0.0):
+    t = numpy.arange(int(cycles / 50 / DX)) * DX
+    voltage = 325.0 * numpy.sin(2 * numpy.pi * 50 * t) + third * numpy.sin(2 * numpy.pi * 150 * t)
+    current = 10.0 * numpy.sin(2 * numpy.pi * 50 * t - numpy.radians(phase))
+    return voltage, current
+
+
+def test_powers_of_sinusoidal_load():
+    voltage, current = signals(phase=30.0)
+    result = analyze_power(voltage, current, DX)
+    U, I = 325.0 / numpy.sqrt(2), 10.0 / numpy.sqrt(2)
+    assert result.frequency == pytest.approx(50.0, rel=1e-4)
+    assert result.Urms == pytest.approx(U, rel=1e-6)
+    assert result.Irms == pytest.approx(I, rel=1e-6)
+    assert result.P == pytest.approx(U * I * numpy.cos(numpy.radians(30)), rel=1e-6)
+    assert result.S == pytest.approx(U * I, rel=1e-6)
+    assert result.Q == pytest.approx(U * I * numpy.sin(numpy.radians(30)), rel=1e-4)
+    assert result.phase == pytest.approx(30.0, abs=0.01)
+    assert result.PF == pytest.approx(numpy.cos(numpy.radians(30)), rel=1e-6)
+
+
+def test_capacitive_load_has_negative_reactive_power():
+    voltage, current = signals(phase=-45.0)
+    result = analyze_power(voltage, current, DX)
+    assert result.phase == pytest.approx(-45.0, abs=0.01)
+    assert result.Q < 0
+
+
+def test_cycles_cover_whole_periods():
+    voltage, current = signals(cycles=20, phase=60.0)
+    result = analyze_power(voltage, current, DX, x0=1.0)
+    cycles = result.cycles
+    assert cycles.dtype == CYCLE_DTYPE
+    assert cycles.size == 18  # zbocze w pierwszej próbce nie przekracza histerezy, więc pierwszy okres jest pomijany
+    numpy.testing.assert_allclose(cycles['duration'], 0.02, rtol=1e-3)
+    numpy.testing.assert_allclose(numpy.diff(cycles['start']), 0.02, rtol=1e-3)
+    assert cycles['start'][0] == pytest.approx(1.02, rel=1e-4)
+    numpy.testing.assert_allclose(cycles['P'], result.P, rtol=1e-3)
+    numpy.testing.assert_allclose(cycles['phase'], 60.0, atol=0.05)
+
+
+def test_harmonics_and_thd():
+    voltage, current = signals(third=32.5)  # 10% trzeciej harmonicznej
+    result = analyze_power(voltage, current, DX)
+    amplitudes = numpy.abs(result.harmonicsU)
+    assert amplitudes[0] == pytest.approx(325.0 / numpy.sqrt(2), rel=1e-3)
+    assert amplitudes[2] == pytest.approx(32.5 / numpy.sqrt(2), rel=1e-3)
+    assert result.THDu == pytest.approx(10.0, rel=1e-3)
+    assert result.THDi == pytest.approx(0.0, abs=1e-3)
+    assert thd(None) == INVALID
+
+
+def test_raw_waveforms_match_volts():
+    voltage, current = signals(phase=20.0)
+    raw1 = numpy.rint(voltage / 2.6 + 128).astype(numpy.uint8)
+    raw2 = numpy.rint(current / 0.08 + 128).astype(numpy.uint8)
+    wave1 = RawWaveform(raw1, DX, 0.0, 0.0, 128.0, 2.6)
+    wave2 = RawWaveform(raw2, DX, 0.0, 0.0, 128.0, 0.08)
+    coded = analyze_power(wave1, wave2, DX)
+    reference = analyze_power(numpy.asarray(wave1), numpy.asarray(wave2), DX)
+    assert coded.P == pytest.approx(reference.P)
+    assert coded.S == pytest.approx(reference.S)
+    assert coded.phase == pytest.approx(reference.phase)
+
+
+def test_aperiodic_signal_has_no_cycles():
+    result = analyze_power(numpy.ones(1000), numpy.ones(1000), DX)
+    assert result.frequency == INVALID
+    assert result.cycles.size == 0
+    assert result.P == pytest.approx(1.0)
+
+
+def test_trend_history():
+    analyzer = PowerAnalyzer(length=3)
+    voltage, current = signals(cycles=4)
+    for number in range(5):
+        analyzer.analyze(voltage, current, DX, timestamp=float(number))
+    trend = analyzer.trend()
+    numpy.testing.assert_array_equal(trend['timestamp'], [2.0, 3.0, 4.0])
+    assert analyzer.analyze(voltage, current[:-1], DX) is None
@@ -0,0 +1,78 @@
+import os
+
+import numpy
+
+from acquisition import program_channels
+from recorder import Recorder, CaptureFile, capture_paths
+from replay import ReplaySource
+from simulator import SimulatedOscilloscope
+from transport import Frame
+
+
+# nagranie kilku ramek dwóch kanałów z symulatora; zwraca zapisane wpisy kolejnych ramek
+def record_frames(path, frames=3, close=True):
+    oscyloskop = SimulatedOscilloscope(memory_depth=5000)
+    oscyloskop.write(":WAVeform:MODE RAW")
+    frame = Frame(0)
+    recorder = Recorder(path, grow=2 ** 20)
+    written = []
+    for number in range(frames):
+        results = program_channels(oscyloskop, (1, 2), frame=frame)
+        records = [(channel, raw, preamble, data.statistics().result() + (data.statistics().frequency(),))
+                   for channel, (raw, preamble), (data, XINC, XREF, frq) in zip((1, 2), frame.records, results)]
+        recorder.submit(records, timestamp=1000.0 + number, block=True)
+        written.append([(channel, raw.copy(), preamble) for channel, raw, preamble, measurements in records])
+    if close:
+        recorder.close()
+    return recorder, written
+
+
+def test_round_trip_through_replay(tmp_path):
+    path = str(tmp_path / "nagranie.dat")
+    recorder, written = record_frames(path)
+    assert recorder.frames == 3 and recorder.dropped == 0
+
+    source = ReplaySource(path)
+    assert len(source) == 3
+    for expected in written:
+        channels = source.read()
+        assert [entry[0] for entry in channels] == [1, 2]
+        for (channel, raw, preamble), (number, samples, data, stored, frq) in zip(expected, channels):
+            numpy.testing.assert_array_equal(samples, raw)
+            assert stored == tuple(float(value) for value in preamble)
+            assert data.preamble == stored
+    assert source.read() is None
+
+
+def test_seek_by_time(tmp_path):
+    path = str(tmp_path / "nagranie.dat")
+    record_frames(path)
+    source = ReplaySource(path)
+    source.seek_time(1.0)
+    assert source.position == 1
+    assert source.frame_time(2) == 2.0
+
+
+def test_unclosed_recording_is_readable(tmp_path):
+    path = str(tmp_path / "nagranie.dat")
+    recorder, written = record_frames(path, close=False)
+    recorder.queue.put(None)  # zatrzymanie wątku bez close(): plik danych nie jest obcinany
+    recorder.worker.join()
+    dataPath, indexPath, framesPath, infoPath = capture_paths(path)
+    assert os.path.getsize(dataPath) > recorder.bytes
+    with open(indexPath, 'ab') as file:  # wpis przerwany w trakcie zapisu
+        file.write(b'\0' * 7)
+
+    capture = CaptureFile(path)
+    assert len(capture) == 3
+    numpy.testing.assert_array_equal(capture.samples(capture.entries(2)[1]), written[2][1][1])
+
+
+def test_frame_without_samples_is_skipped(tmp_path):
+    path = str(tmp_path / "nagranie.dat")
+    recorder, written = record_frames(path)
+    dataPath = capture_paths(path)[0]
+    os.truncate(dataPath, recorder.bytes - 1)  # próbki ostatniej ramki niekompletne
+    capture = CaptureFile(path)
+    assert len(capture) == 2
+    assert len(capture.index) == 4
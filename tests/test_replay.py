@@ -0,0 +1,57 @@
+import numpy
+import pytest
+
+from math_channels import MATH_CHANNEL
+from recorder import Recorder
+from replay import ReplaySource, display_channels
+
+
+@pytest.mark.parametrize('channels, shown', [
+    ([3], [3]),
+    ([4, MATH_CHANNEL + 1], [4]),
+    ([2, 1], [1, 2]),
+    ([1, 2, MATH_CHANNEL + 1, MATH_CHANNEL + 2], [1, 2]),
+])
+def test_displayable_recordings(channels, shown):
+    assert display_channels(channels) == shown
+
+
+@pytest.mark.parametrize('channels', [[], [3, 4], [1, 3], [1, 2, 3], [MATH_CHANNEL + 1]])
+def test_recordings_the_gui_cannot_show_are_rejected(channels):
+    with pytest.raises(ValueError):
+        display_channels(channels)
+
+
+def write_recording(path, frames, channels=(3,)):
+    recorder = Recorder(path, grow=2 ** 16)
+    for number in range(frames):
+        records = [(channel, numpy.full(100, number * 10 + channel, dtype=numpy.uint8),
+                    (1e-3, number * 0.1, 0.0, 128.0, 0.5), (1.0, -1.0, 0.5, 50.0)) for channel in channels]
+        recorder.submit(records, timestamp=100.0 + 0.5 * number, block=True)
+    recorder.close()
+
+
+def test_replayed_channel_keeps_its_number(tmp_path):
+    path = str(tmp_path / "ch3")
+    write_recording(path, 2)
+    source = ReplaySource(path)
+    assert display_channels(source.channels()) == [3]
+    (channel, raw, data, preamble, frq), = source.read()
+    assert channel == 3 and frq == 50.0
+    assert data.XINC == 1e-3 and data[0] == pytest.approx((3 - 128.0) * 0.5)
+    assert source.frame_time(1) == 0.5
+
+
+def test_loop_and_seek(tmp_path):
+    path = str(tmp_path / "dwa")
+    write_recording(path, 3, channels=(1, 2))
+    source = ReplaySource(path, loop=True)
+    source.seek(2)
+    assert [entry[1][0] for entry in source.read()] == [21, 22]
+    assert [entry[1][0] for entry in source.read()] == [1, 2]  # powrót do początku nagrania
+    source.seek_time(0.9)
+    assert source.position == 2
+    source.seek_time(10.0)
+    assert source.position == len(source) == 3
+    source.loop = False
+    assert source.read() is None and source.channels() == []
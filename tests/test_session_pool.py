@@ -0,0 +1,58 @@
+import pytest
+
+from session_pool import SessionPool
+from simulator import SimulatedResourceManager, SimulatedVisaError
+from tuning import LinkProfiles, LinkTuning
+
+
+@pytest.fixture
+def rm():
+    manager = SimulatedResourceManager(memory_depth=12000)
+    manager.add_resource('SIM::A::INSTR', frequency=2e6)
+    manager.add_resource('SIM::B::INSTR', frequency=5e6, max_chunk=4000)  # urządzenie z małym buforem
+    return manager
+
+
+def test_parallel_capture_tags_frames(rm):
+    pool = SessionPool(rm)
+    pool.open('SIM::A::INSTR')
+    pool.open('SIM::B::INSTR', channel=2)
+    pool.sessions['SIM::B::INSTR'].link = LinkTuning(sample=4000)
+    frames = pool.capture_all()
+    assert sorted(frames) == ['SIM::A::INSTR', 'SIM::B::INSTR']
+    for name, frame in frames.items():
+        pyramid, XINC, XREF, frq, max, min, rms = frame.payload
+        assert frame.device == name
+        assert len(pyramid.data) == 12000
+    assert frames['SIM::A::INSTR'].payload[3] == pytest.approx(2e6, rel=1e-3)
+    assert frames['SIM::B::INSTR'].payload[3] == pytest.approx(5e6, rel=1e-3)
+    assert pool.sessions['SIM::B::INSTR'].oscyloskop.waveform_source == 2
+    pool.close_all()
+    assert pool.sessions == {}
+
+
+def test_sessions_use_stored_link_profiles(rm, tmp_path):
+    profiles = LinkProfiles(str(tmp_path / "profile.json"))
+    profiles.store('SIM::B::INSTR', LinkTuning(sample=4000))
+    pool = SessionPool(rm, profiles)
+    session = pool.open('SIM::B::INSTR')
+    assert session.link.sample == 4000
+    frame = pool.capture_all()['SIM::B::INSTR']  # fragmenty po 4000 próbek mieszczą się w buforze urządzenia
+    raw, preamble = frame.records[0]
+    assert raw.size == 12000 and session.link.backoffs == 0
+    assert frame.payload[3] == pytest.approx(5e6, rel=1e-3)
+
+    default = SessionPool(rm).open('SIM::B::INSTR')  # bez profilu - domyślne fragmenty po 500000 próbek
+    with pytest.raises(SimulatedVisaError):
+        default.capture(default.ring.acquire())
+
+
+def test_worker_threads_count_frames(rm):
+    pool = SessionPool(rm)
+    pool.open('SIM::A::INSTR')
+    received = []
+    pool.start(on_frame=lambda session: received.append(session.ring.take()), count=3)
+    for session in pool.sessions.values():
+        session.worker.join(5.0)
+        assert session.frames == 3 and session.error is None
+    pool.close_all()
@@ -0,0 +1,74 @@
+import time
+
+import numpy
+import pytest
+
+from streaming import FrameServer, FrameClient
+
+
+# oczekiwanie na spełnienie warunku (np. podłączenie odbiorcy w wątku serwera)
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Przekroczono czas oczekiwania")
+        time.sleep(0.01)
+
+
+def make_records(number, size=1000):
+    raw1 = numpy.full(size, number % 256, dtype=numpy.uint8)
+    raw2 = numpy.arange(size, dtype=numpy.uint8)
+    return [(1, raw1, (1e-6, 0.5, 0.0, 127.0, 0.04), (1.0, -1.0, 0.5, 50.0)),
+            (2, raw2, (1e-6, 0.5, 0.0, 127.0, 0.02), (2.0, -2.0, 1.0, 60.0))]
+
+
+@pytest.fixture
+def server():
+    server = FrameServer('127.0.0.1', 0, queue_size=2)
+    yield server
+    server.close()
+
+
+def test_loopback_client_receives_published_frames(server):
+    client = FrameClient('127.0.0.1', server.port, timeout=5.0)
+    try:
+        wait_for(lambda: server.clients == 1)
+        for number in range(3):
+            assert server.publish(make_records(number), timestamp=100.0 + number, device="scope") == 1
+            received, timestamp, device, channels = client.read()
+            assert received == number
+            assert timestamp == 100.0 + number
+            assert device == "scope"
+            assert [channel for channel, data, measurements in channels] == [1, 2]
+            for (channel, raw, preamble, measurements), (_, data, values) in zip(make_records(number), channels):
+                numpy.testing.assert_array_equal(data.raw, raw)
+                assert data.preamble == preamble
+                assert values == measurements
+    finally:
+        client.close()
+
+
+def test_publish_without_subscribers_is_skipped(server):
+    assert server.publish(make_records(0)) == 0
+    assert server.frames == 1
+
+
+def test_slow_client_gets_latest_frames(server):
+    client = FrameClient('127.0.0.1', server.port, timeout=10.0)
+    try:
+        wait_for(lambda: server.clients == 1)
+        size = 8 * 2 ** 20  # komunikaty większe niż bufory gniazd - wątek wysyłający blokuje się w sendall
+        frames = 16
+        for number in range(frames):
+            server.publish(make_records(number, size))
+        assert server.dropped > 0  # odbiorca nie czytał, więc najstarsze ramki zostały pominięte
+
+        numbers = []
+        while not numbers or numbers[-1] != frames - 1:
+            number, timestamp, device, channels = client.read()
+            assert channels[0][1].raw[0] == number % 256
+            numbers.append(number)
+        assert numbers == sorted(numbers)
+        assert len(numbers) + server.dropped == frames  # każda ramka odebrana albo pominięta
+    finally:
+        client.close()
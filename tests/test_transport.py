@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from decimation import MinMaxPyramid
+from rendering import PlotRenderer
+from transport import FrameRing, FrameRingExhausted
+
+
+def test_latest_frame_wins():
+    ring = FrameRing(slots=3)
+    first, second = ring.acquire(), ring.acquire()
+    ring.publish(first)
+    ring.publish(second)  # pierwsza ramka nie została odebrana - wraca do puli
+    assert ring.take() is second
+    assert ring.take() is None
+    assert ring.dropped == 1
+    assert second.number == 2
+
+
+def test_buffers_are_reused():
+    ring = FrameRing(slots=2)
+    frame = ring.acquire()
+    buffer = frame.buffer('raw', 100)
+    frame.records = [(buffer, None)]
+    ring.release(frame)
+    again = ring.acquire()
+    while again is not frame:
+        again = ring.acquire()
+    assert again.buffer('raw', 50).base is buffer.base  # mniejszy bufor bez nowej alokacji
+    assert again.records == []
+
+
+def test_pending_frame_is_overwritten_when_ring_is_full():
+    ring = FrameRing(slots=2)
+    held = ring.acquire()  # np. wyświetlana przez GUI
+    pending = ring.acquire()
+    ring.publish(pending)
+    assert ring.acquire() is pending
+    assert ring.dropped == 1
+    assert held is not pending
+
+
+def test_exhausted_ring_waits_for_release():
+    ring = FrameRing(slots=2)
+    frames = [ring.acquire(), ring.acquire()]
+    with pytest.raises(FrameRingExhausted):
+        ring.acquire(timeout=0.05)
+    assert ring.exhausted == 1
+    threading.Timer(0.05, ring.release, (frames[0],)).start()
+    assert ring.acquire(timeout=5.0) is frames[0]
+
+
+def test_publish_wakes_waiting_producer():
+    ring = FrameRing(slots=2)
+    frames = [ring.acquire(), ring.acquire()]
+    threading.Timer(0.05, ring.publish, (frames[0],)).start()
+    started = time.monotonic()
+    assert ring.acquire(timeout=5.0) is frames[0]  # nadpisanie nieodebranej ramki bez czekania na timeout
+    assert time.monotonic() - started < 2.0
+
+
+def test_renderer_holds_drawn_frames():
+    figure = Figure()
+    canvas = FigureCanvasAgg(figure)
+    canvas.axes = figure.add_subplot()
+    ring = FrameRing(slots=4)
+    renderer = PlotRenderer(canvas, release=ring.release)
+    renderer.configure(["CH1"], "CH1")
+    frames = [ring.acquire() for _ in range(3)]
+    for frame in frames:
+        frame.payload = MinMaxPyramid(frame.buffer('volts', 1000), 0.0, 1e-6)
+
+    renderer.submit([frames[0].payload], frames=[frames[0]])
+    renderer.render_pending()
+    renderer.submit([frames[1].payload], frames=[frames[1]])
+    renderer.submit([frames[2].payload], frames=[frames[2]])  # pominięta ramka wraca do pierścienia
+    assert list(ring.free) == [ring.frames[3], frames[1]]
+    assert renderer.holds(frames[0]) and renderer.holds(frames[2])
+
+    renderer.render_pending()  # poprzednio rysowana ramka jest zwalniana dopiero po narysowaniu nowej
+    assert ring.free[-1] is frames[0]
+    assert renderer.traces[0] is frames[2].payload and not renderer.holds(frames[0])
@@ -0,0 +1,66 @@
+import numpy
+import pytest
+
+from trigger import TriggerEngine, edges
+from waveform import RawWaveform
+
+
+def square(size=10_000, period=1000, high=1.0, low=-1.0):
+    data = numpy.full(size, low)
+    data[(numpy.arange(size) % period) >= period // 2] = high
+    return data
+
+
+def test_edges_with_hysteresis_ignore_noise():
+    data = numpy.array([-1.0, 0.05, -0.05, 0.05, 1.0, 0.05, -0.05, -1.0, 1.0])
+    rising, falling = edges(data, -0.5, 0.5)
+    numpy.testing.assert_array_equal(rising, [4, 8])
+    numpy.testing.assert_array_equal(falling, [7])
+
+
+def test_rising_events_and_segments():
+    engine = TriggerEngine(level=0.0, pre=100e-6, post=200e-6, enabled=True)
+    data = square()
+    found = engine.search([data, -data], 1e-6, 0.25)
+    assert [round((time - 0.25) / 1e-6) for time, x0, segments in found] == list(range(500, 10_000, 1000))
+    time, x0, (first, second) = found[0]
+    assert x0 == pytest.approx(0.25 + 400e-6)
+    assert first.size == second.size == 301
+    numpy.testing.assert_array_equal(first, data[400:701])
+    numpy.testing.assert_array_equal(second, -data[400:701])
+
+
+def test_holdoff_and_event_limit():
+    engine = TriggerEngine(level=0.0, pre=0.0, post=1500e-6, max_events=3)
+    found = engine.search([square()], 1e-6)
+    assert [round(time / 1e-6) for time, x0, segments in found] == [500, 2500, 4500]
+
+
+def test_falling_window_width_and_runt():
+    data = square()
+    engine = TriggerEngine(kind='falling', level=0.0, pre=0.0, post=0.0)
+    assert [round(time / 1e-6) for time, x0, s in engine.search([data], 1e-6)][:2] == [1000, 2000]
+
+    pulses = numpy.zeros(3000)
+    pulses[100:110] = 1.0  # impuls 10 próbek
+    pulses[1000:1100] = 1.0  # impuls 100 próbek
+    pulses[2000:2020] = 0.4  # impuls karłowaty (nie osiąga 0.8)
+    width = TriggerEngine(kind='width', level=0.2, min_width=50e-6, max_width=200e-6, pre=0.0, post=0.0)
+    assert [round(time / 1e-6) for time, x0, s in width.search([pulses], 1e-6)] == [1100]
+    runt = TriggerEngine(kind='runt', level=0.2, upper=0.8, pre=0.0, post=0.0)
+    assert [round(time / 1e-6) for time, x0, s in runt.search([pulses], 1e-6)] == [2020]
+    window = TriggerEngine(kind='window', level=-0.5, upper=0.5, pre=0.0, post=0.0)
+    assert [round(time / 1e-6) for time, x0, s in window.search([pulses], 1e-6)] == [100, 1000]
+
+
+def test_raw_waveform_thresholds_in_codes():
+    data = square()
+    raw = numpy.rint(data / 0.04 + 127).astype(numpy.uint8)
+    waveform = RawWaveform(raw, 1e-6, 0.0, 0.0, 127.0, 0.04)
+    engine = TriggerEngine(level=0.0, pre=10e-6, post=10e-6)
+    found = engine.search([waveform], 1e-6)
+    assert [round(time / 1e-6) for time, x0, s in found] == list(range(500, 10_000, 1000))
+    time, x0, (segment,) = found[0]
+    assert isinstance(segment, RawWaveform)
+    assert segment.XREF == pytest.approx(x0)
+    assert segment.preamble[1] == pytest.approx(x0)
@@ -0,0 +1,98 @@
+import collections
+import threading
+import time
+
+import numpy
+
+
+# stworzenie klasy ramki przechowującej wielokrotnie używane bufory danych oraz wyniki pomiarów
+class Frame:
+
+    def __init__(self, slot):
+        self.slot = slot  # numer miejsca w pierścieniu ramek
+        self.buffers = {}  # bufory danych używane ponownie w kolejnych ramkach
+        self.payload = None  # dane przekazywane do GUI (np. argumenty funkcji Measure)
+        self.records = []  # surowe próbki uint8 i dane skalujące (XINC, XREF, YOR, YREF, YINC) każdego kanału
+        self.number = 0  # numer kolejny opublikowanej ramki
+        self.device = None  # nazwa urządzenia, z którego pochodzi ramka
+        self.spectrum = None  # widma kanałów: lista (kanał, oś częstotliwości, widmo [dBV], częstotliwość prążka)
+        self.accumulated = None  # wynik akumulacji ramek: linie (etykieta, piramida) i obraz poświaty
+        self.power = None  # wyniki analizy jakości energii (PowerQuality)
+        self.math = None  # kanały matematyczne: lista (numer kanału, nazwa, przebieg do narysowania)
+
+    # bufor o podanej nazwie i rozmiarze (alokowany tylko wtedy, gdy poprzedni jest za mały)
+    def buffer(self, name, size, dtype=numpy.float64):
+        array = self.buffers.get(name)
+        if array is None or array.size < size or array.dtype != dtype:
+            array = numpy.empty(size, dtype=dtype)
+            self.buffers[name] = array
+        return array[:size]
+
+
+# wyjątek zgłaszany, gdy wszystkie bufory ramek są zajęte (wyświetlane, oczekujące lub zapisywane do pliku)
+class FrameRingExhausted(RuntimeError):
+    pass
+
+
+# stworzenie klasy pierścienia ramek przekazującej dane pomiędzy wątkiem pomiarowym a GUI bez kopiowania
+class FrameRing:
+
+    def __init__(self, slots=4):
+        self.frames = [Frame(slot) for slot in range(slots)]
+        self.free = collections.deque(self.frames)  # ramki gotowe do wypełnienia
+        self.latest = None  # ostatnia opublikowana, jeszcze nieodebrana ramka
+        self.lock = threading.Lock()
+        self.available = threading.Condition(self.lock)  # powiadomienie o zwolnieniu bufora
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0  # ramki zastąpione nowszymi, zanim GUI zdążyło je odebrać
+        self.exhausted = 0  # liczba nieudanych prób pobrania ramki (wszystkie bufory zajęte)
+
+    # pobranie wolnej ramki do wypełnienia przez wątek pomiarowy; gdy wszystkie bufory są zajęte, oczekiwanie
+    # najwyżej timeout sekund na zwolnienie któregoś z nich
+    def acquire(self, timeout=0.0):
+        deadline = time.monotonic() + timeout
+        with self.available:
+            while True:
+                if self.free:
+                    return self.free.popleft()
+                if self.latest is not None:  # wszystkie bufory zajęte - nadpisanie nieodebranej ramki
+                    frame, self.latest = self.latest, None
+                    self.dropped += 1
+                    return frame
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.exhausted += 1
+                    raise FrameRingExhausted("Brak wolnych buforów ramek")
+                self.available.wait(remaining)
+
+    # udostępnienie wypełnionej ramki; poprzednia nieodebrana ramka jest odrzucana (wygrywa najnowsza)
+    def publish(self, frame):
+        with self.lock:
+            if self.latest is not None:
+                self.free.append(self.latest)
+                self.dropped += 1
+            self.published += 1
+            frame.number = self.published
+            self.latest = frame
+            self.available.notify()  # oczekujący w acquire może pobrać zwolniony bufor lub nadpisać nową ramkę
+
+    # odebranie najnowszej ramki przez GUI (None, jeśli nie ma nowej ramki)
+    def take(self):
+        with self.lock:
+            frame, self.latest = self.latest, None
+            if frame is not None:
+                self.delivered += 1
+            return frame
+
+    # zwrócenie ramki do puli po jej wykorzystaniu (lub gdy nie została opublikowana)
+    def release(self, frame):
+        with self.lock:
+            frame.payload = None
+            frame.records = []
+            frame.spectrum = None
+            frame.accumulated = None
+            frame.power = None
+            frame.math = None
+            self.free.append(frame)
+            self.available.notify()
@@ -0,0 +1,121 @@
+import threading
+
+import numpy
+
+from profiling import profiler
+from waveform import RawWaveform
+
+
+# rodzaje wyzwalania programowego (klucz -> nazwa wyświetlana w GUI)
+TRIGGER_KINDS = {
+    'rising': "Zbocze narastające",
+    'falling': "Zbocze opadające",
+    'window': "Wyjście z okna",
+    'width': "Szerokość impulsu",
+    'runt': "Impuls karłowaty (runt)",
+}
+
+
+# zbocza sygnału z histerezą: położenia pierwszych próbek powyżej high po próbce poniżej low (narastające)
+# oraz pierwszych próbek poniżej low po próbce powyżej high (opadające)
+def edges(data, low, high):
+    states = numpy.zeros(data.size, dtype=numpy.int8)
+    states[data < low] = -1
+    states[data > high] = 1
+    indices = numpy.flatnonzero(states)  # próbki poza pasmem histerezy
+    states = states[indices]
+    changes = numpy.flatnonzero(states[1:] != states[:-1]) + 1
+    rising = indices[changes[states[changes] > 0]]
+    falling = indices[changes[states[changes] < 0]]
+    return rising, falling
+
+
+# odcinki stałego stanu sygnału: -1 poniżej low, 0 pomiędzy progami, 1 powyżej high (początki i stany odcinków)
+def runs(data, low, high):
+    states = numpy.zeros(data.size, dtype=numpy.int8)
+    states[data < low] = -1
+    states[data > high] = 1
+    starts = numpy.concatenate(([0], numpy.flatnonzero(states[1:] != states[:-1]) + 1))
+    return starts, states[starts]
+
+
+# stworzenie klasy wyszukującej zdarzenia wyzwalające w pobranym rekordzie (zamiast porównania wartości maksymalnej)
+class TriggerEngine:
+
+    def __init__(self, kind='rising', channel=1, level=0.0, upper=1.0, hysteresis=0.0, min_width=0.0,
+                 max_width=numpy.inf, pre=0.0005, post=0.0005, max_events=16, enabled=False, stop=True):
+        self.kind = kind  # rodzaj wyzwalania (klucz TRIGGER_KINDS)
+        self.channel = channel  # numer kanału (1, 2), na którym szukane są zdarzenia
+        self.level = level  # poziom wyzwalania (dolna granica okna i impulsu karłowatego) [V]
+        self.upper = upper  # górna granica okna i impulsu karłowatego [V]
+        self.hysteresis = hysteresis  # połowa szerokości pasma histerezy zboczy [V]
+        self.min_width = min_width  # zakres szerokości dodatnich impulsów [s]
+        self.max_width = max_width
+        self.pre = pre  # czas zapisywany przed zdarzeniem [s]
+        self.post = post  # czas zapisywany po zdarzeniu [s]
+        self.max_events = max_events  # największa liczba zdarzeń przekazywanych z jednej ramki
+        self.enabled = enabled
+        self.stop = stop  # zakończenie pomiarów po pierwszej ramce ze zdarzeniem
+        self.frames = 0  # liczba przeszukanych ramek
+        self.found = 0  # liczba znalezionych zdarzeń
+        self.lock = threading.Lock()
+
+    # zmiana ustawień wyzwalania (wywoływana z wątku GUI)
+    def configure(self, **settings):
+        with self.lock:
+            for name, value in settings.items():
+                setattr(self, name, value)
+
+    # położenia próbek, w których wystąpiły zdarzenia spełniające warunek wyzwalania
+    def events(self, data, dx):
+        level, upper, hysteresis = self.level, self.upper, self.hysteresis
+        if isinstance(data, RawWaveform):  # przebieg RawWaveform: progi przeliczane na kody zamiast próbek na volty
+            level, upper, hysteresis = data.code(level), data.code(upper), hysteresis / data.scale
+            data = data.raw
+        if self.kind == 'rising':
+            return edges(data, level - hysteresis, level + hysteresis)[0]
+        if self.kind == 'falling':
+            return edges(data, level - hysteresis, level + hysteresis)[1]
+        if self.kind == 'window':  # pierwsza próbka poza oknem <level, upper> po próbce wewnątrz okna
+            outside = (data < level) | (data > upper)
+            return numpy.flatnonzero(outside[1:] & ~outside[:-1]) + 1
+        if self.kind == 'width':  # dodatnie impulsy o szerokości z zakresu <min_width, max_width>
+            rising, falling = edges(data, level - hysteresis, level + hysteresis)
+            if not rising.size or not falling.size:
+                return numpy.zeros(0, dtype=numpy.intp)
+            ends = numpy.searchsorted(falling, rising)  # pierwsze zbocze opadające po każdym narastającym
+            complete = ends < falling.size
+            rising, falling = rising[complete], falling[ends[complete]]
+            widths = (falling - rising) * dx
+            return falling[(widths >= self.min_width) & (widths <= self.max_width)]
+        if self.kind == 'runt':  # impuls przekraczający level, który wraca poniżej, nie osiągając upper
+            starts, states = runs(data, level, upper)
+            runt = numpy.flatnonzero((states[:-2] < 0) & (states[1:-1] == 0) & (states[2:] < 0))
+            return starts[runt + 2]
+        raise ValueError(f"Nieznany rodzaj wyzwalania: {self.kind}")
+
+    # wybór zdarzeń oddalonych od poprzedniego co najmniej o czas zapisywany po zdarzeniu (holdoff)
+    def holdoff(self, events, distance):
+        selected = []
+        position = 0
+        while position < events.size and len(selected) < self.max_events:
+            selected.append(int(events[position]))
+            position = int(numpy.searchsorted(events, events[position] + distance, side='left'))
+        return selected
+
+    # wyszukanie zdarzeń; zwraca listę (czas zdarzenia, czas pierwszej próbki fragmentu, fragmenty kanałów)
+    # fragmenty są widokami na przekazane przebiegi, obejmującymi czas pre przed i post po zdarzeniu
+    def search(self, channels, dx, x0=0.0):
+        with profiler.stage('trigger'), self.lock:
+            data = channels[min(self.channel, len(channels)) - 1]
+            before = int(round(self.pre / dx))
+            after = int(round(self.post / dx))
+            found = []
+            for index in self.holdoff(self.events(data, dx), max(after, 1)):
+                beginning = max(index - before, 0)
+                end = min(index + after + 1, data.size)
+                found.append((x0 + index * dx, x0 + beginning * dx,
+                              [channel[beginning:end] for channel in channels]))
+            self.frames += 1
+            self.found += len(found)
+        return found
@@ -0,0 +1,173 @@
+import json
+import os
+import statistics
+import time
+
+import numpy
+
+from acquisition import get_memory_depth, get_all_data_buffer, stop, start, wait_until_stopped
+
+
+# plik z profilami łącza poszczególnych urządzeń (wielkość fragmentu, bufor odczytu VISA, limit czasu)
+TUNING_FILE = os.path.join(os.path.expanduser("~"), ".oscilloscope_tuning.json")
+
+# sprawdzane wielkości fragmentu :WAVeform:DATA? [próbki] oraz bufora odczytu VISA (chunk_size) [B]
+CHUNK_SIZES = (62500, 125000, 250000, 500000, 1000000)
+READ_BUFFERS = (20 * 1024, 256 * 1024, 1024 * 1024)
+
+# wielkość fragmentu używana bez profilu urządzenia (jak w get_all_data)
+DEFAULT_SAMPLE = 500000
+
+
+# stworzenie klasy ustawień łącza z urządzeniem: wielkość fragmentu dobrana przez strojenie i zmniejszana
+# automatycznie po błędach odczytu, a po serii poprawnych odczytów zwiększana z powrotem do dobranej wartości
+class LinkTuning:
+
+    def __init__(self, sample=DEFAULT_SAMPLE, chunk_size=None, timeout=None, throughput=0.0, minimum=10000,
+                 recover=50, tolerance=2):
+        self.best = sample  # wielkość fragmentu dobrana przez strojenie [próbki]
+        self.sample = sample  # aktualna wielkość fragmentu
+        self.chunk_size = chunk_size  # bufor odczytu VISA [B] (None - bez zmiany ustawienia)
+        self.timeout = timeout  # limit czasu operacji VISA [ms] (None - bez zmiany ustawienia)
+        self.throughput = throughput  # zmierzona przepustowość [B/s]
+        self.minimum = minimum  # najmniejsza wielkość fragmentu, poniżej której błąd jest zgłaszany dalej
+        self.recover = recover  # liczba poprawnych odczytów, po której fragment jest zwiększany
+        self.tolerance = tolerance  # liczba błędów przy danej wielkości, po której dobrana wartość jest zmniejszana
+        self.successes = 0  # poprawne odczyty od ostatniej zmiany wielkości fragmentu
+        self.failures = {}  # wielkość fragmentu -> liczba błędów odczytu
+        self.backoffs = 0  # liczba zmniejszeń fragmentu
+
+    @classmethod
+    def from_profile(cls, profile):
+        return cls(int(profile['sample']), profile.get('chunk_size'), profile.get('timeout'),
+                   float(profile.get('throughput', 0.0)))
+
+    # profil zapisywany w pliku (dobrana wielkość fragmentu uwzględnia błędy z poprzednich pomiarów)
+    def profile(self):
+        return {'sample': self.best, 'chunk_size': self.chunk_size, 'timeout': self.timeout,
+                'throughput': self.throughput, 'tuned': time.time()}
+
+    # ustawienie bufora odczytu i limitu czasu zasobu VISA
+    def apply(self, oscyloskop):
+        if self.chunk_size is not None and hasattr(oscyloskop, 'chunk_size'):
+            oscyloskop.chunk_size = self.chunk_size
+        if self.timeout is not None and hasattr(oscyloskop, 'timeout'):
+            oscyloskop.timeout = self.timeout
+
+    # reakcja na błąd odczytu fragmentu: wyczyszczenie stanu urządzenia i zmniejszenie fragmentu o połowę
+    # zwraca False, gdy fragment jest już najmniejszy (błąd powinien zostać zgłoszony dalej)
+    def back_off(self, oscyloskop, error):
+        if self.sample <= self.minimum:
+            return False
+        self.failures[self.sample] = self.failures.get(self.sample, 0) + 1
+        if self.failures[self.sample] >= self.tolerance:  # powtarzające się błędy - mniejsza wartość docelowa
+            self.best = min(self.best, max(self.sample // 2, self.minimum))
+        clear = getattr(oscyloskop, 'clear', None)
+        if clear is not None:
+            try:
+                clear()  # odrzucenie niedokończonej odpowiedzi (Device Clear)
+            except Exception:
+                pass
+        self.sample = max(self.sample // 2, self.minimum)
+        self.successes = 0
+        self.backoffs += 1
+        return True
+
+    def succeeded(self):
+        self.successes += 1
+        if self.sample < self.best and self.successes >= self.recover:
+            self.sample = min(self.sample * 2, self.best)
+            self.successes = 0
+
+
+# stworzenie klasy przechowującej profile łącza urządzeń w pliku (nazwa zasobu VISA -> profil)
+class LinkProfiles:
+
+    def __init__(self, path=TUNING_FILE):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path) as file:
+                profiles = json.load(file)
+            return profiles if isinstance(profiles, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    # ustawienia łącza zapisane dla urządzenia (None, jeśli urządzenie nie było strojone)
+    def get(self, resource):
+        profile = self.load().get(resource)
+        try:
+            return LinkTuning.from_profile(profile) if profile else None
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def store(self, resource, link):
+        profiles = self.load()
+        profiles[resource] = link.profile()
+        try:
+            with open(self.path, 'w') as file:
+                json.dump(profiles, file, indent=2)
+        except OSError:
+            pass  # brak możliwości zapisu nie przeszkadza w pomiarach
+
+
+# pomiar przepustowości pobierania próbek przy danej wielkości fragmentu i buforze odczytu
+# zwraca listę czasów kolejnych pobrań lub None, jeśli którekolwiek pobranie zakończyło się błędem
+def measure_transfer(oscyloskop, depth, sample, chunk_size, repeats, out):
+    if chunk_size is not None:
+        oscyloskop.chunk_size = chunk_size
+    times = []
+    for repeat in range(repeats):
+        begin = time.perf_counter()
+        try:
+            get_all_data_buffer(oscyloskop, depth, sample, out)
+        except Exception:
+            clear = getattr(oscyloskop, 'clear', None)
+            if clear is not None:
+                try:
+                    clear()
+                except Exception:
+                    pass
+            return None
+        times.append(time.perf_counter() - begin)
+    return times
+
+
+# dobranie najszybszych stabilnych ustawień łącza: każda kombinacja wielkości fragmentu i bufora odczytu VISA
+# jest sprawdzana repeats razy na rekordzie do probe próbek; kombinacje z błędem są odrzucane
+# limit czasu ustawiany jest z zapasem względem czasu pobrania największego fragmentu
+def tune(oscyloskop, samples=CHUNK_SIZES, buffers=READ_BUFFERS, probe=2000000, repeats=2, timeout=2.0,
+         progress=None):
+    stop(oscyloskop)
+    try:
+        wait_until_stopped(oscyloskop, timeout)
+        depth = int(min(round(get_memory_depth(oscyloskop)), probe))
+        out = numpy.empty(depth, dtype=numpy.uint8)
+        if not hasattr(oscyloskop, 'chunk_size'):  # zasób bez ustawienia bufora odczytu (np. symulator)
+            buffers = (None,)
+        previous = getattr(oscyloskop, 'chunk_size', None)
+        # fragmenty nie mniejsze niż rekord działają tak samo - sprawdzany jest tylko największy z nich,
+        # aby profil nie ograniczał pobierania dłuższych rekordów po zmianie podstawy czasu
+        sizes = sorted({sample for sample in samples if sample < depth} | {max(samples)})
+        candidates = [(sample, chunk_size) for sample in sizes for chunk_size in buffers]
+
+        best = None
+        for index, (sample, chunk_size) in enumerate(candidates):
+            times = measure_transfer(oscyloskop, depth, sample, chunk_size, repeats, out)
+            if times is not None:
+                throughput = depth / statistics.median(times)
+                if best is None or throughput > best[0]:
+                    best = (throughput, sample, chunk_size)
+            if progress is not None:
+                progress((index + 1) / len(candidates))
+        if previous is not None:
+            oscyloskop.chunk_size = previous
+    finally:
+        start(oscyloskop)
+
+    if best is None:
+        raise RuntimeError("Żadne z badanych ustawień łącza nie pozwoliło pobrać danych")
+    throughput, sample, chunk_size = best
+    timeout = int(max(2000, 4000 * sample / throughput))  # 4x czas pobrania fragmentu [ms]
+    return LinkTuning(sample, chunk_size, timeout, throughput)
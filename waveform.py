@@ -0,0 +1,96 @@
+import numpy
+
+from measurements import RawStats
+from profiling import profiler
+
+
+# stworzenie klasy przebiegu przechowującej surowe próbki uint8 oraz dane skalujące zamiast tablicy napięć float64
+# (8x mniej pamięci); napięcia są wyliczane dopiero dla potrzebnego fragmentu, a statystyki liczone na kodach próbek
+class RawWaveform:
+
+    def __init__(self, raw, XINC, XREF, YOR, YREF, YINC, stats=None):
+        self.raw = raw  # surowe próbki (kody przetwornika)
+        self.XINC = XINC  # odstęp czasu pomiędzy próbkami
+        self.XREF = XREF  # czas pierwszej próbki
+        self.YOR = YOR
+        self.YREF = YREF
+        self.YINC = YINC
+        self.stats = stats  # statystyki rekordu (liczone przy pierwszym użyciu, jeśli nie zostały podane)
+
+    # przebieg z danych w postaci zapisywanej w ramkach i nagraniach: (XINC, XREF, YOR, YREF, YINC)
+    @classmethod
+    def from_preamble(cls, raw, preamble, stats=None):
+        return cls(raw, *preamble, stats=stats)
+
+    @property
+    def preamble(self):
+        return self.XINC, self.XREF, self.YOR, self.YREF, self.YINC
+
+    # przesunięcie i krok kodów: napięcie = (kod - offset) * scale
+    @property
+    def offset(self):
+        return self.YOR + self.YREF
+
+    @property
+    def scale(self):
+        return self.YINC
+
+    @property
+    def size(self):
+        return self.raw.size
+
+    def __len__(self):
+        return self.raw.size
+
+    # fragment przebiegu jako widok na te same próbki (z przesuniętym czasem początku i krokiem)
+    # lub napięcie pojedynczej próbki
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return float(self.voltage(self.raw[key]))
+        start, stop, step = key.indices(self.raw.size)
+        return RawWaveform(self.raw[key], self.XINC * step, self.XREF + start * self.XINC, self.YOR, self.YREF,
+                           self.YINC)
+
+    # przeliczenie próbek na napięcia (domyślnie float32, czyli połowa pamięci float64)
+    def volts(self, dtype=numpy.float32, out=None):
+        with profiler.stage('make_volt'):
+            volt = numpy.subtract(self.raw, self.offset, out=out, dtype=dtype)
+            volt *= self.scale
+        return volt
+
+    # zgodność z funkcjami numpy (np. numpy.savez) - pełny przebieg w voltach
+    def __array__(self, dtype=None, copy=None):
+        return self.volts(dtype or numpy.float64)
+
+    # kod próbki odpowiadający napięciu (np. poziomowi wyzwalania) i napięcie odpowiadające kodom
+    def code(self, value):
+        return value / self.scale + self.offset
+
+    def voltage(self, codes):
+        return (codes - self.offset) * self.scale
+
+    def time(self):
+        return self.XREF + numpy.arange(self.raw.size) * self.XINC
+
+    # statystyki wyznaczone z histogramu kodów próbek (jeden przebieg po danych uint8)
+    def statistics(self):
+        if self.stats is None:
+            self.stats = RawStats(self.offset, self.scale, self.XINC)
+            self.stats.update(self.raw)
+        return self.stats
+
+    def mean(self):
+        return self.statistics().mean()
+
+    def min(self):
+        return self.statistics().minValue
+
+    def max(self):
+        return self.statistics().maxValue
+
+
+# przebieg w voltach: przeliczenie przebiegu RawWaveform, tablice napięć są zwracane bez zmian
+def as_volts(data, dtype=numpy.float32):
+    if isinstance(data, RawWaveform):
+        return data.volts(dtype)
+    return data